@@ -0,0 +1,19 @@
+// assets/js/admin/autocomplete_filter.js
+// Фильтры-автодополнения в списках админки (core/admin.py: AutocompleteFilter):
+// выбор значения в select2 переписывает параметр фильтра в URL и перезагружает список.
+'use strict';
+{
+  const $ = django.jQuery;
+
+  $(document).on('change', 'select[data-filter-param]', function () {
+    const params = new URLSearchParams(window.location.search);
+    const name = this.dataset.filterParam;
+    if (this.value) {
+      params.set(name, this.value);
+    } else {
+      params.delete(name);
+    }
+    params.delete('p');  // новая выборка — с первой страницы
+    window.location.search = params.toString();
+  });
+}
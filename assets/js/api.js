@@ -50,6 +50,8 @@ window.API = (() => {
   // ---------- Dashboard ----------
   const summary           = () => GET('/api/summary');
   const globalLeaderboard = () => GET('/api/leaderboard/global');
+  // KPI + глобальный лидерборд одним запросом
+  const dashboard         = () => GET('/api/dashboard');
 
   // ---------- Projects ----------
   const listProjects = async () => {
@@ -106,29 +108,45 @@ window.API = (() => {
   // ---------- Links ----------
   const linkCreate = (projectId, { owner_id, name, target_url }) =>
     POST(`/api/projects/${projectId}/links/create`, { owner_id, name, target_url });
+  // rows: [{owner | owner_id, name, target_url}] -> { ids } в порядке rows
+  const linksBulk = (projectId, rows) => POST(`/api/projects/${projectId}/links/bulk`, rows);
 
-  const linksByOwner = async (projectId, ownerId) => {
-    const res = await GET(`/api/projects/${projectId}/links/by-owner/${ownerId}`);
+  // withUniques: сервер сразу вернёт unique_users по каждой ссылке (без запроса на ссылку)
+  const linksByOwner = async (projectId, ownerId, { withUniques = false } = {}) => {
+    const qs = withUniques ? '?with_uniques=1' : '';
+    const res = await GET(`/api/projects/${projectId}/links/by-owner/${ownerId}${qs}`);
     if (Array.isArray(res)) return { items: res };
     if (res?.items) return res;
     if (res?.results) return { items: res.results };
     return { items: [] };
   };
 
-  const shortLink = (linkId) => `${location.origin}/go/${linkId}`;
+  // статистика сразу по многим ссылкам: Map(link_id -> { total_clicks, unique_users })
+  const linkStatsBatch = async (ids = []) => {
+    const uniq = [...new Set(ids.map(Number).filter(Number.isFinite))];
+    if (!uniq.length) return new Map();
+    // длинные списки — POST, чтобы не упираться в длину URL
+    const res = uniq.length > 100
+      ? await POST('/api/link-stats', { ids: uniq })
+      : await GET(`/api/link-stats?ids=${uniq.join(',')}`);
+    return new Map((res?.items || []).map(it => [it.link_id, it]));
+  };
+
+  // code — короткий код ссылки (поле code в ответах API); старые /go/<id> тоже работают
+  const shortLink = (code) => `${location.origin}/go/${code}`;
 
   return {
     // auth
     login, logout, me,
     // dashboard
-    summary, globalLeaderboard,
+    summary, globalLeaderboard, dashboard,
     // projects
     listProjects, createProject, projectDetail,
     projectLeaderboard, projectMembers, projectAddMember,
     // members
     membersAll, memberCreate,
     // links
-    linkCreate, linksByOwner, shortLink,
+    linkCreate, linksBulk, linksByOwner, linkStatsBatch, shortLink,
   };
 })();
 
@@ -18,25 +18,15 @@
         `Status | <b>${isEditor ? 'Editor' : 'Viewer'}</b> <span class="muted">${isEditor ? '(can edit)' : '(only view)'}</span>`;
     }
 
-    // KPI: projects / links / clicks
-    const s = await API.summary();
-    setNum('#kpi-projects', toInt(s?.projects));
-    setNum('#kpi-links',    toInt(s?.links));
-    setNum('#kpi-clicks',   toInt(s?.clicks));
+    // KPI + global leaderboard — один запрос
+    const d = await API.dashboard();
+    const s = d?.summary || {};
+    setNum('#kpi-projects', toInt(s.projects));
+    setNum('#kpi-links',    toInt(s.links));
+    setNum('#kpi-clicks',   toInt(s.clicks));
+    setNum('#kpi-uniques',  toInt(s.unique_users));
 
-    // KPI: unique users (all links) — correct endpoint
-    try {
-      const resp = await fetch('/api/project-stats/', { credentials: 'same-origin' });
-      if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
-      const agg = await resp.json();
-      setNum('#kpi-uniques', toInt(agg?.unique_users));
-    } catch {
-      setNum('#kpi-uniques', '0');
-    }
-
-    // Global leaderboard
-    const res = await API.globalLeaderboard();
-    const leaders = Array.isArray(res?.items) ? res.items : [];
+    const leaders = Array.isArray(d?.leaderboard?.items) ? d.leaderboard.items : [];
 
     const podium = qs('#podium');
     const others = qs('#others');
@@ -47,10 +47,11 @@
     return r.json();
   }
 
-  async function fetchLinkUnique(linkId) {
+  // уникальные по списку ссылок одним запросом: сумма unique_users
+  async function fetchLinksUniqueSum(links) {
     try {
-      const d = await fetchJson(`/api/link-stats/${linkId}/`);
-      return int(d?.unique_users ?? d?.unique ?? 0);
+      const stats = await API.linkStatsBatch(links.map(l => l.id));
+      return links.reduce((s, l) => s + int(stats.get(Number(l.id))?.unique_users ?? 0), 0);
     } catch { return 0; }
   }
 
@@ -106,8 +107,7 @@
       const links = await fetchLinksByOwnerAny(memberId);
       if (links.length) {
         const total = links.reduce((s, l) => s + int(l?.clicks ?? 0), 0);
-        const uniquesArr = await Promise.all(links.map(l => fetchLinkUnique(l.id)));
-        const uniques = uniquesArr.reduce((s, u) => s + int(u), 0);
+        const uniques = await fetchLinksUniqueSum(links);
         return { unique_users: uniques, total_clicks: total };
       }
     } catch {}
@@ -121,11 +121,10 @@
         if (!pid) continue;
         try {
           if (window.API?.linksByOwner) {
-            const r = await API.linksByOwner(pid, memberId);
+            const r = await API.linksByOwner(pid, memberId, { withUniques: true });
             const items = r?.items || [];
             total += items.reduce((s, l) => s + int(l?.clicks ?? 0), 0);
-            const uniqArr = await Promise.all(items.map(l => fetchLinkUnique(l.id)));
-            uniques += uniqArr.reduce((s, u) => s + int(u), 0);
+            uniques += items.reduce((s, l) => s + int(l?.unique_users ?? 0), 0);
           }
         } catch {}
       }
@@ -210,7 +210,7 @@
 
   // показать список ссылок с уникальными пользователями для каждой ссылки
   async function openLinksList(ownerId) {
-    const { items = [] } = await API.linksByOwner(state.projectId, ownerId);
+    const { items = [] } = await API.linksByOwner(state.projectId, ownerId, { withUniques: true });
     const owner = state.membersInProject.find(m => m.id === ownerId);
     if (els.linksListTitle) els.linksListTitle.textContent = `${owner ? owner.name : 'Member'} — links`;
 
@@ -222,24 +222,12 @@
       return;
     }
 
-    // подтягиваем уникальных пользователей для каждой ссылки
-    const stats = await Promise.all(items.map(async (l) => {
-      try {
-        const r = await fetch(`/api/link-stats/${l.id}/`, { credentials: 'same-origin' });
-        if (!r.ok) throw new Error('bad');
-        const d = await r.json();
-        return { id: l.id, unique: Number(d.unique_users || 0) };
-      } catch {
-        return { id: l.id, unique: 0 };
-      }
-    }));
-    const byId = new Map(stats.map(s => [s.id, s.unique]));
-
+    // unique_users приходят вместе со списком (with_uniques=1) — без запроса на каждую ссылку
     items.forEach(l => {
       const row = document.createElement('div');
       row.className = 'link-row';
-      const short = API.shortLink(l.id);
-      const uniques = byId.get(l.id) ?? 0;
+      const short = API.shortLink(l.code || l.id);
+      const uniques = Number(l.unique_users || 0);
       row.innerHTML = `
         <div class="link-name" data-url="${short}" title="Click to copy">${safe(l.name)}</div>
         <div>${formatInt(uniques)} uniques · ${formatInt(l.clicks)} clicks</div>
@@ -337,7 +325,7 @@
       state.creatingLink = true;
       els.createLinkBtn.setAttribute('disabled', 'disabled');
 
-      const { id } = await API.linkCreate(state.projectId, { owner_id, name, target_url: url });
+      const { id, code } = await API.linkCreate(state.projectId, { owner_id, name, target_url: url });
       closeModals();
       toast('SUCCESSFULLY CREATED', 'ok');
 
@@ -350,7 +338,7 @@
       await loadProjectStats();
 
       // Показать короткую ссылку
-      const short = API.shortLink(id);
+      const short = API.shortLink(code || id);
       try { await navigator.clipboard.writeText(short); toast('Short URL copied', 'ok'); }
       catch { toast(short, 'ok'); }
     } catch (err) {
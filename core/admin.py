@@ -1,6 +1,110 @@
 # core/admin.py
+from django import forms
 from django.contrib import admin
-from .models import Project, Member, ProjectMember, Link, ClickEvent
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from . import identity, leaderboards
+from .hll import HyperLogLog
+from .models import Project, Member, ProjectMember, Link, ClickEvent, UserAgent, UniqueSketch
+
+
+# ---------- Общие помощники ----------
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    Фильтр по FK с полем автодополнения (select2 админки) вместо списка всех объектов.
+    Подклассы задают title, field_path и parameter_name (f"{field_path}__id__exact") на уровне
+    класса — по нему ModelAdmin.lookup_allowed разрешает и многозвенный путь (link__project).
+    У админки связанной модели нужны search_fields.
+    """
+    template = "admin/autocomplete_filter.html"
+    field_path = ""
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        field = get_fields_from_path(model, self.field_path)[-1]
+        widget = AutocompleteSelect(field, model_admin.admin_site, attrs={"data-filter-param": self.parameter_name})
+        widget.is_required = False  # разрешаем очистку выбора
+        choice_field = forms.ModelChoiceField(field.remote_field.model._default_manager.all(), widget=widget)
+        self.rendered_widget = choice_field.widget.render(self.parameter_name, self.value())
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # единственный пункт — «Все» (сброс фильтра); выбор значения делает виджет
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "display": "Все",
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class AutocompleteFilterMedia:
+    """
+    Подключает JS/CSS автодополнения на страницу списка, если в list_filter есть AutocompleteFilter,
+    и разрешает их параметры: штатный lookup_allowed сверяет многозвенный путь без "__id__exact"
+    (link__project / link__project__id), и ?link__project__id__exact= давал бы 400.
+    """
+
+    def lookup_allowed(self, lookup, value, request=None):
+        for f in self.list_filter:
+            if isinstance(f, type) and issubclass(f, AutocompleteFilter) and lookup == f.parameter_name:
+                return True
+        return super().lookup_allowed(lookup, value, request)
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(f, type) and issubclass(f, AutocompleteFilter) for f in self.list_filter):
+            media += AutocompleteSelect(Link._meta.get_field("owner"), self.admin_site).media
+            media += forms.Media(js=["js/admin/autocomplete_filter.js"])
+        return media
+
+
+def autocomplete_filter(path: str, title: str):
+    return type(
+        f"{path.title().replace('__', '')}Filter",
+        (AutocompleteFilter,),
+        {"field_path": path, "title": title, "parameter_name": f"{path}__id__exact"},
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров число строк оценивается, а не считается COUNT(*).
+    PostgreSQL — pg_class.reltuples, иначе MAX(id) - MIN(id) + 1 (по индексу первичного ключа;
+    после удаления старых событий это оценка сверху). С фильтрами — обычный точный COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if getattr(qs, "query", None) is None or qs.query.has_filters():
+            return super().count
+        table = qs.model._meta.db_table
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        bounds = qs.model._default_manager.aggregate(lo=Min("pk"), hi=Max("pk"))
+        if bounds["lo"] is None:
+            return 0
+        return bounds["hi"] - bounds["lo"] + 1
 
 
 # ---------- Project ----------
@@ -28,11 +132,18 @@ class ProjectAdmin(admin.ModelAdmin):
 # ---------- Member ----------
 @admin.action(description="Mark selected as EDITOR")
 def make_editor(modeladmin, request, queryset):
+    ids = list(queryset.values_list("pk", flat=True))
     queryset.update(is_editor=True)
+    # update() не шлёт post_save — сбрасываем ETag доски и кэш ролей сами
+    leaderboards.bump(leaderboards.GLOBAL, create=False)
+    identity.invalidate(ids)
 
 @admin.action(description="Unmark selected as EDITOR")
 def unmake_editor(modeladmin, request, queryset):
+    ids = list(queryset.values_list("pk", flat=True))
     queryset.update(is_editor=False)
+    leaderboards.bump(leaderboards.GLOBAL, create=False)
+    identity.invalidate(ids)
 
 @admin.register(Member)
 class MemberAdmin(admin.ModelAdmin):
@@ -51,10 +162,11 @@ class MemberAdmin(admin.ModelAdmin):
 
 # ---------- ProjectMember ----------
 @admin.register(ProjectMember)
-class ProjectMemberAdmin(admin.ModelAdmin):
+class ProjectMemberAdmin(AutocompleteFilterMedia, admin.ModelAdmin):
     list_display = ("project", "member", "added_at")
     list_display_links = ("project", "member")
-    list_filter = ("project", "member")
+    list_select_related = ("project", "member")
+    list_filter = (autocomplete_filter("project", "проекту"), autocomplete_filter("member", "участнику"))
     search_fields = ("project__name", "member__name")
     ordering = ("-added_at",)
     readonly_fields = ("added_at",)
@@ -62,26 +174,45 @@ class ProjectMemberAdmin(admin.ModelAdmin):
 
 # ---------- Link ----------
 @admin.register(Link)
-class LinkAdmin(admin.ModelAdmin):
+class LinkAdmin(AutocompleteFilterMedia, admin.ModelAdmin):
     list_display = ("name", "project", "owner", "clicks", "unique_clicks_show", "created_at")
     list_display_links = ("name",)
-    list_filter = ("project", "owner")
+    list_select_related = ("project", "owner")
+    list_filter = (autocomplete_filter("project", "проекту"), autocomplete_filter("owner", "владельцу"))
     search_fields = ("name", "project__name", "owner__name")
     ordering = ("-created_at",)
     readonly_fields = ("created_at",)
     autocomplete_fields = ("project", "owner")
 
+    def get_queryset(self, request):
+        # уникальные — из HLL-скетча ссылки тем же запросом, а не COUNT(DISTINCT) на строку
+        sketch = UniqueSketch.objects.filter(scope=UniqueSketch.SCOPE_LINK, ref_id=OuterRef("pk"))
+        return super().get_queryset(request).annotate(_unique_registers=Subquery(sketch.values("registers")[:1]))
+
     def unique_clicks_show(self, obj):
-        # свойство из модели Link
-        return obj.unique_clicks
+        # оценка HyperLogLog (core/sketches.py); точное значение — свойство Link.unique_clicks
+        return HyperLogLog.from_bytes(getattr(obj, "_unique_registers", None)).count()
     unique_clicks_show.short_description = "Уникальные клики"
 
 
 # ---------- ClickEvent ----------
 @admin.register(ClickEvent)
-class ClickEventAdmin(admin.ModelAdmin):
+class ClickEventAdmin(AutocompleteFilterMedia, admin.ModelAdmin):
     list_display = ("link", "user_key", "ip", "created_at")
-    list_filter = ("link", "created_at")
-    search_fields = ("user_key", "ip", "ua", "link__name")
+    list_select_related = ("link__owner",)  # Link.__str__ показывает владельца
+    list_filter = (autocomplete_filter("link", "ссылке"), autocomplete_filter("link__project", "проекту"), "created_at")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # без второго COUNT(*) по всей таблице
+    search_fields = ("user_key", "ip", "user_agent__ua", "link__name")
     autocomplete_fields = ("link",)
+    raw_id_fields = ("user_agent",)
     date_hierarchy = "created_at"
+
+
+# ---------- UserAgent ----------
+@admin.register(UserAgent)
+class UserAgentAdmin(admin.ModelAdmin):
+    list_display = ("browser", "os", "device", "ua", "created_at")
+    list_filter = ("device", "browser", "os")
+    search_fields = ("ua",)
+    readonly_fields = ("ua_hash", "ua", "created_at")
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # подключаем сигналы (кэши, PRAGMA SQLite, учёт SQL) и периодические задачи flusher'а
+        from . import bots, cache, campaigns, counters, dashboard, dedup, identity, leaderboards, linkcache, metrics, redirects, retention, rollups, sqlite, stats  # noqa: F401
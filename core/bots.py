@@ -0,0 +1,197 @@
+# core/bots.py
+"""
+Распознавание ботов по User-Agent (и, опционально, по IP).
+
+- сигнатуры — из файла settings.BOT_SIGNATURES_FILE (core/data/bot_signatures.txt):
+  «семейство | вид | токен, токен»; вид preview — превьюеры ссылок (им отдаётся
+  HTML без og:-тегов), остальные — прочие боты (302 без учёта клика);
+- все токены собираются в одно регулярное выражение-trie: один проход по UA
+  вместо перебора сотни подстрок;
+- вердикты кэшируются в LRU по строке UA (settings.BOT_CACHE_SIZE) — на горячем
+  пути это один dict-lookup;
+- IP-диапазоны (settings.BOT_IP_RULES_FILE, по умолчанию выключено) — для ботов
+  с «человеческим» UA;
+- пустой UA — человек: его не шлют часть in-app браузеров и приватных прокси;
+  settings.BOT_BLOCK_EMPTY_UA=True считает такие запросы ботом (EMPTY_UA);
+- счётчики срабатываний по семействам — в /api/_metrics (utm_bot_hits_total).
+"""
+from __future__ import annotations
+
+import ipaddress
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.conf import settings
+
+from core import metrics
+
+PREVIEW = "preview"
+
+
+class Verdict(NamedTuple):
+    family: str
+    kind: str
+
+    @property
+    def preview(self) -> bool:
+        return self.kind == PREVIEW
+
+
+EMPTY_UA = Verdict("empty", "tool")
+
+
+# ==========================
+# Загрузка правил
+# ==========================
+def _rows(path) -> List[List[str]]:
+    rows = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            rows.append([part.strip() for part in line.split("|")])
+    return rows
+
+
+def load_signatures(path) -> Dict[str, Verdict]:
+    """{токен (lower): Verdict}; при повторе токена побеждает первая строка."""
+    tokens: Dict[str, Verdict] = {}
+    for family, kind, raw in _rows(path):
+        for token in raw.split(","):
+            token = token.strip().lower()
+            if token:
+                tokens.setdefault(token, Verdict(family, kind))
+    return tokens
+
+
+def trie_regex(tokens) -> re.Pattern:
+    """Одно выражение из префиксного дерева токенов; при общих префиксах берётся самый длинный."""
+    trie: Dict = {}
+    for token in tokens:
+        node = trie
+        for ch in token:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        end = "" in node
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if end:
+            body = f"(?:{body})?" if len(alts) == 1 else body + "?"
+        return body
+
+    return re.compile(build(trie))
+
+
+def load_ip_rules(path) -> Dict[int, Tuple[List[int], List[Tuple[int, Verdict]]]]:
+    """{версия IP: (начала диапазонов, [(конец, Verdict)])}, отсортировано по началу."""
+    ranges: Dict[int, List[Tuple[int, int, Verdict]]] = {4: [], 6: []}
+    for cidr, family, kind in _rows(path):
+        net = ipaddress.ip_network(cidr, strict=False)
+        ranges[net.version].append(
+            (int(net.network_address), int(net.broadcast_address), Verdict(family, kind))
+        )
+    out = {}
+    for version, items in ranges.items():
+        items.sort()
+        out[version] = ([s for s, _, _ in items], [(e, v) for _, e, v in items])
+    return out
+
+
+# ==========================
+# Классификатор
+# ==========================
+class BotClassifier:
+    def __init__(self, signatures: Dict[str, Verdict], ip_rules=None, cache_size: int = 10000,
+                 block_empty: bool = False):
+        self.signatures = signatures
+        self.block_empty = block_empty
+        self.regex = trie_regex(signatures)
+        self.ip_rules = ip_rules or {}
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[str, Verdict | None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+
+    def _by_ua(self, ua: str) -> Verdict | None:
+        if not ua:
+            return EMPTY_UA if self.block_empty else None
+        with self._lock:
+            if ua in self._cache:
+                self._cache.move_to_end(ua)
+                return self._cache[ua]
+        m = self.regex.search(ua.lower())
+        verdict = self.signatures.get(m.group(0)) if m else None
+        with self._lock:
+            self._cache[ua] = verdict
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return verdict
+
+    def _by_ip(self, ip: str | None) -> Verdict | None:
+        if not ip or not self.ip_rules:
+            return None
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        starts, ends = self.ip_rules.get(addr.version, ([], []))
+        i = bisect_right(starts, int(addr)) - 1
+        if i >= 0 and int(addr) <= ends[i][0]:
+            return ends[i][1]
+        return None
+
+    def classify(self, ua: str, ip: str | None = None) -> Verdict | None:
+        """Verdict бота или None для человека; засчитывает срабатывание семейства."""
+        verdict = self._by_ua(ua) or self._by_ip(ip)
+        if verdict is not None:
+            with self._lock:
+                self.hits[verdict.family] = self.hits.get(verdict.family, 0) + 1
+        return verdict
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.hits)
+
+
+_classifier: BotClassifier | None = None
+_init_lock = threading.Lock()
+
+
+def get_classifier() -> BotClassifier:
+    global _classifier
+    if _classifier is None:
+        with _init_lock:
+            if _classifier is None:
+                ip_file = getattr(settings, "BOT_IP_RULES_FILE", "")
+                _classifier = BotClassifier(
+                    load_signatures(getattr(settings, "BOT_SIGNATURES_FILE", Path(__file__).parent / "data" / "bot_signatures.txt")),
+                    ip_rules=load_ip_rules(ip_file) if ip_file else None,
+                    cache_size=getattr(settings, "BOT_CACHE_SIZE", 10000),
+                    block_empty=getattr(settings, "BOT_BLOCK_EMPTY_UA", False),
+                )
+    return _classifier
+
+
+def classify(ua: str, ip: str | None = None) -> Verdict | None:
+    return get_classifier().classify(ua, ip)
+
+
+def _prometheus_lines() -> List[str]:
+    out = [
+        "# HELP utm_bot_hits_total Requests recognised as bots, by family.",
+        "# TYPE utm_bot_hits_total counter",
+    ]
+    if _classifier is not None:
+        for family, n in sorted(_classifier.stats().items()):
+            out.append(f'utm_bot_hits_total{{family="{family}"}} {n}')
+    return out
+
+
+metrics.register_collector(_prometheus_lines)
@@ -0,0 +1,168 @@
+# core/cache.py
+"""
+Общий кэш воркеров: один внутренний API поверх кэша Django (settings.SHARED_CACHE_ALIAS).
+Бэкенд выбирается CACHE_BACKEND: locmem (у каждого воркера свой), sqlite (core/sqlite_cache.py —
+один файл на машину, без внешнего сервиса), file, redis (нужен пакет redis).
+
+Инвалидация — версиями, а не удалением ключей. У каждой области (scope, ref) есть
+счётчик-версия; ключ значения включает версии всех областей, от которых оно зависит:
+
+    stats:link:42:0@link.42=3,link_clicks.42=17
+
+Запись увеличивает один счётчик (bump), и все зависящие ключи разом становятся
+недостижимыми — старые значения доживают свой TTL и вытесняются.
+
+Области:
+- link:<id>         — ссылка изменена/удалена (цель, проект, владелец);
+- link_clicks:<id>  — по ссылке записаны клики;
+- project:<id>      — проект изменён/удалён (название, окно кампании);
+- member:<id>       — участник изменён/удалён (имя, роль);
+- catalog:0         — появились/исчезли ссылки или проекты;
+- clicks:0          — записаны любые клики;
+- leaderboard:<b>   — пересобрана доска b (core/leaderboards.py).
+
+Ошибка бэкенда (нет Redis, занят файл) не роняет запрос: чтение — промах, запись — пропуск.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Link, Member, Project
+
+logger = logging.getLogger(__name__)
+
+Dep = Tuple[str, int]  # (scope, ref)
+
+LINK = "link"
+LINK_CLICKS = "link_clicks"
+PROJECT = "project"
+MEMBER = "member"
+CATALOG = "catalog"
+CLICKS = "clicks"
+LEADERBOARD = "leaderboard"
+
+def backend():
+    return caches[getattr(settings, "SHARED_CACHE_ALIAS", "default")]
+
+
+def _version_key(dep: Dep) -> str:
+    return f"v:{dep[0]}:{dep[1]}"
+
+
+# ==========================
+# Версии
+# ==========================
+def versions(deps: Sequence[Dep]) -> List[int]:
+    """Текущие версии областей (одним запросом); нет счётчика — 0."""
+    if not deps:
+        return []
+    try:
+        found = backend().get_many([_version_key(d) for d in deps])
+    except Exception as exc:
+        logger.warning("shared cache: versions failed: %s", exc)
+        found = {}
+    return [found.get(_version_key(d), 0) for d in deps]
+
+
+def version(scope: str, ref: int = 0) -> int:
+    return versions([(scope, ref)])[0]
+
+
+def bump(scope: str, ref: int = 0) -> None:
+    bump_many([(scope, ref)])
+
+
+def bump_many(deps: Iterable[Dep]) -> None:
+    """+1 к версии каждой области: все ключи, зависящие от неё, устаревают."""
+    cache = backend()
+    for dep in set(deps):
+        key = _version_key(dep)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # счётчика ещё нет; add() проиграет гонку другому воркеру — тогда incr
+                if not cache.add(key, 1, timeout=None):
+                    cache.incr(key)
+        except Exception as exc:
+            logger.warning("shared cache: bump %s failed: %s", key, exc)
+
+
+# ==========================
+# Значения
+# ==========================
+def key(name: str, deps: Sequence[Dep], current: Sequence[int]) -> str:
+    stamp = ",".join(f"{scope}.{ref}={v}" for (scope, ref), v in zip(deps, current))
+    return f"{name}@{stamp}"
+
+
+def get_many(items: Dict[Any, Tuple[str, Sequence[Dep]]]) -> Tuple[Dict[Any, Any], Dict[Any, str]]:
+    """
+    items: {id: (name, deps)} -> (найденные {id: value}, ключи промахов {id: key}).
+    Версии всех областей и сами значения — два обращения к бэкенду на всю пачку.
+    """
+    all_deps = list({d for _, deps in items.values() for d in deps})
+    current = dict(zip(all_deps, versions(all_deps)))
+    keys = {i: key(name, deps, [current[d] for d in deps]) for i, (name, deps) in items.items()}
+    try:
+        found = backend().get_many(list(keys.values()))
+    except Exception as exc:
+        logger.warning("shared cache: get_many failed: %s", exc)
+        found = {}
+    hits, misses = {}, {}
+    for i, k in keys.items():
+        if k in found:
+            hits[i] = found[k][0]  # значение хранится в кортеже: кэшируется и None
+        else:
+            misses[i] = k
+    return hits, misses
+
+
+def set_many(values: Dict[str, Any], ttl: float) -> None:
+    if ttl <= 0 or not values:
+        return
+    try:
+        backend().set_many({k: (v,) for k, v in values.items()}, timeout=ttl)
+    except Exception as exc:
+        logger.warning("shared cache: set_many failed: %s", exc)
+
+
+def get_or_build(name: str, deps: Sequence[Dep], ttl: float, build: Callable[[], Any]) -> Any:
+    """Значение по версионному ключу или build() с записью в кэш."""
+    hits, misses = get_many({0: (name, deps)})
+    if 0 in hits:
+        return hits[0]
+    value = build()
+    set_many({misses[0]: value}, ttl)
+    return value
+
+
+# ==========================
+# Записи моделей -> версии (после коммита, чтобы не закэшировать старое)
+# ==========================
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def _link_changed(sender, instance: Link, **kwargs):
+    deps = [(LINK, instance.pk), (CATALOG, 0)]
+    transaction.on_commit(lambda: bump_many(deps))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def _project_changed(sender, instance: Project, **kwargs):
+    deps = [(PROJECT, instance.pk), (CATALOG, 0)]
+    transaction.on_commit(lambda: bump_many(deps))
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def _member_changed(sender, instance: Member, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: bump(MEMBER, pk))
@@ -0,0 +1,170 @@
+# core/campaigns.py
+"""
+Период кампании проекта (Project.date_from..date_to, включительно, TIME_ZONE) в учёте кликов.
+
+Запись: apply_clicks (core/clicks.py) одним запросом берёт для пачки окна проектов ссылок,
+ставит ClickEvent.in_window и увеличивает рядом с clicks счётчик window_clicks
+(Link / слоты core/counters.py). Дальше в лидерборды (LeaderboardEntry.window_clicks)
+и /api/project-stats он идёт как обычные счётчики: вне окна = clicks - window_clicks.
+Проект без дат — окно не ограничено, в окне все клики; одна дата — открыт другой конец.
+
+Смена дат проекта: сигнал в той же транзакции помечает проект строкой JobState
+"campaign-window:<project>" (пометку видит задача любого воркера, она переживает перезапуск),
+задача "campaign_windows" пересчитывает его (recount): window_clicks ссылок — из почасовых ClickRollup (+ ещё не свёрнутые события),
+поэтому архивированные ClickEvent (core/retention.py) тоже учитываются; метки in_window
+событий — одним UPDATE. Клики, записанные во время пересчёта со старым окном, могут
+разойтись на единицы до следующего пересчёта (rebuild_campaign_windows).
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from core import cache, leaderboards, periodic, rollups
+from core.models import ClickEvent, ClickRollup, JobState, Link, LinkCounterShard, Project
+
+Window = Tuple[datetime | None, datetime | None]  # [start, end), None — открытый конец
+
+
+def bounds(date_from: date | None, date_to: date | None) -> Window:
+    start = rollups.day_range(date_from, date_from)[0] if date_from else None
+    end = rollups.day_range(date_to, date_to)[1] if date_to else None
+    return start, end
+
+
+def _window_q(window: Window, field: str = "created_at") -> Q:
+    start, end = window
+    q = Q()
+    if start is not None:
+        q &= Q(**{f"{field}__gte": start})
+    if end is not None:
+        q &= Q(**{f"{field}__lt": end})
+    return q
+
+
+# ==========================
+# Запись кликов
+# ==========================
+def link_windows(link_ids: Iterable[int]) -> Dict[int, Tuple[int, float | None, float | None]]:
+    """{link_id: (project_id, start_ts, end_ts)} — только для существующих ссылок, один запрос."""
+    rows = Link.objects.filter(pk__in=set(link_ids)).values_list(
+        "id", "project_id", "project__date_from", "project__date_to",
+    )
+    out = {}
+    for link_id, project_id, d_from, d_to in rows:
+        start, end = bounds(d_from, d_to)
+        out[link_id] = (
+            project_id,
+            start.timestamp() if start else None,
+            end.timestamp() if end else None,
+        )
+    return out
+
+
+def in_window(ts: float, start: float | None, end: float | None) -> bool:
+    return (start is None or ts >= start) and (end is None or ts < end)
+
+
+# ==========================
+# Пересчёт после смены дат
+# ==========================
+def recount(project_id: int) -> int:
+    """Пересчитывает window_clicks ссылок и метки in_window проекта. Возвращает число кликов в окне."""
+    project = Project.objects.filter(pk=project_id).values_list("date_from", "date_to").first()
+    if project is None:
+        return 0
+    window = bounds(*project)
+    rollups.materialize_all()  # всё до отметки — в почасовых агрегатах
+
+    with transaction.atomic():
+        link_ids = list(Link.objects.select_for_update().filter(project_id=project_id).values_list("id", flat=True))
+        if not link_ids:
+            return 0
+        mark_id = JobState.objects.filter(name=rollups.WATERMARK).values_list("value", flat=True).first() or 0
+        counts: Dict[int, int] = {}
+        rolled = (
+            ClickRollup.objects.filter(_window_q(window, "bucket"), grain=rollups.HOUR, scope=rollups.LINK, ref_id__in=link_ids)
+            .values("ref_id")
+            .annotate(s=Sum("clicks"))
+        )
+        for r in rolled:
+            counts[r["ref_id"]] = r["s"] or 0
+        tail = (
+            ClickEvent.objects.filter(_window_q(window), pk__gt=mark_id, link_id__in=link_ids)
+            .values("link_id")
+            .annotate(n=Count("id"))
+        )
+        for r in tail:
+            counts[r["link_id"]] = counts.get(r["link_id"], 0) + r["n"]
+
+        # слоты держат только прирост со старым окном — он уже посчитан заново выше
+        LinkCounterShard.objects.filter(link_id__in=link_ids).update(window_clicks=0)
+        for link_id in link_ids:
+            Link.objects.filter(pk=link_id).update(window_clicks=counts.get(link_id, 0))
+        events = ClickEvent.objects.filter(link_id__in=link_ids)
+        if window == (None, None):
+            events.update(in_window=True)
+        else:
+            events.update(in_window=Case(When(_window_q(window), then=Value(True)), default=Value(False)))
+    leaderboards.mark_links(link_ids)
+    cache.bump(cache.PROJECT, project_id)
+    return sum(counts.values())
+
+
+MARK_PREFIX = "campaign-window:"
+
+
+def _mark_name(project_id: int) -> str:
+    return f"{MARK_PREFIX}{project_id}"
+
+
+def mark(project_ids: Iterable[int]) -> None:
+    """Помечает проекты к пересчёту; повторная пометка увеличивает счётчик строки."""
+    from core.clicks import start_background
+
+    for pk in set(project_ids):
+        name = _mark_name(pk)
+        if not JobState.objects.filter(name=name).update(value=F("value") + 1):
+            JobState.objects.get_or_create(name=name)
+    start_background()
+
+
+def recount_dirty() -> int:
+    marked = list(JobState.objects.filter(name__startswith=MARK_PREFIX).order_by("name").values_list("name", "value"))
+    for name, value in marked:
+        recount(int(name[len(MARK_PREFIX):]))
+        # при ошибке пометка остаётся; снимаем её, только если за время пересчёта не было новой
+        JobState.objects.filter(name=name, value=value).delete()
+    return len(marked)
+
+
+periodic.register(
+    "campaign_windows",
+    getattr(settings, "CAMPAIGN_RECOUNT_INTERVAL", 5.0),
+    recount_dirty,
+)
+
+
+@receiver(pre_save, sender=Project)
+def _remember_window(sender, instance: Project, **kwargs):
+    instance._utm_window = (
+        Project.objects.filter(pk=instance.pk).values_list("date_from", "date_to").first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Project)
+def _window_changed(sender, instance: Project, created: bool, **kwargs):
+    old = getattr(instance, "_utm_window", None)
+    if created or old is None:
+        return
+    # из формы/JSON даты могут прийти строкой — сравниваем уже сохранённые значения
+    new = Project.objects.filter(pk=instance.pk).values_list("date_from", "date_to").first()
+    if new != old:
+        mark([instance.pk])
@@ -0,0 +1,562 @@
+# core/clicks.py
+"""
+Запись кликов (ClickEvent + Link.clicks).
+
+Режимы (settings.CLICK_INGEST_MODE):
+  - "sync"     — как раньше: INSERT ClickEvent и UPDATE Link.clicks прямо в запросе;
+  - "buffered" — клик кладётся в локальный spool (отдельный SQLite-файл в WAL),
+                 запрос сразу отвечает, а фоновый flusher пачками переносит записи
+                 в ClickEvent (bulk_create) и делает один UPDATE Link.clicks на ссылку.
+
+Доставка из spool — at-least-once: пачка «арендуется» (lease) и удаляется из spool
+только после коммита в основную БД. Если воркер умер посреди flush, аренда истекает
+и пачку подберёт другой воркер. Пачка, которая не записалась CLICK_SPOOL_MAX_ATTEMPTS раз,
+пишется по одному клику; клики, которые не проходят и поодиночке при доступной БД,
+уходят в таблицу spool_dead того же файла (вернуть: manage.py flush_clicks --requeue-dead),
+чтобы не держать очередь за собой.
+
+Под ASGI async-вьюхи кладут клик в AsyncClickBatcher (список в памяти event loop'а):
+раз в ASYNC_CLICK_BATCH_INTERVAL или по набору ASYNC_CLICK_BATCH_SIZE пачка уходит
+в пул потоков и пишется как обычно — в spool (buffered) или сразу в БД (sync).
+
+Перед любым из путей повтор (link_id, user_key) внутри окна CLICK_DEDUP_WINDOW
+отбрасывается (core/dedup.py) — до spool, батчера и БД.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+from core import cache, campaigns, counters, dedup, periodic, sketches, useragents
+from core.linkcache import link_targets
+from core.models import ClickEvent, Link
+
+
+logger = logging.getLogger(__name__)
+
+ClickRecord = Dict[str, Any]  # {link_id, user_key, ip, ua, ts}; из spool — ещё id и attempts
+
+_SYNCHRONOUS = {"off": "OFF", "normal": "NORMAL", "full": "FULL"}
+
+
+def _conf(name: str, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Запись в основную БД
+# ==========================
+def make_record(link_id: int, user_key: str, ip: str | None, ua: str, ts: float | None = None) -> ClickRecord:
+    return {
+        "link_id": int(link_id),
+        "user_key": user_key,
+        "ip": ip or None,
+        "ua": (ua or "")[:700],
+        "ts": ts if ts is not None else time.time(),
+    }
+
+
+def apply_clicks(records: List[ClickRecord]) -> int:
+    """
+    Пишет пачку кликов в БД одной транзакцией:
+    UA -> id словаря (core/useragents.py) + bulk_create ClickEvent
+    + по одному инкременту счётчика на каждую ссылку (core/counters.py)
+    + обновление скетчей уникальных (core/sketches.py).
+    Каждый клик помечается: попал ли он в период кампании проекта (core/campaigns.py).
+    Клики по удалённым ссылкам отбрасываются. Возвращает число записанных событий.
+    """
+    if not records:
+        return 0
+
+    # окна проектов ссылок пачки — заодно и проверка, что ссылки существуют:
+    # ссылку могли удалить, пока клик лежал в spool/батчере, а кэш целей других
+    # воркеров ещё помнит её (core/linkcache.py)
+    windows = campaigns.link_windows(r["link_id"] for r in records)
+    records = [r for r in records if r["link_id"] in windows]
+    if not records:
+        return 0
+
+    per_link = Counter(r["link_id"] for r in records)
+    tags = []
+    for r in records:
+        w = windows.get(r["link_id"])
+        tags.append(w is not None and campaigns.in_window(r["ts"], w[1], w[2]))
+    per_link_window = Counter(r["link_id"] for r, tag in zip(records, tags) if tag)
+    ua_ids = useragents.resolve(r["ua"] for r in records)
+
+    with transaction.atomic():
+        events = [
+            ClickEvent(
+                link_id=r["link_id"],
+                user_key=r["user_key"],
+                ip=r["ip"],
+                user_agent_id=ua_ids.get(r["ua"]),
+                created_at=datetime.fromtimestamp(r["ts"], tz=dt_timezone.utc),
+                in_window=tag,
+            )
+            for r, tag in zip(records, tags)
+        ]
+        ClickEvent.objects.bulk_create(events, batch_size=500)
+        counters.add_clicks(per_link, per_link_window)
+        sketches.add_clicks(
+            ((r["link_id"], r["user_key"]) for r in records),
+            link_project={pk: w[0] for pk, w in windows.items()},
+        )
+        # статистика этих ссылок и итоги устарели во всех воркерах (core/cache.py)
+        transaction.on_commit(lambda: cache.bump_many(
+            [(cache.LINK_CLICKS, pk) for pk in per_link] + [(cache.CLICKS, 0)]
+        ))
+    return len(events)
+
+
+# ==========================
+# Spool (SQLite side-file)
+# ==========================
+class ClickSpool:
+    """
+    Append-only очередь кликов в отдельном SQLite-файле.
+    Все воркеры пишут в один файл; WAL позволяет писать, не блокируя чтение flusher'а.
+    """
+
+    def __init__(self, path: str, synchronous: str = "normal", lease_seconds: float = 60.0):
+        self.path = path
+        self.synchronous = _SYNCHRONOUS.get(synchronous.lower(), "NORMAL")
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._claims = itertools.count(1)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " link_id INTEGER NOT NULL,"
+                " user_key TEXT NOT NULL,"
+                " ip TEXT,"
+                " ua TEXT,"
+                " ts REAL NOT NULL,"
+                " claim TEXT,"
+                " claimed_at REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(spool)")}
+            if "attempts" not in columns:  # spool, созданный до счётчика попыток
+                conn.execute("ALTER TABLE spool ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS spool_claim ON spool(claim)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool_dead ("
+                " id INTEGER PRIMARY KEY,"
+                " link_id INTEGER NOT NULL,"
+                " user_key TEXT NOT NULL,"
+                " ip TEXT,"
+                " ua TEXT,"
+                " ts REAL NOT NULL,"
+                " attempts INTEGER NOT NULL,"
+                " error TEXT,"
+                " failed_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, rec: ClickRecord) -> None:
+        self._conn().execute(
+            "INSERT INTO spool(link_id, user_key, ip, ua, ts) VALUES (?, ?, ?, ?, ?)",
+            (rec["link_id"], rec["user_key"], rec["ip"], rec["ua"], rec["ts"]),
+        )
+
+    def append_many(self, records: List[ClickRecord]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO spool(link_id, user_key, ip, ua, ts) VALUES (?, ?, ?, ?, ?)",
+                [(r["link_id"], r["user_key"], r["ip"], r["ua"], r["ts"]) for r in records],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def pending(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def dead(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM spool_dead").fetchone()[0]
+
+    def claim(self, limit: int) -> Tuple[str, List[ClickRecord]]:
+        """Арендует до limit записей (свободных или с истёкшей арендой); каждая аренда — попытка."""
+        conn = self._conn()
+        token = f"{os.getpid()}:{threading.get_ident()}:{next(self._claims)}"
+        now_ts = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE spool SET claim = ?, claimed_at = ?, attempts = attempts + 1 WHERE id IN ("
+                " SELECT id FROM spool WHERE claim IS NULL OR claimed_at < ? ORDER BY id LIMIT ?)",
+                (token, now_ts, now_ts - self.lease_seconds, limit),
+            )
+            rows = conn.execute(
+                "SELECT id, link_id, user_key, ip, ua, ts, attempts FROM spool WHERE claim = ? ORDER BY id", (token,)
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        records = [
+            {"id": r[0], "link_id": r[1], "user_key": r[2], "ip": r[3], "ua": r[4], "ts": r[5], "attempts": r[6]}
+            for r in rows
+        ]
+        return token, records
+
+    def ack(self, token: str) -> None:
+        self._conn().execute("DELETE FROM spool WHERE claim = ?", (token,))
+
+    def release(self, token: str) -> None:
+        self._conn().execute("UPDATE spool SET claim = NULL, claimed_at = NULL WHERE claim = ?", (token,))
+
+    def bury(self, token: str, errors: Dict[int, str]) -> None:
+        """Переносит записи аренды {id: ошибка} в spool_dead."""
+        conn = self._conn()
+        ids = list(errors)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, link_id, user_key, ip, ua, ts, attempts FROM spool WHERE claim = ? AND id IN ({marks})",
+                    (token, *chunk),
+                ).fetchall()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO spool_dead(id, link_id, user_key, ip, ua, ts, attempts, error, failed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*r, errors[r[0]], time.time()) for r in rows],
+                )
+                conn.execute(f"DELETE FROM spool WHERE claim = ? AND id IN ({marks})", (token, *chunk))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def requeue_dead(self) -> int:
+        """Возвращает записи spool_dead в очередь с обнулёнными попытками."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            n = conn.execute(
+                "INSERT INTO spool(link_id, user_key, ip, ua, ts) SELECT link_id, user_key, ip, ua, ts FROM spool_dead"
+            ).rowcount
+            conn.execute("DELETE FROM spool_dead")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+
+# ==========================
+# Flusher (фоновый поток в каждом воркере)
+# ==========================
+# Поток запускается в обоих режимах: в buffered он сбрасывает spool,
+# в любом — выполняет периодические задачи (core/periodic.py).
+class ClickFlusher:
+    def __init__(self, spool: ClickSpool, flush_size: int, interval: float, max_attempts: int = 5):
+        self.spool = spool
+        self.flush_size = max(1, flush_size)
+        self.interval = max(0.05, interval)
+        self.max_attempts = max(1, max_attempts)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._since_flush = 0
+
+    def flush(self, max_batches: int | None = None) -> int:
+        """Переносит spool в БД пачками по flush_size. Возвращает число записанных кликов."""
+        written = 0
+        batches = 0
+        with self._lock:
+            self._since_flush = 0
+            while max_batches is None or batches < max_batches:
+                token, records = self.spool.claim(self.flush_size)
+                if not records:
+                    break
+                try:
+                    written += apply_clicks(records)
+                except Exception:
+                    if max(r["attempts"] for r in records) < self.max_attempts:
+                        self.spool.release(token)
+                        raise
+                    written += self._isolate(token, records)
+                self.spool.ack(token)
+                batches += 1
+                if len(records) < self.flush_size:
+                    break
+        return written
+
+    def _isolate(self, token: str, records: List[ClickRecord]) -> int:
+        """
+        Пачка не записалась max_attempts раз: пишем клики по одному, а те, что не проходят
+        и поодиночке, переносим в spool_dead — иначе пачка вечно стоит в начале очереди.
+        """
+        written = 0
+        errors: Dict[int, str] = {}
+        for rec in records:
+            try:
+                written += apply_clicks([rec])
+            except Exception as exc:
+                errors[rec["id"]] = repr(exc)
+        if errors:
+            try:
+                # недоступная БД — не повод хоронить клики: вернём их в очередь
+                connection.ensure_connection()
+                with connection.cursor() as cur:
+                    cur.execute("SELECT 1")
+            except Exception:
+                self.spool.release(token)
+                raise
+            logger.error("click spool: %d of %d records moved to spool_dead: %s",
+                         len(errors), len(records), next(iter(errors.values())))
+            self.spool.bury(token, errors)
+        return written
+
+    def notify(self, n: int = 1) -> None:
+        """Вызывается после каждого append: будит поток, если набралась пачка."""
+        self.ensure_started()
+        self._since_flush += n
+        if self._since_flush >= self.flush_size:
+            self._wake.set()
+
+    def ensure_started(self) -> None:
+        # после fork (gunicorn --preload) поток надо поднять заново
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="click-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                if buffered():
+                    self.flush()
+                periodic.run_due()
+            except Exception:
+                # не роняем поток: записи остались в spool и будут подобраны позже
+                logger.exception("click flusher failed")
+            finally:
+                close_old_connections()
+
+
+_spool: ClickSpool | None = None
+_flusher: ClickFlusher | None = None
+_init_lock = threading.Lock()
+
+
+def get_flusher() -> ClickFlusher:
+    global _spool, _flusher
+    if _flusher is None:
+        with _init_lock:
+            if _flusher is None:
+                _spool = ClickSpool(
+                    _conf("CLICK_SPOOL_PATH", str(settings.BASE_DIR / "click_spool.sqlite3")),
+                    synchronous=_conf("CLICK_SPOOL_SYNC", "normal"),
+                    lease_seconds=_conf("CLICK_SPOOL_LEASE", 60.0),
+                )
+                _flusher = ClickFlusher(
+                    _spool,
+                    flush_size=_conf("CLICK_FLUSH_SIZE", 200),
+                    interval=_conf("CLICK_FLUSH_INTERVAL", 1.0),
+                    max_attempts=_conf("CLICK_SPOOL_MAX_ATTEMPTS", 5),
+                )
+                atexit.register(_flush_at_exit)
+    return _flusher
+
+
+def _flush_at_exit() -> None:
+    try:
+        if _flusher is not None:
+            _flusher.flush()
+    except Exception:
+        logger.exception("click flusher: final flush failed, records stay in spool")
+
+
+# ==========================
+# Async-батчер (ASGI)
+# ==========================
+def _write_batch(records: List[ClickRecord]) -> None:
+    flusher = get_flusher()
+    if buffered():
+        flusher.spool.append_many(records)
+        flusher.notify(len(records))
+        return
+    close_old_connections()
+    try:
+        apply_clicks(records)
+    finally:
+        close_old_connections()
+    flusher.ensure_started()
+
+
+class AsyncClickBatcher:
+    """
+    Копит клики в памяти event loop'а и пишет их пачкой в отдельном потоке,
+    чтобы async-вьюха не ждала БД/spool. Живёт в рамках одного loop'а (воркер uvicorn).
+    """
+
+    def __init__(self, flush_size: int, interval: float, max_pending: int = 50000):
+        self.flush_size = max(1, flush_size)
+        self.interval = max(0.01, interval)
+        self.max_pending = max(self.flush_size, max_pending)
+        self._buf: List[ClickRecord] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self.dropped = 0
+
+    def add(self, rec: ClickRecord) -> None:
+        """Вызывается из корутины; не блокирует."""
+        self._ensure_task()
+        if len(self._buf) >= self.max_pending:
+            # БД не успевает — лучше потерять клик, чем съесть всю память воркера
+            self.dropped += 1
+            return
+        self._buf.append(rec)
+        if len(self._buf) >= self.flush_size:
+            self._wake.set()
+
+    def _ensure_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._run(), name="click-batcher")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        batch, self._buf = self._buf, []
+        if not batch:
+            return 0
+        try:
+            await sync_to_async(_write_batch, thread_sensitive=False)(batch)
+        except Exception:
+            # вернём пачку в начало очереди — попробуем на следующем тике
+            logger.exception("click batcher: write failed, %d records requeued", len(batch))
+            self._buf[:0] = batch[: self.max_pending]
+            return 0
+        return len(batch)
+
+    def flush_sync(self) -> int:
+        """Досылает остаток без event loop'а (atexit)."""
+        batch, self._buf = self._buf, []
+        if batch:
+            _write_batch(batch)
+        return len(batch)
+
+
+_batcher: AsyncClickBatcher | None = None
+
+
+def get_batcher() -> AsyncClickBatcher:
+    global _batcher
+    if _batcher is None:
+        get_flusher()  # atexit: остаток батчера (LIFO) уйдёт в spool раньше финального flush
+        with _init_lock:
+            if _batcher is None:
+                _batcher = AsyncClickBatcher(
+                    flush_size=_conf("ASYNC_CLICK_BATCH_SIZE", 200),
+                    interval=_conf("ASYNC_CLICK_BATCH_INTERVAL", 0.2),
+                )
+                atexit.register(_flush_batcher_at_exit)
+    return _batcher
+
+
+def _flush_batcher_at_exit() -> None:
+    try:
+        if _batcher is not None:
+            _batcher.flush_sync()
+    except Exception:
+        logger.exception("click batcher: final flush failed, pending records lost")
+
+
+# ==========================
+# Публичная точка входа
+# ==========================
+def buffered() -> bool:
+    return _conf("CLICK_INGEST_MODE", "sync") == "buffered"
+
+
+def start_background() -> None:
+    get_flusher().ensure_started()
+
+
+def record_click(link_id: int, user_key: str, ip: str | None, ua: str) -> bool:
+    """
+    Регистрирует клик человека по существующей ссылке. False — повтор в окне дедупликации.
+    Link.DoesNotExist (sync-режим) — ссылку уже удалили, хотя кэш воркера её ещё помнил.
+    """
+    if dedup.suppress(link_id, user_key):
+        return False
+    rec = make_record(link_id, user_key, ip, ua)
+    flusher = get_flusher()
+    if buffered():
+        flusher.spool.append(rec)
+        flusher.notify()
+        return True
+    try:
+        written = apply_clicks([rec])
+    except IntegrityError:
+        written = 0  # ссылку удалили между проверкой и вставкой
+    flusher.ensure_started()
+    if not written:
+        link_targets.invalidate(link_id)
+        raise Link.DoesNotExist(f"Link {link_id} not found")
+    return True
+
+
+async def arecord_click(link_id: int, user_key: str, ip: str | None, ua: str) -> bool:
+    """Async-вариант record_click: клик уходит в батчер, запрос не ждёт записи."""
+    if dedup.suppress(link_id, user_key):
+        return False
+    get_batcher().add(make_record(link_id, user_key, ip, ua))
+    return True
+
+
+def flush_pending() -> int:
+    """Синхронно сбрасывает весь spool в БД (management-команда, тесты, shutdown)."""
+    return get_flusher().flush()
+
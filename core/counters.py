@@ -0,0 +1,136 @@
+# core/counters.py
+"""
+Шардированные счётчики кликов.
+
+Запись: clicks += n уходит в случайный из N слотов ссылки (LinkCounterShard),
+а не в одну строку Link — горячая ссылка не становится точкой блокировок.
+Чтение: Link.clicks + сумма слотов. Компакция периодически переносит слоты в Link.clicks.
+Так же, рядом, ведётся window_clicks — клики в период кампании проекта (core/campaigns.py).
+
+settings.CLICK_COUNTER_SHARDS = 0 — старое поведение (UPDATE Link.clicks напрямую).
+"""
+from __future__ import annotations
+
+import random
+from typing import Dict, Mapping
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from core import periodic
+from core.models import Link, LinkCounterShard
+
+
+def shards() -> int:
+    return int(getattr(settings, "CLICK_COUNTER_SHARDS", 0) or 0)
+
+
+# ==========================
+# Запись
+# ==========================
+def add_clicks(per_link: Mapping[int, int], per_link_window: Mapping[int, int] | None = None) -> None:
+    """
+    Увеличивает счётчики ссылок (вызывается внутри транзакции записи кликов).
+    per_link_window — сколько из этих кликов пришлось на период кампании.
+    """
+    per_link_window = per_link_window or {}
+    n_shards = shards()
+    for link_id, n in per_link.items():
+        if n <= 0:
+            continue
+        w = per_link_window.get(link_id, 0)
+        inc = {"clicks": F("clicks") + n}
+        if w:
+            inc["window_clicks"] = F("window_clicks") + w
+        if n_shards <= 0:
+            Link.objects.filter(pk=link_id).update(**inc)
+            continue
+        slot = random.randrange(n_shards)
+        qs = LinkCounterShard.objects.filter(link_id=link_id, slot=slot)
+        if qs.update(**inc):
+            continue
+        try:
+            with transaction.atomic():
+                LinkCounterShard.objects.create(link_id=link_id, slot=slot, clicks=n, window_clicks=w)
+        except IntegrityError:
+            # слот успел создать другой воркер
+            qs.update(**inc)
+
+
+# ==========================
+# Чтение
+# ==========================
+def pending(group_by: str = "link_id", field: str = "clicks", **filters) -> Dict[int, int]:
+    """
+    Ещё не свёрнутые в Link.clicks (field="window_clicks" — в Link.window_clicks) клики,
+    сгруппированные по полю слота, например group_by="link__owner_id", filters={"link__project_id": pk}.
+    """
+    rows = (
+        LinkCounterShard.objects.filter(**filters)
+        .exclude(**{field: 0})
+        .values(group_by)
+        .annotate(s=Sum(field))
+    )
+    return {r[group_by]: r["s"] or 0 for r in rows}
+
+
+def pending_total(field: str = "clicks", **filters) -> int:
+    return LinkCounterShard.objects.filter(**filters).aggregate(s=Sum(field))["s"] or 0
+
+
+def pending_totals(**filters) -> Dict[str, int]:
+    """{"clicks", "window_clicks"} несвёрнутых слотов одним запросом."""
+    row = LinkCounterShard.objects.filter(**filters).aggregate(clicks=Sum("clicks"), window_clicks=Sum("window_clicks"))
+    return {k: v or 0 for k, v in row.items()}
+
+
+def link_clicks(link_id: int) -> int:
+    base = Link.objects.filter(pk=link_id).values_list("clicks", flat=True).first() or 0
+    return base + pending_total(link_id=link_id)
+
+
+# ==========================
+# Компакция
+# ==========================
+def compact(limit: int = 5000) -> int:
+    """
+    Переносит значения слотов в Link.clicks. Из слота вычитается ровно прочитанное
+    значение, поэтому параллельные инкременты не теряются. Возвращает число кликов.
+
+    Чтение слотов — внутри той же транзакции, что и вычитание (SQLite в режиме IMMEDIATE
+    берёт блокировку записи на BEGIN, PostgreSQL — select_for_update): компакции воркеров
+    идут по очереди, и второй не вычтет уже перенесённое первым. Слоты сравниваются
+    с нулём через != 0 — отрицательный остаток старых гонок тоже переносится.
+    """
+    with transaction.atomic():
+        rows = list(
+            LinkCounterShard.objects.select_for_update()
+            .filter(~Q(clicks=0) | ~Q(window_clicks=0))
+            .order_by("id")
+            .values_list("id", "link_id", "clicks", "window_clicks")[:limit]
+        )
+        if not rows:
+            return 0
+
+        per_link: Dict[int, list] = {}
+        for _, link_id, n, w in rows:
+            acc = per_link.setdefault(link_id, [0, 0])
+            acc[0] += n
+            acc[1] += w
+
+        for shard_id, _, n, w in rows:
+            LinkCounterShard.objects.filter(pk=shard_id).update(
+                clicks=F("clicks") - n, window_clicks=F("window_clicks") - w,
+            )
+        for link_id, (n, w) in per_link.items():
+            Link.objects.filter(pk=link_id).update(clicks=F("clicks") + n, window_clicks=F("window_clicks") + w)
+        LinkCounterShard.objects.filter(pk__in=[r[0] for r in rows], clicks=0, window_clicks=0).delete()
+    return sum(n for n, _ in per_link.values())
+
+
+periodic.register(
+    "compact_counters",
+    getattr(settings, "CLICK_COUNTER_COMPACT_INTERVAL", 60.0),
+    compact,
+)
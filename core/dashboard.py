@@ -0,0 +1,50 @@
+# core/dashboard.py
+"""
+Данные главной страницы одним ответом (/api/dashboard): KPI + глобальный лидерборд.
+
+Всё берётся из снимка глобальной доски (LeaderboardEntry): сумма links/clicks по
+участникам и есть итог по всем ссылкам, так что KPI и подиум согласованы между собой.
+Сборка — пять лёгких запросов (версия и строки доски, COUNT проектов, скетч уникальных)
+без GROUP BY и COUNT DISTINCT; пока кэш жив — ни одного.
+
+Результат лежит в общем кэше (core/cache.py) до DASHBOARD_CACHE_TTL секунд под ключом,
+привязанным к версии глобальной доски и каталогу проектов: refresh_leaderboards после
+новых кликов/ссылок и изменения проектов увеличивают версии, и следующий запрос в любом
+воркере собирает ответ заново. Пока версии те же — ни одного запроса в БД.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from django.conf import settings
+
+from core import cache, leaderboards, sketches
+from core.models import Project
+
+
+def ttl() -> float:
+    return float(getattr(settings, "DASHBOARD_CACHE_TTL", 5.0))
+
+
+def build() -> Dict[str, Any]:
+    rows = leaderboards.entries(leaderboards.GLOBAL)
+    items = [
+        {"id": e.member_id, "name": e.member.name, "links": e.links, "clicks": e.clicks or 0}
+        for e in rows
+    ]
+    return {
+        "summary": {
+            "projects": Project.objects.count(),
+            "links": sum(i["links"] for i in items),
+            "clicks": sum(i["clicks"] for i in items),
+            "unique_users": sketches.unique_count(sketches.GLOBAL),
+        },
+        "leaderboard": {"items": items},
+    }
+
+
+def get() -> Dict[str, Any]:
+    deps = [(cache.LEADERBOARD, leaderboards.GLOBAL), (cache.CATALOG, 0)]
+    if ttl() <= 0:
+        return build()
+    return cache.get_or_build("dashboard", deps, ttl(), build)
@@ -0,0 +1,113 @@
+# core/dedup.py
+"""
+Окно дедупликации кликов: повтор (link_id, user_key) в течение CLICK_DEDUP_WINDOW секунд
+после первого клика не пишется — prefetch браузера, двойной тап, ретраи webview мессенджеров.
+
+Окно фиксированное от первого клика: серия частых повторов не продлевает его бесконечно.
+Бэкенды (settings.CLICK_DEDUP_BACKEND):
+- memory — ограниченный LRU в памяти воркера (CLICK_DEDUP_SIZE ключей); повтор,
+  попавший в другой воркер, пройдёт;
+- cache  — атомарный add() в общем кэше (core/cache.py; CLICK_DEDUP_CACHE — другой алиас
+  CACHES), общий для воркеров, если бэкенд не locmem.
+CLICK_DEDUP_WINDOW = 0 — дедупликация выключена.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from django.conf import settings
+
+from core import metrics
+
+
+def window() -> float:
+    return float(getattr(settings, "CLICK_DEDUP_WINDOW", 0) or 0)
+
+
+class MemoryDeduper:
+    def __init__(self, window_s: float, maxsize: int):
+        self.window = window_s
+        self.maxsize = max(1, maxsize)
+        self._seen: "OrderedDict[tuple, float]" = OrderedDict()  # ключ -> момент первого клика
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, link_id: int, user_key: str) -> bool:
+        key = (link_id, user_key)
+        now_ts = time.monotonic()
+        with self._lock:
+            first = self._seen.get(key)
+            if first is not None and now_ts - first < self.window:
+                return True
+            self._seen[key] = now_ts
+            self._seen.move_to_end(key)
+            # самые старые ключи — в начале; истёкшие и лишние выкидываем
+            while self._seen and (
+                len(self._seen) > self.maxsize
+                or now_ts - next(iter(self._seen.values())) >= self.window
+            ):
+                self._seen.popitem(last=False)
+        return False
+
+
+class CacheDeduper:
+    def __init__(self, window_s: float, alias: str = ""):
+        from django.core.cache import caches
+
+        from core import cache
+
+        self.window = window_s
+        self.cache = caches[alias] if alias else cache.backend()
+
+    def is_duplicate(self, link_id: int, user_key: str) -> bool:
+        digest = hashlib.blake2b(f"{link_id}:{user_key}".encode(), digest_size=12).hexdigest()
+        # add() кладёт ключ, только если его нет: первый клик в окне — True, повторы — False
+        return not self.cache.add(f"clickdedup:{digest}", 1, timeout=max(1, round(self.window)))
+
+
+_lock = threading.Lock()
+_deduper = None
+_counts: Dict[str, int] = {"passed": 0, "suppressed": 0}
+
+
+def get_deduper():
+    global _deduper
+    if _deduper is None:
+        with _lock:
+            if _deduper is None:
+                if getattr(settings, "CLICK_DEDUP_BACKEND", "memory") == "cache":
+                    _deduper = CacheDeduper(window(), getattr(settings, "CLICK_DEDUP_CACHE", ""))
+                else:
+                    _deduper = MemoryDeduper(window(), int(getattr(settings, "CLICK_DEDUP_SIZE", 100000)))
+    return _deduper
+
+
+def suppress(link_id: int, user_key: str) -> bool:
+    """True — клик повторный в окне и записывать его не нужно."""
+    if window() <= 0 or not user_key:
+        return False
+    dup = get_deduper().is_duplicate(link_id, user_key)
+    with _lock:
+        _counts["suppressed" if dup else "passed"] += 1
+    return dup
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_counts)
+
+
+def _prometheus_lines() -> List[str]:
+    counts = stats()
+    return [
+        "# HELP utm_click_dedup_total Clicks checked by the dedup window, by result.",
+        "# TYPE utm_click_dedup_total counter",
+        f'utm_click_dedup_total{{result="passed"}} {counts["passed"]}',
+        f'utm_click_dedup_total{{result="suppressed"}} {counts["suppressed"]}',
+    ]
+
+
+metrics.register_collector(_prometheus_lines)
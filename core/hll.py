@@ -0,0 +1,75 @@
+# core/hll.py
+"""
+HyperLogLog — оценка количества уникальных user_key.
+
+p=12 → 4096 регистров по байту, стандартная ошибка ≈ 1.04 / sqrt(4096) ≈ 1.6%.
+Скетчи объединяются поэлементным max, поэтому скетч проекта = merge скетчей его ссылок.
+В БД хранится zlib-сжатый массив регистров (у редко кликаемых ссылок почти одни нули).
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import zlib
+from typing import Iterable
+
+P = 12
+M = 1 << P
+_ALPHA = 0.7213 / (1 + 1.079 / M)
+_REST_BITS = 64 - P
+_POW = [2.0 ** -i for i in range(_REST_BITS + 2)]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    __slots__ = ("registers",)
+
+    def __init__(self, registers: bytes | bytearray | None = None):
+        self.registers = bytearray(registers) if registers else bytearray(M)
+
+    # ---------- запись ----------
+    def add(self, value: str) -> bool:
+        """Добавляет значение. True — если изменился какой-то регистр."""
+        h = _hash64(value)
+        idx = h >> _REST_BITS
+        rest = h & ((1 << _REST_BITS) - 1)
+        rank = _REST_BITS - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+            return True
+        return False
+
+    def update(self, values: Iterable[str]) -> bool:
+        changed = False
+        for v in values:
+            changed = self.add(v) or changed
+        return changed
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    # ---------- чтение ----------
+    def count(self) -> int:
+        regs = self.registers
+        zeros = regs.count(0)
+        if zeros == M:
+            return 0
+        estimate = _ALPHA * M * M / sum(_POW[r] for r in regs)
+        if estimate <= 2.5 * M and zeros:
+            # малые значения — linear counting
+            estimate = M * math.log(M / zeros)
+        return int(round(estimate))
+
+    # ---------- хранение ----------
+    def to_bytes(self) -> bytes:
+        return zlib.compress(bytes(self.registers), 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview | None) -> "HyperLogLog":
+        if not data:
+            return cls()
+        return cls(zlib.decompress(bytes(data)))
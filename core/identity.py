@@ -0,0 +1,127 @@
+# core/identity.py
+"""
+Кэш «кто залогинен»: user_id из сессии -> Member (имя и роль) без запроса в БД.
+
+- на запросе: результат запоминается в request, повторные _current_user/_role бесплатны;
+- между запросами: LRU с коротким TTL (settings.MEMBER_CACHE_TTL) внутри воркера;
+- промах LRU — общий кэш (core/cache.py, ключ от версии member:<id>), затем БД;
+- сброс: post_save/post_delete Member и админ-действия make_editor/unmake_editor
+  (update() не шлёт сигналов) увеличивают версию member:<id> в общем кэше.
+  LRU других воркеров увидят смену роли по истечении TTL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import cache
+from core.models import Member
+
+FIELDS = ("id", "name", "is_editor", "created_at")
+
+_MISSING = object()
+_REQUEST_ATTR = "_utm_member"
+
+
+class MemberCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        # member_id -> (expires, row | None); row — значения FIELDS
+        self._data: "OrderedDict[int, Tuple[float, Tuple | None]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, member_id: int):
+        with self._lock:
+            item = self._data.get(member_id)
+            if item is None or item[0] < time.monotonic():
+                self._data.pop(member_id, None)
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(member_id)
+            self.hits += 1
+            return item[1]
+
+    def store(self, member_id: int, row: Tuple | None) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[member_id] = (time.monotonic() + self.ttl, row)
+            self._data.move_to_end(member_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, member_id: int) -> Member | None:
+        row = self._lookup(member_id)
+        if row is _MISSING:
+            row = cache.get_or_build(
+                f"member:{member_id}", [(cache.MEMBER, member_id)], self.ttl,
+                lambda: Member.objects.filter(pk=member_id).values_list(*FIELDS).first(),
+            )
+            self.store(member_id, row)
+        # каждый раз новый экземпляр — вызывающий код не испортит общий кэш
+        return Member(**dict(zip(FIELDS, row))) if row else None
+
+    def invalidate(self, member_ids: Iterable[int]) -> None:
+        with self._lock:
+            for member_id in member_ids:
+                self._data.pop(member_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"size": len(self._data), "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+members = MemberCache(
+    maxsize=getattr(settings, "MEMBER_CACHE_SIZE", 5000),
+    ttl=getattr(settings, "MEMBER_CACHE_TTL", 30.0),
+)
+
+
+def current_member(request) -> Member | None:
+    """Member текущей сессии; не больше одного обращения к кэшу за запрос."""
+    cached = getattr(request, _REQUEST_ATTR, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    uid = request.session.get("user_id")
+    try:
+        member = members.get(int(uid)) if uid else None
+    except (TypeError, ValueError):
+        member = None
+    setattr(request, _REQUEST_ATTR, member)
+    return member
+
+
+def remember(request, member: Member) -> None:
+    """После логина: кладём только что прочитанного Member в оба уровня кэша."""
+    members.store(member.pk, tuple(getattr(member, f) for f in FIELDS))
+    setattr(request, _REQUEST_ATTR, member)
+
+
+def forget(request) -> None:
+    if hasattr(request, _REQUEST_ATTR):
+        delattr(request, _REQUEST_ATTR)
+
+
+def invalidate(member_ids: Iterable[int]) -> None:
+    member_ids = list(member_ids)
+    members.invalidate(member_ids)
+    cache.bump_many((cache.MEMBER, pk) for pk in member_ids)
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def _member_changed(sender, instance: Member, **kwargs):
+    members.invalidate([instance.pk])
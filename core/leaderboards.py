@@ -0,0 +1,311 @@
+# core/leaderboards.py
+"""
+Материализованные лидерборды (LeaderboardEntry): глобальный (board=0) и по проектам.
+
+Изменения ссылок помечают «грязные» пары (owner, project) строками JobState
+"leaderboard-pair:<owner>:<project>", а клики берутся по отметке JobState "leaderboard-events"
+(последний учтённый ClickEvent.id). Пометки лежат в БД, поэтому их разбирает задача любого
+воркера и они переживают его перезапуск. Периодическая задача пересчитывает строки лишь
+затронутых участников, переранжирует доску и увеличивает её версию (JobState "leaderboard:<board>").
+Версия служит ETag'ом: неизменившаяся доска отдаётся как 304 без GROUP BY.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core import cache, counters, periodic
+from core.models import ClickEvent, JobState, LeaderboardEntry, Link, Member, Project, ProjectMember
+
+GLOBAL = 0
+
+PAIR_PREFIX = "leaderboard-pair:"
+EVENTS_MARK = "leaderboard-events"
+
+
+# ==========================
+# Версии досок (ETag)
+# ==========================
+def _version_name(board: int) -> str:
+    return f"leaderboard:{board}"
+
+
+def version(board: int) -> int:
+    return JobState.objects.filter(name=_version_name(board)).values_list("value", flat=True).first() or 0
+
+
+def bump(board: int, create: bool = True) -> None:
+    """+1 к версии доски; create=False — не создавать версию несобранной доски."""
+    name = _version_name(board)
+    if not JobState.objects.filter(name=name).update(value=F("value") + 1) and create:
+        JobState.objects.get_or_create(name=name, defaults={"value": 1})
+    # кэшированный /api/dashboard привязан к версии доски в общем кэше
+    transaction.on_commit(lambda: cache.bump(cache.LEADERBOARD, board))
+
+
+# ==========================
+# Пересчёт
+# ==========================
+def _aggregate(board: int, owner_ids: List[int] | None) -> Dict[int, Dict[str, int]]:
+    filters: Dict = {}
+    if board != GLOBAL:
+        filters["project_id"] = board
+    if owner_ids is not None:
+        filters["owner_id__in"] = owner_ids
+    rows = (
+        Link.objects.filter(**filters)
+        .values("owner_id")
+        .annotate(
+            links=Count("id"), clicks=Sum("clicks"), window_clicks=Sum("window_clicks"),
+            projects=Count("project", distinct=True),
+        )
+    )
+    agg = {
+        r["owner_id"]: {
+            "links": r["links"], "clicks": r["clicks"] or 0,
+            "window_clicks": r["window_clicks"] or 0, "projects": r["projects"],
+        }
+        for r in rows
+    }
+    shard_filters = {f"link__{k}": v for k, v in filters.items()}
+    for field in ("clicks", "window_clicks"):
+        for owner_id, n in counters.pending("link__owner_id", field, **shard_filters).items():
+            if owner_id in agg:
+                agg[owner_id][field] += n
+    return agg
+
+
+def _rerank(board: int) -> None:
+    entries = list(
+        LeaderboardEntry.objects.filter(board=board)
+        .select_related("member")
+        .order_by("-clicks", "-links", "member__name")
+    )
+    changed = []
+    for i, e in enumerate(entries, start=1):
+        if e.rank != i:
+            e.rank = i
+            changed.append(e)
+    LeaderboardEntry.objects.bulk_update(changed, ["rank"], batch_size=500)
+
+
+def refresh(board: int, owner_ids: Iterable[int] | None = None) -> None:
+    """Пересчитывает строки участников owner_ids (None — всю доску) и версию доски."""
+    owner_ids = None if owner_ids is None else sorted(set(owner_ids))
+    if board != GLOBAL and not Project.objects.filter(pk=board).exists():
+        # проект удалён — доски больше нет, версию не заводим
+        LeaderboardEntry.objects.filter(board=board).delete()
+        JobState.objects.filter(name=_version_name(board)).delete()
+        return
+    if owner_ids is not None and not version(board):
+        owner_ids = None  # доска ещё не собиралась — частичный пересчёт дал бы неполный снимок
+    with transaction.atomic():
+        agg = _aggregate(board, owner_ids)
+        qs = LeaderboardEntry.objects.filter(board=board)
+        if owner_ids is not None:
+            qs = qs.filter(member_id__in=owner_ids)
+        existing = {e.member_id: e for e in qs}
+
+        to_create, to_update, gone = [], [], []
+        for member_id in set(existing) | set(agg):
+            row = agg.get(member_id)
+            e = existing.get(member_id)
+            if row is None:
+                gone.append(e.pk)  # у участника больше нет ссылок в этой доске
+            elif e is None:
+                to_create.append(LeaderboardEntry(board=board, member_id=member_id, **row))
+            elif any(getattr(e, f) != v for f, v in row.items()):
+                for f, v in row.items():
+                    setattr(e, f, v)
+                to_update.append(e)
+
+        if gone:
+            LeaderboardEntry.objects.filter(pk__in=gone).delete()
+        LeaderboardEntry.objects.bulk_create(to_create, batch_size=500)
+        LeaderboardEntry.objects.bulk_update(
+            to_update, ["links", "clicks", "window_clicks", "projects", "updated_at"], batch_size=500,
+        )
+        if to_create or to_update or gone or owner_ids is None:
+            _rerank(board)
+            bump(board)
+
+
+def rebuild() -> None:
+    """Полная пересборка всех досок."""
+    boards = [GLOBAL] + sorted(set(Link.objects.values_list("project_id", flat=True)))
+    LeaderboardEntry.objects.exclude(board__in=boards).delete()
+    for board in boards:
+        refresh(board)
+
+
+def ensure_built(board: int) -> None:
+    """Первое обращение к доске (версия 0) — собираем её целиком."""
+    if not version(board):
+        refresh(board)
+
+
+def entries(board: int) -> List[LeaderboardEntry]:
+    ensure_built(board)
+    return list(
+        LeaderboardEntry.objects.filter(board=board)
+        .select_related("member")
+        .order_by("rank")
+    )
+
+
+def etag(board: int) -> str | None:
+    v = version(board)
+    return f"lb-{board}-{v}" if v else None
+
+
+# ==========================
+# Грязные пары -> инкрементальный пересчёт
+# ==========================
+def _pair_name(owner_id: int, project_id: int) -> str:
+    return f"{PAIR_PREFIX}{owner_id}:{project_id}"
+
+
+def mark_pairs(pairs: Iterable[Tuple[int, int]]) -> None:
+    """Помечает пары (owner_id, project_id); повторная пометка увеличивает счётчик строки."""
+    from core.clicks import start_background
+
+    for owner_id, project_id in set(pairs):
+        name = _pair_name(owner_id, project_id)
+        if not JobState.objects.filter(name=name).update(value=F("value") + 1):
+            JobState.objects.get_or_create(name=name)
+    # пометки разбирает фоновый поток — убедимся, что в этом воркере он запущен
+    start_background()
+
+
+def mark_pair(owner_id: int, project_id: int) -> None:
+    mark_pairs([(owner_id, project_id)])
+
+
+def mark_links(link_ids: Iterable[int]) -> None:
+    mark_pairs(Link.objects.filter(pk__in=list(link_ids)).values_list("owner_id", "project_id").distinct())
+
+
+def _clicked_pairs() -> Tuple[Set[Tuple[int, int]], int | None]:
+    """Пары ссылок с кликами после отметки и новая отметка (None — двигать нечего)."""
+    last = ClickEvent.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+    mark = JobState.objects.filter(name=EVENTS_MARK).values_list("value", flat=True).first()
+    if mark is None:
+        # первый запуск: несобранные доски всё равно соберутся целиком при первом обращении
+        JobState.objects.get_or_create(name=EVENTS_MARK, defaults={"value": last})
+        return set(), None
+    if last <= mark:
+        return set(), None
+    pairs = set(
+        ClickEvent.objects.filter(pk__gt=mark, pk__lte=last)
+        .values_list("link__owner_id", "link__project_id")
+        .distinct()
+    )
+    return pairs, last
+
+
+def refresh_dirty() -> int:
+    """Пересчитывает доски для накопленных изменений. Возвращает число затронутых досок."""
+    marked = list(JobState.objects.filter(name__startswith=PAIR_PREFIX).values_list("name", "value"))
+    pairs = {tuple(int(x) for x in name[len(PAIR_PREFIX):].split(":")) for name, _ in marked}
+    clicked, last = _clicked_pairs()
+    pairs |= clicked
+    if pairs:
+        boards: Dict[int, Set[int]] = {GLOBAL: set()}
+        for owner_id, project_id in pairs:
+            boards[GLOBAL].add(owner_id)
+            boards.setdefault(project_id, set()).add(owner_id)
+        # при ошибке пометки и отметка остаются на месте — следующий проход повторит пересчёт
+        for board, owners in boards.items():
+            refresh(board, owners)
+
+    if marked:
+        # снимаем только не тронутые за время пересчёта: новая пометка увеличила value
+        done = Q()
+        for name, value in marked:
+            done |= Q(name=name, value=value)
+        JobState.objects.filter(done).delete()
+    if last is not None:
+        JobState.objects.filter(name=EVENTS_MARK, value__lt=last).update(value=last)
+    return len(boards) if pairs else 0
+
+
+periodic.register(
+    "refresh_leaderboards",
+    getattr(settings, "LEADERBOARD_REFRESH_INTERVAL", 5.0),
+    refresh_dirty,
+)
+
+
+@receiver(pre_save, sender=Link)
+def _remember_pair(sender, instance: Link, **kwargs):
+    instance._utm_board_pair = (
+        Link.objects.filter(pk=instance.pk).values_list("owner_id", "project_id").first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def _link_changed(sender, instance: Link, **kwargs):
+    pairs = [(instance.owner_id, instance.project_id)]
+    old = getattr(instance, "_utm_board_pair", None)
+    if old is not None:
+        # ссылку передали другому участнику/в другой проект — прежняя строка тоже устарела
+        pairs.append(old)
+    mark_pairs(pairs)
+
+
+def _member_boards(member_id: int) -> Set[int]:
+    """Глобальная доска, доски со строкой участника и проекты, в которых он состоит."""
+    boards = {GLOBAL}
+    boards.update(LeaderboardEntry.objects.filter(member_id=member_id).values_list("board", flat=True))
+    boards.update(ProjectMember.objects.filter(member_id=member_id).values_list("project_id", flat=True))
+    return boards
+
+
+def _touch(boards: Iterable[int]) -> None:
+    """Переранжирует собранные доски и сдвигает их версии — строки не пересчитываются."""
+    for board in sorted(set(boards)):
+        if version(board):
+            _rerank(board)
+            bump(board, create=False)
+
+
+@receiver(pre_save, sender=Member)
+def _remember_name(sender, instance: Member, **kwargs):
+    instance._utm_board_name = (
+        Member.objects.filter(pk=instance.pk).values_list("name", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Member)
+def _member_changed(sender, instance: Member, created: bool = False, **kwargs):
+    old = getattr(instance, "_utm_board_name", None)
+    if not created and old is not None and old != instance.name:
+        # имя видно во всех досках участника и участвует в порядке при равных кликах
+        _touch(_member_boards(instance.pk))
+    else:
+        # роль/новый участник видны только в /api/members — сбрасываем ETag глобальной доски
+        bump(GLOBAL, create=False)
+
+
+@receiver(pre_delete, sender=Member)
+def _remember_boards(sender, instance: Member, **kwargs):
+    # строки участника удалятся каскадом раньше post_delete — доски запоминаем заранее
+    instance._utm_boards = _member_boards(instance.pk)
+
+
+@receiver(post_delete, sender=Member)
+def _member_deleted(sender, instance: Member, **kwargs):
+    _touch(getattr(instance, "_utm_boards", {GLOBAL}))
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def _membership_changed(sender, instance: ProjectMember, **kwargs):
+    bump(instance.project_id, create=False)
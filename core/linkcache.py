@@ -0,0 +1,123 @@
+# core/linkcache.py
+"""
+Кэш link_id -> target_url внутри воркера (для /go/<pk> и /api/track-click/, sync и async).
+
+- LRU с ограничением по размеру (settings.LINK_CACHE_SIZE);
+- TTL на запись (settings.LINK_CACHE_TTL) — страховка для других воркеров:
+  сигналы save/delete сбрасывают запись только в том процессе, где ссылку изменили;
+- отсутствующие ссылки тоже кэшируются (None), чтобы перебор id не бил в БД;
+- промах sync-пути сначала идёт в общий кэш (core/cache.py, ключ от версии link:<id>)
+  и только потом в БД: новый воркер или истёкшая запись не бьют в БД, а изменённую
+  ссылку другие воркеры дочитают оттуда уже новой. async-путь на промахе идёт прямо в БД,
+  чтобы не блокировать event loop обращением к бэкенду кэша.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import cache
+from core.models import Link
+
+
+_MISSING = object()
+
+
+class LinkTargetCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[int, Tuple[float, str | None]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, link_id: int):
+        with self._lock:
+            item = self._data.get(link_id)
+            if item is None:
+                self.misses += 1
+                return _MISSING
+            expires, target = item
+            if expires < time.monotonic():
+                del self._data[link_id]
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(link_id)
+            self.hits += 1
+            return target
+
+    def _store(self, link_id: int, target: str | None) -> None:
+        with self._lock:
+            self._data[link_id] = (time.monotonic() + self.ttl, target)
+            self._data.move_to_end(link_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, link_id: int) -> str | None:
+        """target_url ссылки или None, если такой ссылки нет."""
+        target = self._lookup(link_id)
+        if target is _MISSING:
+            target = cache.get_or_build(
+                f"target:{link_id}", [(cache.LINK, link_id)], self.ttl,
+                lambda: Link.objects.filter(pk=link_id).values_list("target_url", flat=True).first(),
+            )
+            self._store(link_id, target)
+        return target
+
+    async def aget(self, link_id: int) -> str | None:
+        """То же для async-вьюх: попадание в кэш не трогает ни БД, ни пул потоков."""
+        target = self._lookup(link_id)
+        if target is _MISSING:
+            target = await Link.objects.filter(pk=link_id).values_list("target_url", flat=True).afirst()
+            self._store(link_id, target)
+        return target
+
+    def invalidate(self, link_id: int) -> None:
+        with self._lock:
+            self._data.pop(link_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+link_targets = LinkTargetCache(
+    maxsize=getattr(settings, "LINK_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "LINK_CACHE_TTL", 300.0),
+)
+
+
+def get_target(link_id: int) -> str | None:
+    return link_targets.get(int(link_id))
+
+
+async def aget_target(link_id: int) -> str | None:
+    return await link_targets.aget(int(link_id))
+
+
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def _invalidate_link(sender, instance: Link, **kwargs):
+    link_targets.invalidate(instance.pk)
@@ -0,0 +1,33 @@
+# core/management/commands/archive_clicks.py
+from django.db import connection
+from django.core.management.base import BaseCommand
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Выносит ClickEvent старше N дней в gzip-архив по дням (CLICK_ARCHIVE_DIR) "
+        "и удаляет их из горячей таблицы пачками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="по умолчанию CLICK_RETENTION_DAYS")
+        parser.add_argument("--batch-size", type=int, default=None, help="по умолчанию CLICK_RETENTION_BATCH")
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="только посчитать")
+        parser.add_argument("--vacuum", action="store_true", help="после удаления вернуть место ОС (SQLite VACUUM)")
+
+    def handle(self, *args, **opts):
+        days = retention.retention_days() if opts["days"] is None else opts["days"]
+        if days <= 0:
+            self.stdout.write("retention disabled (CLICK_RETENTION_DAYS=0); pass --days N")
+            return
+        res = retention.run(
+            days=days, batch_size=opts["batch_size"], max_batches=opts["max_batches"], dry_run=opts["dry_run"],
+        )
+        self.stdout.write(f"events={res['events']} batches={res['batches']} archive={retention.archive_dir()}")
+        if opts["vacuum"] and not opts["dry_run"] and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write("vacuum done")
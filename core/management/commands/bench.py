@@ -0,0 +1,244 @@
+# core/management/commands/bench.py
+"""
+Воспроизводимый бенчмарк эндпоинтов: /go/<pk>, /api/track-click/ и статистика.
+
+Во временной SQLite-базе создаётся набор данных заданного объёма
+(проекты, участники, ссылки, клики за --days дней), строятся скетчи, rollup'ы
+и лидерборды, затем каждый эндпоинт прогоняется через тестовый клиент Django.
+На эндпоинт: req/s, p50/p95/p99 и число SQL-запросов на запрос.
+
+    python manage.py bench --links 500 --clicks 100000 --requests 300 --json bench.json
+    python manage.py bench --compare bench.json        # сравнить с прошлым прогоном
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.loadtest import _percentile
+
+# клики без User-Agent core/bots.py считает ботом — харнесс ходит как браузер
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+# имя -> шаблон пути; {link}, {project} подставляются по кругу из засеянных id
+ENDPOINTS = (
+    ("go", "/go/{link}?user=bench{i}"),
+    ("track_click", "/api/track-click/?link={link}&user=bench{i}"),
+    ("link_stats", "/api/link-stats/{link}/"),
+    ("link_stats_batch", "/api/link-stats?ids={links20}"),
+    ("project_stats_global", "/api/project-stats/"),
+    ("project_stats_one", "/api/project-stats/{project}/"),
+    ("summary", "/api/summary"),
+    ("global_leaderboard", "/api/leaderboard/global"),
+    ("project_leaderboard", "/api/projects/{project}/leaderboard"),
+    ("project_members", "/api/projects/{project}/members"),
+    ("members_list", "/api/members"),
+    ("link_timeseries", "/api/links/{link}/timeseries"),
+    ("project_timeseries", "/api/projects/{project}/timeseries"),
+)
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк редиректа, трекинга и стат-эндпоинтов на засеянных данных."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=5)
+        parser.add_argument("--members", type=int, default=20)
+        parser.add_argument("--links", type=int, default=200)
+        parser.add_argument("--clicks", type=int, default=20000)
+        parser.add_argument("--users", type=int, default=5000, help="различных user_key среди кликов")
+        parser.add_argument("--days", type=int, default=30, help="клики распределяются на столько дней назад")
+        parser.add_argument("--requests", type=int, default=200, help="запросов на эндпоинт")
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--endpoint", action="append", dest="endpoints", help="только эти эндпоинты")
+        parser.add_argument("--ingest", choices=("sync", "buffered"), default="sync")
+        parser.add_argument("--random-seed", type=int, default=42)
+        parser.add_argument("--json", dest="json_path", default=None, help="сохранить результат в файл")
+        parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+        parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+
+    # ---------- дочерний процесс (во временной БД) ----------
+    def _seed(self, opts):
+        from django.utils import timezone
+
+        from core import leaderboards, rollups, sketches, useragents
+        from core.models import ClickEvent, Link, Member, Project
+
+        rnd = random.Random(opts["random_seed"])
+        projects = Project.objects.bulk_create([Project(name=f"p{i}") for i in range(opts["projects"])])
+        members = Member.objects.bulk_create([Member(name=f"m{i}") for i in range(opts["members"])])
+        for p in projects:
+            p.members.add(*members)
+        links = Link.objects.bulk_create([
+            Link(
+                project=projects[i % len(projects)], owner=members[i % len(members)],
+                name=f"l{i}", target_url=f"https://example.com/{i}",
+            )
+            for i in range(opts["links"])
+        ])
+
+        ua_id = useragents.resolve(["bench"])["bench"]
+        now = timezone.now()
+        span = opts["days"] * 86400
+        per_link = Counter()
+        batch = []
+        for _ in range(opts["clicks"]):
+            link = links[int(rnd.paretovariate(1.2)) % len(links)]  # несколько «горячих» ссылок
+            per_link[link.pk] += 1
+            batch.append(ClickEvent(
+                link=link, user_key=f"u{rnd.randrange(opts['users'])}", ip="127.0.0.1", user_agent_id=ua_id,
+                created_at=now - timedelta(seconds=rnd.randrange(span)),
+            ))
+            if len(batch) >= 5000:
+                ClickEvent.objects.bulk_create(batch)
+                batch = []
+        ClickEvent.objects.bulk_create(batch)
+        for link in links:
+            link.clicks = per_link[link.pk]
+        Link.objects.bulk_update(links, ["clicks"], batch_size=500)
+
+        sketches.rebuild()
+        rollups.materialize_all()
+        leaderboards.rebuild()
+        return [l.pk for l in links], [p.pk for p in projects]
+
+    def _measure(self, client, name, template, link_ids, project_ids, opts):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def path(i):
+            return template.format(
+                i=i,
+                link=link_ids[i % len(link_ids)],
+                project=project_ids[i % len(project_ids)],
+                links20=",".join(str(link_ids[(i + k) % len(link_ids)]) for k in range(20)),
+            )
+
+        for i in range(opts["warmup"]):
+            client.get(path(i))
+
+        latencies, statuses = [], Counter()
+        t0 = time.perf_counter()
+        for i in range(opts["requests"]):
+            r0 = time.perf_counter()
+            resp = client.get(path(i))
+            latencies.append(time.perf_counter() - r0)
+            statuses[resp.status_code] += 1
+        wall = time.perf_counter() - t0
+
+        # число запросов меряем отдельным проходом, чтобы не искажать тайминги
+        queries = []
+        for i in range(min(20, opts["requests"])):
+            with CaptureQueriesContext(connection) as ctx:
+                client.get(path(opts["requests"] + i))
+            queries.append(len(ctx.captured_queries))
+
+        latencies.sort()
+        return {
+            "endpoint": name,
+            "path": template,
+            "requests": len(latencies),
+            "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+            "queries_avg": round(sum(queries) / len(queries), 2) if queries else 0,
+            "queries_max": max(queries) if queries else 0,
+            "statuses": {str(k): v for k, v in statuses.items()},
+        }
+
+    def _child(self, opts):
+        from django.test import Client
+
+        link_ids, project_ids = self._seed(opts)
+        client = Client(HTTP_HOST="localhost", HTTP_USER_AGENT=BROWSER_UA)
+        wanted = set(opts["endpoints"] or [name for name, _ in ENDPOINTS])
+        rows = [
+            self._measure(client, name, template, link_ids, project_ids, opts)
+            for name, template in ENDPOINTS
+            if name in wanted
+        ]
+        self.stdout.write(json.dumps(rows))
+
+    # ---------- родитель ----------
+    def _manage(self, env, *args):
+        cmd = [sys.executable, str(settings.BASE_DIR / "manage.py"), *args]
+        return subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+
+    def _child_args(self, opts):
+        args = ["bench", "--child"]
+        for key in ("projects", "members", "links", "clicks", "users", "days", "requests", "warmup", "random_seed"):
+            args += [f"--{key.replace('_', '-')}", str(opts[key])]
+        for name in opts["endpoints"] or []:
+            args += ["--endpoint", name]
+        return args
+
+    def _git_rev(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            ).stdout.strip() or None
+        except OSError:
+            return None
+
+    def _print(self, rows, baseline):
+        base = {r["endpoint"]: r for r in baseline}
+        self.stdout.write(f"{'endpoint':<22}{'req/s':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'queries':>9}")
+        for r in rows:
+            line = (
+                f"{r['endpoint']:<22}{r['rps']:>9}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{r['queries_avg']:>9}"
+            )
+            old = base.get(r["endpoint"])
+            if old and old["rps"]:
+                line += f"   rps x{r['rps'] / old['rps']:.2f}, queries {old['queries_avg']} -> {r['queries_avg']}"
+            self.stdout.write(line)
+
+    def handle(self, *args, **opts):
+        if opts["child"]:
+            return self._child(opts)
+
+        unknown = set(opts["endpoints"] or []) - {name for name, _ in ENDPOINTS}
+        if unknown:
+            raise CommandError(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}")
+
+        baseline = []
+        if opts["compare"]:
+            with open(opts["compare"]) as f:
+                baseline = json.load(f)["endpoints"]
+
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+            env = dict(os.environ)
+            env.update({
+                "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3"),
+                "CLICK_SPOOL_PATH": os.path.join(tmp, "spool.sqlite3"),
+                "CACHE_LOCATION": os.path.join(tmp, "cache.sqlite3"),
+                "CLICK_INGEST_MODE": opts["ingest"],
+            })
+            self._manage(env, "migrate", "--noinput", "-v", "0")
+            out = self._manage(env, *self._child_args(opts))
+            rows = json.loads(out.strip().splitlines()[-1])
+
+        self._print(rows, baseline)
+        if opts["json_path"]:
+            result = {
+                "meta": {
+                    "commit": self._git_rev(),
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "ingest": opts["ingest"],
+                    **{k: opts[k] for k in ("projects", "members", "links", "clicks", "users", "days", "requests")},
+                },
+                "endpoints": rows,
+            }
+            with open(opts["json_path"], "w") as f:
+                json.dump(result, f, indent=2)
@@ -0,0 +1,144 @@
+# core/management/commands/bench_middleware.py
+"""
+Накладные расходы цепочки middleware на эндпоинтах трекинга: полный MIDDLEWARE
+(обычный WSGIHandler) против fast lane (utmtracker/fastlane.py, MIDDLEWARE без FAST_LANE_SKIP_MIDDLEWARE).
+
+Во временной SQLite-базе создаётся одна ссылка, затем оба обработчика по очереди
+получают одинаковые WSGI-запросы к /go/<pk> и /api/track-click/ прямо в процессе,
+без сети. По умолчанию User-Agent — не-превью бот: клик не пишется, и в замер попадает
+только путь запроса через Django (--ua "Mozilla/5.0" — с записью клика).
+
+    python manage.py bench_middleware --requests 3000
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.management.commands.loadtest import _percentile
+
+PATHS = (
+    ("go", "/go/{link}", "user=bench"),
+    ("track_click", "/api/track-click/", "link={link}&user=bench"),
+)
+
+
+class Command(BaseCommand):
+    help = "Замер накладных расходов middleware: полный стек против fast lane."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="запросов на путь и режим")
+        parser.add_argument("--warmup", type=int, default=200)
+        parser.add_argument("--ua", default="curl/8.5 (bench)")
+        parser.add_argument("--json", dest="json_path", default=None, help="сохранить результат в файл")
+        parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+
+    # ---------- дочерний процесс (временная БД) ----------
+    def _environ(self, path, query, ua):
+        return {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "HTTP_USER_AGENT": ua,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(b""),
+        }
+
+    def _call(self, handler, environ):
+        status = []
+        body = handler(dict(environ, **{"wsgi.input": io.BytesIO(b"")}), lambda s, h: status.append(s))
+        for _ in body:
+            pass
+        if hasattr(body, "close"):
+            body.close()
+        return status[0]
+
+    def _child(self, opts):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        from core.models import Link, Member, Project
+        from utmtracker.fastlane import FastLaneWSGIHandler
+
+        link = Link.objects.create(
+            project=Project.objects.create(name="bench"), owner=Member.objects.create(name="bench"),
+            name="bench", target_url="https://example.com/",
+        )
+        handlers = {"full": WSGIHandler(), "fast_lane": FastLaneWSGIHandler()}
+        rows = []
+        for name, path, query in PATHS:
+            environ = self._environ(path.format(link=link.pk), query.format(link=link.pk), opts["ua"])
+            timings = {mode: [] for mode in handlers}
+            statuses = {}
+            for mode, handler in handlers.items():
+                for _ in range(opts["warmup"]):
+                    statuses[mode] = self._call(handler, environ)
+            # режимы чередуются, чтобы дрейф (кэши, GC) одинаково влиял на оба
+            for _ in range(opts["requests"]):
+                for mode, handler in handlers.items():
+                    t0 = time.perf_counter()
+                    self._call(handler, environ)
+                    timings[mode].append((time.perf_counter() - t0) * 1e6)
+            for mode, ts in timings.items():
+                ts.sort()
+                rows.append({
+                    "endpoint": name,
+                    "mode": mode,
+                    "status": statuses[mode],
+                    "mean_us": round(sum(ts) / len(ts), 1),
+                    "p50_us": round(_percentile(ts, 0.50), 1),
+                    "p99_us": round(_percentile(ts, 0.99), 1),
+                })
+        self.stdout.write(json.dumps(rows))
+
+    # ---------- родитель ----------
+    def handle(self, *args, **opts):
+        if opts["child"]:
+            return self._child(opts)
+
+        with tempfile.TemporaryDirectory(prefix="bench-mw-") as tmp:
+            env = dict(os.environ)
+            env.update({
+                "SQLITE_PATH": os.path.join(tmp, "db.sqlite3"),
+                "CLICK_SPOOL_PATH": os.path.join(tmp, "spool.sqlite3"),
+                "CACHE_LOCATION": os.path.join(tmp, "cache.sqlite3"),
+                "CLICK_INGEST_MODE": "buffered",
+                "CLICK_DEDUP_WINDOW": "0",  # один и тот же user=bench — иначе пишется только первый клик
+                "REDIRECT_TABLE_PATH": "",
+                "METRICS_SAMPLE_RATE": "0",
+                "EXTRA_ALLOWED_HOSTS": "localhost",
+            })
+            manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+            subprocess.run([*manage, "migrate", "--noinput", "-v", "0"], env=env, check=True)
+            out = subprocess.run(
+                [*manage, "bench_middleware", "--child", "--requests", str(opts["requests"]),
+                 "--warmup", str(opts["warmup"]), "--ua", opts["ua"]],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+        rows = json.loads(out.strip().splitlines()[-1])
+
+        by_key = {(r["endpoint"], r["mode"]): r for r in rows}
+        for r in rows:
+            self.stdout.write(
+                f"{r['endpoint']:>12} {r['mode']:>9}: mean={r['mean_us']:>8} us  p50={r['p50_us']:>8} us  "
+                f"p99={r['p99_us']:>8} us  [{r['status']}]"
+            )
+        for name, _, _ in PATHS:
+            full, fast = by_key[(name, "full")], by_key[(name, "fast_lane")]
+            self.stdout.write(
+                f"{name}: fast lane saves {full['mean_us'] - fast['mean_us']:.1f} us/request "
+                f"({(1 - fast['mean_us'] / full['mean_us']) * 100:.0f}%)"
+            )
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as f:
+                json.dump(rows, f, indent=2)
@@ -0,0 +1,129 @@
+# core/management/commands/bench_sqlite.py
+"""
+Сравнение пропускной способности /go/<pk> на SQLite без профиля и с профилем (SQLITE_TUNING).
+
+Для каждого режима: отдельная временная БД, migrate, N ссылок, затем W процессов
+(как воркеры gunicorn) одновременно делают R редиректов через тестовый клиент Django.
+Запись кликов — sync, чтобы мерить именно конкуренцию за запись в БД.
+
+    python manage.py bench_sqlite --workers 3 --requests 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.management.commands.bench import BROWSER_UA
+
+MODES = (("default", "0"), ("tuned", "1"))
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк редиректов на SQLite: без PRAGMA-профиля и с ним."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=3)
+        parser.add_argument("--requests", type=int, default=500, help="редиректов на воркер")
+        parser.add_argument("--links", type=int, default=50)
+        parser.add_argument("--json", dest="json_path", default=None, help="сохранить результат в файл")
+        # служебные режимы дочерних процессов
+        parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+        parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+        parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+
+    # ---------- дочерние процессы ----------
+    def _seed(self, opts):
+        from core.models import Link, Member, Project
+
+        owner = Member.objects.create(name="bench")
+        project = Project.objects.create(name="bench")
+        Link.objects.bulk_create(
+            [Link(project=project, owner=owner, name=f"l{i}", target_url="https://example.com/") for i in range(opts["links"])]
+        )
+
+    def _child(self, opts):
+        from django.test import Client
+
+        from core.models import Link
+
+        ids = list(Link.objects.values_list("id", flat=True))
+        client = Client(HTTP_HOST="localhost", HTTP_USER_AGENT=BROWSER_UA)
+        while time.time() < opts["start_at"]:
+            time.sleep(0.001)
+        ok = errors = 0
+        t0 = time.perf_counter()
+        for i in range(opts["requests"]):
+            try:
+                resp = client.get(f"/go/{ids[i % len(ids)]}", {"user": f"u{os.getpid()}-{i}"})
+                ok += resp.status_code == 302
+                errors += resp.status_code != 302
+            except Exception:
+                errors += 1
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(json.dumps({"ok": ok, "errors": errors, "elapsed": elapsed}))
+
+    # ---------- родитель ----------
+    def _manage(self, env, *args, capture=False):
+        cmd = [sys.executable, str(settings.BASE_DIR / "manage.py"), *args]
+        if capture:
+            return subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True)
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    def _run_mode(self, tmp, name, tuning, opts):
+        env = dict(os.environ)
+        env.update({
+            "SQLITE_PATH": os.path.join(tmp, f"{name}.sqlite3"),
+            "SQLITE_TUNING": tuning,
+            "CLICK_INGEST_MODE": "sync",
+            "CLICK_SPOOL_PATH": os.path.join(tmp, f"{name}-spool.sqlite3"),
+            "CACHE_LOCATION": os.path.join(tmp, f"{name}-cache.sqlite3"),
+        })
+        self._manage(env, "migrate", "--noinput", "-v", "0")
+        self._manage(env, "bench_sqlite", "--seed", "--links", str(opts["links"]))
+
+        start_at = time.time() + 1.0  # все воркеры стартуют одновременно
+        procs = [
+            self._manage(
+                env, "bench_sqlite", "--child", "--requests", str(opts["requests"]),
+                "--start-at", str(start_at), capture=True,
+            )
+            for _ in range(opts["workers"])
+        ]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        wall = max(r["elapsed"] for r in results)
+        ok = sum(r["ok"] for r in results)
+        return {
+            "mode": name,
+            "workers": opts["workers"],
+            "requests": ok + sum(r["errors"] for r in results),
+            "ok": ok,
+            "errors": sum(r["errors"] for r in results),
+            "wall_s": round(wall, 3),
+            "rps": round(ok / wall, 1) if wall else 0.0,
+        }
+
+    def handle(self, *args, **opts):
+        if opts["seed"]:
+            return self._seed(opts)
+        if opts["child"]:
+            return self._child(opts)
+
+        with tempfile.TemporaryDirectory(prefix="bench-sqlite-") as tmp:
+            rows = [self._run_mode(tmp, name, tuning, opts) for name, tuning in MODES]
+
+        for r in rows:
+            self.stdout.write(
+                f"{r['mode']:>8}: {r['rps']:>8} req/s  ok={r['ok']} errors={r['errors']} "
+                f"wall={r['wall_s']}s ({r['workers']} workers)"
+            )
+        if rows[0]["rps"]:
+            self.stdout.write(f"speedup: x{rows[1]['rps'] / rows[0]['rps']:.2f}")
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as f:
+                json.dump(rows, f, indent=2)
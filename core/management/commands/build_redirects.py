@@ -0,0 +1,15 @@
+# core/management/commands/build_redirects.py
+from django.core.management.base import BaseCommand
+
+from core import redirects
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает таблицу редиректов /go/<code> (settings.REDIRECT_TABLE_PATH)."
+
+    def handle(self, *args, **opts):
+        if not redirects.path():
+            self.stdout.write("REDIRECT_TABLE_PATH пуст — таблица отключена")
+            return
+        n = redirects.rebuild()
+        self.stdout.write(f"ok: {n} ссылок -> {redirects.path()}")
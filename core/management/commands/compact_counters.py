@@ -0,0 +1,20 @@
+# core/management/commands/compact_counters.py
+from django.core.management.base import BaseCommand
+
+from core.counters import compact
+
+
+class Command(BaseCommand):
+    help = "Сворачивает слоты шардированных счётчиков в Link.clicks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=5000, help="слотов за один проход")
+
+    def handle(self, *args, **opts):
+        total = 0
+        while True:
+            n = compact(limit=opts["limit"])
+            if not n:
+                break
+            total += n
+        self.stdout.write(f"compacted_clicks={total}")
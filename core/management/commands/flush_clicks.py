@@ -0,0 +1,20 @@
+# core/management/commands/flush_clicks.py
+from django.core.management.base import BaseCommand
+
+from core.clicks import get_flusher
+
+
+class Command(BaseCommand):
+    help = "Переносит накопленные в spool клики в ClickEvent / Link.clicks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batches", type=int, default=None, help="максимум пачек за запуск")
+        parser.add_argument("--requeue-dead", action="store_true", help="вернуть записи spool_dead в очередь")
+
+    def handle(self, *args, **opts):
+        flusher = get_flusher()
+        if opts["requeue_dead"]:
+            self.stdout.write(f"requeued={flusher.spool.requeue_dead()}")
+        written = flusher.flush(max_batches=opts["batches"])
+        left = flusher.spool.pending()
+        self.stdout.write(f"flushed={written} pending={left} dead={flusher.spool.dead()}")
@@ -0,0 +1,118 @@
+# core/management/commands/loadtest.py
+"""
+Нагрузочный тест живого сервера (gunicorn WSGI / uvicorn ASGI) по HTTP/1.1 keep-alive.
+
+C соединений параллельно делают N запросов к путям --path (по кругу),
+печатаются req/s, p50/p95/p99 и распределение статусов.
+
+    python manage.py loadtest http://127.0.0.1:8002 --path /go/1 --path /go/2 -c 50 -n 5000
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест HTTP-эндпоинтов работающего сервера."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="http://host:port")
+        parser.add_argument("--path", action="append", dest="paths", help="путь запроса (можно несколько)")
+        parser.add_argument("-c", "--concurrency", type=int, default=50)
+        parser.add_argument("-n", "--requests", type=int, default=5000, help="всего запросов")
+        parser.add_argument("--host-header", default=None, help="заголовок Host (по умолчанию из url)")
+        parser.add_argument("--json", dest="json_path", default=None, help="сохранить результат в файл")
+
+    async def _worker(self, host, port, host_header, paths, counter, latencies, statuses):
+        reader = writer = None
+        try:
+            while True:
+                i = next(counter)
+                if i >= self.total:
+                    return
+                path = paths[i % len(paths)]
+                sep = "&" if "?" in path else "?"
+                req = (
+                    f"GET {path}{sep}user=lt{i} HTTP/1.1\r\n"
+                    f"Host: {host_header}\r\n"
+                    "User-Agent: loadtest/1.0\r\n"
+                    "Connection: keep-alive\r\n\r\n"
+                ).encode()
+                t0 = time.perf_counter()
+                if writer is None:
+                    # gunicorn sync-воркеры не держат keep-alive — соединение на каждый запрос
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(req)
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                status = int(lines[0].split()[1])
+                length, close = 0, False
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    name = name.lower()
+                    if name == "content-length":
+                        length = int(value)
+                    elif name == "connection":
+                        close = value.strip().lower() == "close"
+                if length:
+                    await reader.readexactly(length)
+                latencies.append(time.perf_counter() - t0)
+                statuses[status] += 1
+                if close:
+                    writer.close()
+                    reader = writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def _run(self, opts):
+        parts = urlsplit(opts["url"])
+        if parts.scheme != "http" or not parts.hostname:
+            raise CommandError("Нужен url вида http://host:port")
+        host, port = parts.hostname, parts.port or 80
+        host_header = opts["host_header"] or parts.netloc
+        paths = opts["paths"] or ["/"]
+
+        counter = iter(range(10**12))
+        latencies, statuses = [], Counter()
+        t0 = time.perf_counter()
+        await asyncio.gather(*[
+            self._worker(host, port, host_header, paths, counter, latencies, statuses)
+            for _ in range(opts["concurrency"])
+        ])
+        return time.perf_counter() - t0, latencies, statuses
+
+    def handle(self, *args, **opts):
+        self.total = opts["requests"]
+        wall, latencies, statuses = asyncio.run(self._run(opts))
+        latencies.sort()
+        result = {
+            "url": opts["url"],
+            "paths": opts["paths"] or ["/"],
+            "concurrency": opts["concurrency"],
+            "requests": len(latencies),
+            "wall_s": round(wall, 3),
+            "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            "statuses": dict(statuses),
+        }
+        self.stdout.write(
+            f"{result['rps']} req/s  p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+            f"p99={result['p99_ms']}ms  statuses={result['statuses']}"
+        )
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as f:
+                json.dump(result, f, indent=2)
@@ -0,0 +1,20 @@
+# core/management/commands/rebuild_campaign_windows.py
+from django.core.management.base import BaseCommand
+
+from core import campaigns, leaderboards
+from core.models import Project
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает клики в периоде кампании (window_clicks, in_window) по всем или указанным проектам."
+
+    def add_arguments(self, parser):
+        parser.add_argument("projects", nargs="*", type=int, help="id проектов (по умолчанию все)")
+
+    def handle(self, *args, **opts):
+        ids = opts["projects"] or list(Project.objects.order_by("id").values_list("id", flat=True))
+        total = 0
+        for pk in ids:
+            total += campaigns.recount(pk)
+        leaderboards.refresh_dirty()
+        self.stdout.write(f"ok: {len(ids)} проектов, {total} кликов в периоде кампании")
@@ -0,0 +1,12 @@
+# core/management/commands/rebuild_leaderboards.py
+from django.core.management.base import BaseCommand
+
+from core.leaderboards import rebuild
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает снимки лидербордов (LeaderboardEntry)."
+
+    def handle(self, *args, **opts):
+        rebuild()
+        self.stdout.write("ok")
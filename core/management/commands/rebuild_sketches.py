@@ -0,0 +1,12 @@
+# core/management/commands/rebuild_sketches.py
+from django.core.management.base import BaseCommand
+
+from core.sketches import rebuild
+
+
+class Command(BaseCommand):
+    help = "Пересобирает HyperLogLog-скетчи уникальных из ClickEvent."
+
+    def handle(self, *args, **opts):
+        n = rebuild()
+        self.stdout.write(f"events={n}")
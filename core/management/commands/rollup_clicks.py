@@ -0,0 +1,15 @@
+# core/management/commands/rollup_clicks.py
+from django.core.management.base import BaseCommand
+
+from core.rollups import materialize_all
+
+
+class Command(BaseCommand):
+    help = "Досчитывает почасовые/посуточные агрегаты кликов (ClickRollup) по новым ClickEvent."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20000)
+
+    def handle(self, *args, **opts):
+        n = materialize_all(batch_size=opts["batch_size"])
+        self.stdout.write(f"events={n}")
@@ -0,0 +1,177 @@
+# core/metrics.py
+"""
+Метрики запросов в памяти воркера: время ответа, число SQL-запросов и время в БД
+по имени URL (name= из urls.py). Пишет RequestMetricsMiddleware (core/middleware.py),
+отдаёт /api/_metrics в текстовом формате Prometheus.
+
+SQL считается execute-обёрткой, которая вешается на каждое новое соединение;
+текущий запрос она находит через ContextVar, поэтому работает и в sync-вьюхах,
+и в потоках sync_to_async под ASGI. Вне запроса (flusher, команды) обёртка — один get().
+Гистограммы — на воркер: у gunicorn с N воркерами Prometheus видит N наборов.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Tuple
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# верхние границы корзин
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def sample_rate() -> float:
+    return float(getattr(settings, "METRICS_SAMPLE_RATE", 1.0))
+
+
+def server_timing_enabled() -> bool:
+    return bool(getattr(settings, "METRICS_SERVER_TIMING", True))
+
+
+# ==========================
+# Учёт SQL
+# ==========================
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - t0
+
+
+@receiver(connection_created)
+def _install_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def begin() -> Tuple[RequestStats, object]:
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end(token) -> None:
+    _current.reset(token)
+
+
+# ==========================
+# Гистограммы
+# ==========================
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "n")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя — +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+class _ViewMetrics:
+    __slots__ = ("duration", "db_time", "queries", "statuses")
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db_time = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.statuses: Dict[str, int] = {}
+
+
+_lock = threading.Lock()
+_views: Dict[str, _ViewMetrics] = {}
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(func: Callable[[], List[str]]) -> None:
+    """Доп. строки для /api/_metrics от других модулей (например, счётчики ботов)."""
+    if func not in _collectors:
+        _collectors.append(func)
+
+
+def observe(view: str, status: int, duration: float, stats: RequestStats) -> None:
+    status_class = f"{status // 100}xx"
+    with _lock:
+        m = _views.get(view)
+        if m is None:
+            m = _views[view] = _ViewMetrics()
+        m.duration.observe(duration)
+        m.db_time.observe(stats.db_time)
+        m.queries.observe(stats.queries)
+        m.statuses[status_class] = m.statuses.get(status_class, 0) + 1
+
+
+def reset() -> None:
+    with _lock:
+        _views.clear()
+
+
+# ==========================
+# Prometheus text format
+# ==========================
+def _fmt(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _histogram_lines(name: str, view: str, h: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(h.bounds, h.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{view="{view}",le="{_fmt(bound)}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {h.n}')
+    lines.append(f'{name}_sum{{view="{view}"}} {_fmt(h.total)}')
+    lines.append(f'{name}_count{{view="{view}"}} {h.n}')
+    return lines
+
+
+def render() -> str:
+    with _lock:
+        items = sorted(_views.items())
+        out = [
+            "# HELP utm_requests_total Sampled requests by view and status class.",
+            "# TYPE utm_requests_total counter",
+        ]
+        for view, m in items:
+            for status_class, n in sorted(m.statuses.items()):
+                out.append(f'utm_requests_total{{view="{view}",status="{status_class}"}} {n}')
+        for name, attr, help_text in (
+            ("utm_request_duration_seconds", "duration", "Wall time of the request."),
+            ("utm_request_db_seconds", "db_time", "Time spent in SQL per request."),
+            ("utm_request_db_queries", "queries", "SQL queries per request."),
+        ):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} histogram")
+            for view, m in items:
+                out.extend(_histogram_lines(name, view, getattr(m, attr)))
+    out.append("# HELP utm_metrics_sample_rate Fraction of requests recorded.")
+    out.append("# TYPE utm_metrics_sample_rate gauge")
+    out.append(f"utm_metrics_sample_rate {_fmt(sample_rate())}")
+    for collect in _collectors:
+        out.extend(collect())
+    return "\n".join(out) + "\n"
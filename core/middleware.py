@@ -0,0 +1,96 @@
+# core/middleware.py
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware as _WhiteNoiseMiddleware
+
+from core import metrics
+
+
+class WhiteNoiseMiddleware(_WhiteNoiseMiddleware):
+    """
+    WhiteNoise, совместимый с async-цепочкой.
+    Оригинал только sync: под ASGI Django гонял бы через него каждый запрос
+    в общий sync-поток, и async-вьюхи (/go/<pk>) теряли бы смысл.
+    Здесь в поток уходит только отдача самого статического файла.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Время ответа, число SQL и время в БД по имени URL (core/metrics.py)
+    + заголовок Server-Timing. Пишется только доля запросов METRICS_SAMPLE_RATE.
+    Стоит первым в MIDDLEWARE, чтобы учитывать и остальные middleware (сессии и т.п.).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        stats, token = metrics.begin()
+        t0 = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end(token)
+        return self._finish(request, response, time.perf_counter() - t0, stats)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        stats, token = metrics.begin()
+        t0 = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end(token)
+        return self._finish(request, response, time.perf_counter() - t0, stats)
+
+    @staticmethod
+    def _sampled() -> bool:
+        rate = metrics.sample_rate()
+        return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def _finish(request, response, duration, stats):
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "<unmatched>"
+        metrics.observe(view, response.status_code, duration, stats)
+        if metrics.server_timing_enabled():
+            response["Server-Timing"] = (
+                f'app;dur={duration * 1000:.2f}, '
+                f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"'
+            )
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_clickevent_delete_siteuser_alter_member_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='clickevent',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_clickevent_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='core.link')),
+            ],
+            options={
+                'verbose_name': 'Слот счётчика',
+                'verbose_name_plural': 'Слоты счётчиков',
+                'unique_together': {('link', 'slot')},
+            },
+        ),
+    ]
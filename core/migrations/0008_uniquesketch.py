@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_linkcountershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('link', 'link'), ('project', 'project'), ('global', 'global')], max_length=10)),
+                ('ref_id', models.BigIntegerField(default=0)),
+                ('registers', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Скетч уникальных',
+                'verbose_name_plural': 'Скетчи уникальных',
+                'unique_together': {('scope', 'ref_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+import hashlib
+import zlib
+from collections import defaultdict
+
+from django.db import migrations
+
+# Копия записи в HyperLogLog из core/hll.py (p=12) на момент миграции:
+# миграция не должна меняться вместе с живым модулем.
+P = 12
+M = 1 << P
+_REST_BITS = 64 - P
+
+
+class HyperLogLog:
+    __slots__ = ('registers',)
+
+    def __init__(self):
+        self.registers = bytearray(M)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        idx = h >> _REST_BITS
+        rank = _REST_BITS - (h & ((1 << _REST_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.registers), 1)
+
+
+def backfill(apps, schema_editor):
+    ClickEvent = apps.get_model('core', 'ClickEvent')
+    UniqueSketch = apps.get_model('core', 'UniqueSketch')
+
+    values = defaultdict(HyperLogLog)
+    rows = ClickEvent.objects.values_list('link_id', 'link__project_id', 'user_key').iterator(chunk_size=5000)
+    for link_id, project_id, user_key in rows:
+        if not user_key:
+            continue
+        values[('link', link_id)].add(user_key)
+        values[('project', project_id)].add(user_key)
+        values[('global', 0)].add(user_key)
+
+    UniqueSketch.objects.bulk_create(
+        [UniqueSketch(scope=s, ref_id=r, registers=h.to_bytes()) for (s, r), h in values.items()],
+        batch_size=500,
+    )
+
+
+def clear(apps, schema_editor):
+    apps.get_model('core', 'UniqueSketch').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_uniquesketch'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
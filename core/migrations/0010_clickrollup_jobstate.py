@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_backfill_unique_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'hour'), ('day', 'day')], max_length=4)),
+                ('scope', models.CharField(choices=[('link', 'link'), ('project', 'project'), ('global', 'global')], max_length=10)),
+                ('ref_id', models.BigIntegerField()),
+                ('bucket', models.DateTimeField()),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Агрегат кликов',
+                'verbose_name_plural': 'Агрегаты кликов',
+                'unique_together': {('grain', 'scope', 'ref_id', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_clickrollup_jobstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.BigIntegerField(default=0)),
+                ('links', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('projects', models.PositiveIntegerField(default=0)),
+                ('rank', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='core.member')),
+            ],
+            options={
+                'verbose_name': 'Строка лидерборда',
+                'verbose_name_plural': 'Лидерборды',
+                'indexes': [models.Index(fields=['board', 'rank'], name='core_leader_board_324feb_idx')],
+                'unique_together': {('board', 'member')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ua_hash', models.CharField(max_length=32, unique=True)),
+                ('ua', models.TextField()),
+                ('browser', models.CharField(db_index=True, max_length=32)),
+                ('os', models.CharField(max_length=32)),
+                ('device', models.CharField(choices=[('desktop', 'Desktop'), ('mobile', 'Mobile'), ('tablet', 'Tablet'), ('bot', 'Bot'), ('other', 'Other')], db_index=True, max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'User-Agent',
+                'verbose_name_plural': "User-Agent'ы",
+            },
+        ),
+        migrations.AddField(
+            model_name='clickevent',
+            name='user_agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.useragent'),
+        ),
+    ]
@@ -0,0 +1,115 @@
+import hashlib
+import re
+
+from django.db import migrations
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+BATCH = 1000
+
+# Копия core/uaparse.py на момент миграции: миграция не должна меняться вместе с живым модулем.
+_BOT_RE = re.compile(r"bot\b|crawl|spider|slurp|preview|externalhit|headless|python-|curl/|wget/|httpclient", re.I)
+
+_BROWSERS = (
+    ("Instagram", re.compile(r"Instagram", re.I)),
+    ("Facebook", re.compile(r"FBAN|FBAV|FB_IAB", re.I)),
+    ("Telegram", re.compile(r"Telegram", re.I)),
+    ("Yandex", re.compile(r"YaBrowser|YaSearchBrowser", re.I)),
+    ("Edge", re.compile(r"Edg(e|A|iOS)?/", re.I)),
+    ("Opera", re.compile(r"OPR/|Opera|OPT/", re.I)),
+    ("Samsung Internet", re.compile(r"SamsungBrowser", re.I)),
+    ("Firefox", re.compile(r"Firefox|FxiOS", re.I)),
+    ("Chrome", re.compile(r"Chrome|CriOS|Chromium", re.I)),
+    ("Safari", re.compile(r"Version/[\d.]+.*Safari|Mobile/\w+ Safari", re.I)),
+)
+
+_OSES = (
+    ("iOS", re.compile(r"iPhone|iPad|iPod", re.I)),
+    ("Android", re.compile(r"Android", re.I)),
+    ("Windows", re.compile(r"Windows", re.I)),
+    ("macOS", re.compile(r"Mac OS X|Macintosh", re.I)),
+    ("ChromeOS", re.compile(r"CrOS", re.I)),
+    ("Linux", re.compile(r"Linux|X11", re.I)),
+)
+
+_TABLET_RE = re.compile(r"iPad|Tablet|Android(?!.*Mobile)", re.I)
+_MOBILE_RE = re.compile(r"Mobi|iPhone|iPod|Android|Windows Phone", re.I)
+_DESKTOP_RE = re.compile(r"Windows|Macintosh|X11|Linux|CrOS", re.I)
+
+
+def _first(rules, ua):
+    for name, rx in rules:
+        if rx.search(ua):
+            return name
+    return "Other"
+
+
+def parse(ua):
+    if _BOT_RE.search(ua):
+        return "Bot", _first(_OSES, ua), "bot"
+    if _TABLET_RE.search(ua):
+        device = "tablet"
+    elif _MOBILE_RE.search(ua):
+        device = "mobile"
+    elif _DESKTOP_RE.search(ua):
+        device = "desktop"
+    else:
+        device = "other"
+    return _first(_BROWSERS, ua), _first(_OSES, ua), device
+
+
+def ua_hash(ua):
+    return hashlib.blake2b(ua.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    ClickEvent = apps.get_model('core', 'ClickEvent')
+    UserAgent = apps.get_model('core', 'UserAgent')
+
+    # пачками по pk: на пачку — недостающие UserAgent одним bulk_create и один UPDATE с CASE по ua
+    agents = dict(UserAgent.objects.values_list('ua_hash', 'pk'))
+    events = ClickEvent.objects.exclude(ua__isnull=True).exclude(ua='').order_by('pk')
+    last = 0
+    while True:
+        rows = list(events.filter(pk__gt=last).values_list('pk', 'ua')[:BATCH])
+        if not rows:
+            break
+        by_hash = {ua_hash(ua): ua for _, ua in rows}
+        missing = [h for h in by_hash if h not in agents]
+        if missing:
+            new = []
+            for h in missing:
+                browser, os_, device = parse(by_hash[h])
+                new.append(UserAgent(ua_hash=h, ua=by_hash[h], browser=browser, os=os_, device=device))
+            UserAgent.objects.bulk_create(new, ignore_conflicts=True)
+            agents.update(UserAgent.objects.filter(ua_hash__in=missing).values_list('ua_hash', 'pk'))
+        ClickEvent.objects.filter(pk__gte=rows[0][0], pk__lte=rows[-1][0]).exclude(ua__isnull=True).exclude(ua='').update(
+            user_agent_id=Case(*[When(ua=ua, then=Value(agents[h])) for h, ua in by_hash.items()]),
+        )
+        last = rows[-1][0]
+
+
+def restore(apps, schema_editor):
+    ClickEvent = apps.get_model('core', 'ClickEvent')
+    UserAgent = apps.get_model('core', 'UserAgent')
+
+    events = ClickEvent.objects.filter(user_agent__isnull=False).order_by('pk')
+    last = 0
+    while True:
+        ids = list(events.filter(pk__gt=last).values_list('pk', flat=True)[:BATCH])
+        if not ids:
+            break
+        ClickEvent.objects.filter(pk__gte=ids[0], pk__lte=ids[-1], user_agent__isnull=False).update(
+            ua=Subquery(UserAgent.objects.filter(pk=OuterRef('user_agent_id')).values('ua')[:1]),
+        )
+        last = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_useragent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, restore),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_backfill_user_agents'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='clickevent',
+            name='ua',
+        ),
+    ]
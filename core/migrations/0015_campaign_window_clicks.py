@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_remove_clickevent_ua'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clickevent',
+            name='in_window',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='window_clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='window_clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='linkcountershard',
+            name='window_clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
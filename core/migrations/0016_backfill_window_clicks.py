@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+
+def day_range(d_from, d_to):
+    """Копия core.rollups.day_range на момент миграции: [начало d_from, начало d_to + 1) в TIME_ZONE."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(d_from, time.min, tzinfo=tz),
+        datetime.combine(d_to + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def backfill(apps, schema_editor):
+    Project = apps.get_model('core', 'Project')
+    Link = apps.get_model('core', 'Link')
+    LinkCounterShard = apps.get_model('core', 'LinkCounterShard')
+    ClickEvent = apps.get_model('core', 'ClickEvent')
+    ClickRollup = apps.get_model('core', 'ClickRollup')
+    JobState = apps.get_model('core', 'JobState')
+    LeaderboardEntry = apps.get_model('core', 'LeaderboardEntry')
+
+    mark_id = JobState.objects.filter(name='rollup:clickevent').values_list('value', flat=True).first() or 0
+    for pk, d_from, d_to in Project.objects.values_list('id', 'date_from', 'date_to'):
+        links = Link.objects.filter(project_id=pk)
+        if not d_from and not d_to:
+            # окно не ограничено — в нём все клики
+            links.update(window_clicks=F('clicks'))
+            LinkCounterShard.objects.filter(link__project_id=pk).update(window_clicks=F('clicks'))
+            ClickEvent.objects.filter(link__project_id=pk).update(in_window=True)
+            continue
+
+        window, bucket_window = Q(), Q()
+        if d_from:
+            start = day_range(d_from, d_from)[0]
+            window &= Q(created_at__gte=start)
+            bucket_window &= Q(bucket__gte=start)
+        if d_to:
+            end = day_range(d_to, d_to)[1]
+            window &= Q(created_at__lt=end)
+            bucket_window &= Q(bucket__lt=end)
+
+        # свёрнутое (в т.ч. уже архивированное) — из почасовых агрегатов, остальное — по событиям
+        link_ids = list(links.values_list('id', flat=True))
+        counts = {
+            r['ref_id']: r['s'] or 0
+            for r in ClickRollup.objects.filter(bucket_window, grain='hour', scope='link', ref_id__in=link_ids)
+            .values('ref_id').annotate(s=Sum('clicks'))
+        }
+        for r in (
+            ClickEvent.objects.filter(window, pk__gt=mark_id, link_id__in=link_ids)
+            .values('link_id').annotate(n=Count('id'))
+        ):
+            counts[r['link_id']] = counts.get(r['link_id'], 0) + r['n']
+        for link_id in link_ids:
+            Link.objects.filter(pk=link_id).update(window_clicks=counts.get(link_id, 0))
+        ClickEvent.objects.filter(link_id__in=link_ids).update(
+            in_window=Case(When(window, then=Value(True)), default=Value(False)),
+        )
+
+    # снимки досок соберутся заново при первом обращении — уже с window_clicks
+    LeaderboardEntry.objects.all().delete()
+    JobState.objects.filter(name__startswith='leaderboard:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_campaign_window_clicks'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
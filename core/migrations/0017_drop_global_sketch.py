@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_global(apps, schema_editor):
+    # глобальный скетч теперь собирается из скетчей проектов при чтении (core/sketches.py)
+    UniqueSketch = apps.get_model('core', 'UniqueSketch')
+    UniqueSketch.objects.filter(scope='global').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_backfill_window_clicks'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_global, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Member(models.Model):
@@ -63,27 +64,67 @@ class Link(models.Model):
     name = models.CharField(max_length=200)
     target_url = models.URLField()
     clicks = models.PositiveIntegerField(default=0)
+    # из них — в период кампании проекта (date_from..date_to), см. core/campaigns.py
+    window_clicks = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
         return f'{self.name} ({self.owner})'
 
+    @property
+    def code(self) -> str | None:
+        """Короткий код для /go/<code> (Base62 от id, см. core/shortcodes.py)."""
+        from core.shortcodes import encode
+
+        return encode(self.pk) if self.pk else None
+
     @property
     def unique_clicks(self) -> int:
         """Количество уникальных пользователей, кликнувших по ссылке"""
         return self.click_events.values('user_key').distinct().count()
 
 
+class UserAgent(models.Model):
+    """
+    Словарь User-Agent: каждая строка хранится один раз, ClickEvent ссылается на неё.
+    browser / os / device — семейства из core/uaparse.py (для разбивки по устройствам).
+    """
+    DEVICE_CHOICES = (
+        ("desktop", "Desktop"),
+        ("mobile", "Mobile"),
+        ("tablet", "Tablet"),
+        ("bot", "Bot"),
+        ("other", "Other"),
+    )
+
+    ua_hash = models.CharField(max_length=32, unique=True)  # blake2b-128 от ua
+    ua = models.TextField()
+    browser = models.CharField(max_length=32, db_index=True)
+    os = models.CharField(max_length=32)
+    device = models.CharField(max_length=8, choices=DEVICE_CHOICES, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "User-Agent"
+        verbose_name_plural = "User-Agent'ы"
+
+    def __str__(self) -> str:
+        return f'{self.browser} / {self.os} / {self.device}'
+
+
 class ClickEvent(models.Model):
     """
     Отдельное событие клика по ссылке.
-    Сохраняет user_key, IP и User-Agent, чтобы считать total/unique клики.
+    Сохраняет user_key, IP и User-Agent (ссылкой на словарь UserAgent), чтобы считать total/unique клики.
     """
     link = models.ForeignKey(Link, on_delete=models.CASCADE, related_name='click_events')
     user_key = models.CharField(max_length=64, db_index=True)
     ip = models.GenericIPAddressField(null=True, blank=True)
-    ua = models.TextField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    user_agent = models.ForeignKey(UserAgent, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+    # не auto_now_add: при буферизованной записи время клика приходит из spool
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # клик попал в период кампании проекта; ставится при записи (core/campaigns.py)
+    in_window = models.BooleanField(default=False)
 
     class Meta:
         indexes = [
@@ -95,3 +136,118 @@ class ClickEvent(models.Model):
 
     def __str__(self) -> str:
         return f'{self.link.name} — {self.user_key}'
+
+
+class LinkCounterShard(models.Model):
+    """
+    Слот шардированного счётчика кликов ссылки.
+    Запись кликов увеличивает случайный слот вместо одной строки Link;
+    итоговое значение = Link.clicks + сумма слотов (см. core/counters.py).
+    """
+    link = models.ForeignKey(Link, on_delete=models.CASCADE, related_name='counter_shards')
+    slot = models.PositiveSmallIntegerField()
+    clicks = models.PositiveIntegerField(default=0)
+    window_clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('link', 'slot')
+        verbose_name = "Слот счётчика"
+        verbose_name_plural = "Слоты счётчиков"
+
+    def __str__(self) -> str:
+        return f'{self.link_id}#{self.slot}: {self.clicks}'
+
+
+class UniqueSketch(models.Model):
+    """
+    HyperLogLog-скетч уникальных user_key (см. core/hll.py).
+    scope=link/project — ref_id это id ссылки/проекта. Обновляется инкрементально при записи
+    кликов (core/sketches.py); scope=global не пишется — глобальный скетч собирается из проектов.
+    """
+    SCOPE_LINK = 'link'
+    SCOPE_PROJECT = 'project'
+    SCOPE_GLOBAL = 'global'
+    SCOPES = (
+        (SCOPE_LINK, 'link'),
+        (SCOPE_PROJECT, 'project'),
+        (SCOPE_GLOBAL, 'global'),
+    )
+
+    scope = models.CharField(max_length=10, choices=SCOPES)
+    ref_id = models.BigIntegerField(default=0)
+    registers = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('scope', 'ref_id')
+        verbose_name = "Скетч уникальных"
+        verbose_name_plural = "Скетчи уникальных"
+
+    def __str__(self) -> str:
+        return f'{self.scope}:{self.ref_id}'
+
+
+class ClickRollup(models.Model):
+    """
+    Клики за час/день: total + HyperLogLog-скетч уникальных (core/hll.py).
+    scope=link — ref_id это id ссылки, scope=project — id проекта.
+    bucket — начало часа/суток в TIME_ZONE. Заполняется инкрементально (core/rollups.py).
+    """
+    GRAIN_HOUR = 'hour'
+    GRAIN_DAY = 'day'
+    GRAINS = (
+        (GRAIN_HOUR, 'hour'),
+        (GRAIN_DAY, 'day'),
+    )
+
+    grain = models.CharField(max_length=4, choices=GRAINS)
+    scope = models.CharField(max_length=10, choices=UniqueSketch.SCOPES)
+    ref_id = models.BigIntegerField()
+    bucket = models.DateTimeField()
+    clicks = models.PositiveIntegerField(default=0)
+    registers = models.BinaryField()
+
+    class Meta:
+        unique_together = ('grain', 'scope', 'ref_id', 'bucket')
+        verbose_name = "Агрегат кликов"
+        verbose_name_plural = "Агрегаты кликов"
+
+    def __str__(self) -> str:
+        return f'{self.scope}:{self.ref_id} {self.grain} {self.bucket:%Y-%m-%d %H:00}'
+
+
+class JobState(models.Model):
+    """Отметка прогресса фоновой задачи (например, последний обработанный ClickEvent.id)."""
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.name}={self.value}'
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Снимок лидерборда: строка участника в доске.
+    board=0 — глобальная доска, иначе id проекта. Обновляется инкрементально
+    (core/leaderboards.py) после записи кликов и создания/удаления ссылок.
+    """
+    board = models.BigIntegerField(default=0)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    links = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    window_clicks = models.PositiveIntegerField(default=0)  # в период кампании
+    projects = models.PositiveIntegerField(default=0)
+    rank = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('board', 'member')
+        indexes = [
+            models.Index(fields=['board', 'rank']),
+        ]
+        verbose_name = "Строка лидерборда"
+        verbose_name_plural = "Лидерборды"
+
+    def __str__(self) -> str:
+        return f'{self.board}#{self.rank} {self.member_id}'
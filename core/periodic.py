@@ -0,0 +1,43 @@
+# core/periodic.py
+"""
+Периодические задачи воркера (компакция счётчиков и т.п.).
+Запускаются из фонового потока flusher'а (core/clicks.py) между сбросами spool;
+в sync-режиме тот же код вызывают management-команды по cron/systemd-таймеру.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_jobs: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, interval: float, func: Callable[[], object]) -> None:
+    """Регистрирует задачу; interval <= 0 — задача отключена."""
+    with _lock:
+        _jobs[name] = {"interval": float(interval), "func": func, "last": time.monotonic()}
+
+
+def run_due() -> List[str]:
+    """Выполняет задачи, у которых подошёл срок. Возвращает их имена."""
+    now_ts = time.monotonic()
+    with _lock:
+        due = [
+            (name, job) for name, job in _jobs.items()
+            if job["interval"] > 0 and now_ts - job["last"] >= job["interval"]
+        ]
+        for _, job in due:
+            job["last"] = now_ts
+    done = []
+    for name, job in due:
+        try:
+            job["func"]()
+            done.append(name)
+        except Exception:
+            logger.exception("periodic job %s failed", name)
+    return done
@@ -0,0 +1,318 @@
+# core/redirects.py
+"""
+Скомпилированная таблица редиректов: короткий код -> (link_id, target_url) в одном файле,
+который воркеры читают через mmap (settings.REDIRECT_TABLE_PATH).
+
+Формат (little-endian):
+    заголовок  b"UTMR", version:u16, reserved:u16, count:u32, first_id:u64, capacity:u64, garbage:u64
+    слоты      capacity × (link_id:u64, offset:u32, length:u32, crc32:u32); слот i — ссылка first_id + i,
+               link_id=0 — пусто
+    данные     target_url в UTF-8; offset считается от начала блока данных, новые цели дописываются в конец
+
+Код взаимно однозначен с Link.id (core/shortcodes.py), поэтому чтение — decode кода и один слот
+прямо в отображённой памяти: ни БД, ни поиска, ни разбора файла на каждый запрос. Файл
+перечитывается (новый mmap), когда меняется его inode/mtime — проверка не чаще раза в
+REDIRECT_TABLE_CHECK_INTERVAL секунд.
+
+Запись — по месту: сигналы Link помечают изменённые id строками JobState
+"redirect-link:<id>" (в транзакции изменения; пометку видит задача любого воркера, она
+переживает перезапуск). Периодическая задача "redirect_table" одним проходом читает из БД
+помеченные ссылки и под flock переписывает только их слоты: новая цель дописывается в конец
+файла, затем слот (pwrite). Массовое создание ссылок — одна пачка пометок и один проход,
+а не переписывание файла на каждую ссылку. Слот пишется не атомарно, поэтому читатель сверяет
+crc32 цели: разорванное чтение или цель за концом текущего mmap — промах, запрос идёт в Django.
+Полная сборка (tmp + os.replace) — когда файла нет, новой ссылке не хватает слотов (запас
+растёт с таблицей) или мусор от старых целей превысил половину блока данных.
+"""
+from __future__ import annotations
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import periodic, shortcodes
+from core.models import JobState, Link
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UTMR"
+VERSION = 2
+_HEADER = struct.Struct("<4sHHIQQQ")
+_SLOT = struct.Struct("<QIII")
+_HEADROOM = 1024  # минимум свободных слотов после сборки; иначе запас — четверть таблицы
+MARK_PREFIX = "redirect-link:"
+
+Entry = Tuple[int, str]  # (link_id, target_url)
+
+
+def path() -> str:
+    return str(getattr(settings, "REDIRECT_TABLE_PATH", "") or "")
+
+
+# ==========================
+# Чтение
+# ==========================
+class RedirectTable:
+    def __init__(self, file_path: str, check_interval: float = 1.0):
+        self.path = file_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._view: Tuple[mmap.mmap, int, int] | None = None  # (mmap, count, data_start) — меняется целиком
+        self._stamp: Tuple[int, int] | None = None
+        self._checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _reload_if_changed(self) -> None:
+        now_ts = time.monotonic()
+        if now_ts - self._checked < self.check_interval:
+            return
+        with self._lock:
+            self._checked = now_ts
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self._view, self._stamp = None, None
+                return
+            stamp = (st.st_ino, st.st_mtime_ns)
+            if stamp == self._stamp:
+                return
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else None
+            if mm is None or mm[:4] != MAGIC or _HEADER.unpack_from(mm, 0)[1] != VERSION:
+                self._view, self._stamp = None, stamp
+                return
+            _, _, _, count, first_id, capacity, _ = _HEADER.unpack_from(mm, 0)
+            # старый mmap закроется сборщиком мусора, когда его отпустят все потоки
+            self._view = (mm, count, first_id, capacity, _HEADER.size + capacity * _SLOT.size)
+            self._stamp = stamp
+            self.reloads += 1
+
+    def lookup(self, code: str) -> Entry | None:
+        """(link_id, target_url) по коду или None."""
+        self._reload_if_changed()
+        view = self._view
+        # из одних цифр — старый /go/<id>: decode такой код не примет
+        link_id = shortcodes.decode(code) if view is not None and len(code) == shortcodes.LENGTH else None
+        if link_id is None:
+            self.misses += 1
+            return None
+        mm, _, first_id, capacity, data_start = view
+        i = link_id - first_id
+        if not 0 <= i < capacity:
+            self.misses += 1
+            return None
+        slot_id, offset, length, crc = _SLOT.unpack_from(mm, _HEADER.size + i * _SLOT.size)
+        start = data_start + offset
+        url = mm[start:start + length] if slot_id == link_id else b""
+        # слот переписывают по месту: разорванное чтение или цель за концом mmap — промах
+        if not url or len(url) != length or zlib.crc32(url) != crc:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return link_id, url.decode("utf-8")
+
+    def stats(self) -> Dict[str, int]:
+        view = self._view
+        return {"entries": view[1] if view else 0, "hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+
+_table: RedirectTable | None = None
+
+
+def get_table() -> RedirectTable:
+    global _table
+    if _table is None:
+        _table = RedirectTable(path(), float(getattr(settings, "REDIRECT_TABLE_CHECK_INTERVAL", 1.0)))
+    return _table
+
+
+def lookup(code: str) -> Entry | None:
+    return get_table().lookup(code)
+
+
+# ==========================
+# Запись
+# ==========================
+def _write_table(file_path: str, entries: Dict[int, str]) -> None:
+    """Полная запись таблицы {link_id: target_url} с запасом слотов под новые ссылки."""
+    first_id = min(entries, default=1)
+    span = max(entries) - first_id + 1 if entries else 0
+    capacity = span + max(_HEADROOM, span // 4)
+    slots = bytearray(capacity * _SLOT.size)
+    blob = bytearray()
+    for link_id, target in entries.items():
+        url = target.encode("utf-8")
+        _SLOT.pack_into(slots, (link_id - first_id) * _SLOT.size, link_id, len(blob), len(url), zlib.crc32(url))
+        blob += url
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(entries), first_id, capacity, 0))
+        f.write(slots)
+        f.write(blob)
+    os.replace(tmp, file_path)  # читатели видят либо старую, либо новую таблицу целиком
+
+
+def _patch(file_path: str, current: Dict[int, str], link_ids: Iterable[int]) -> bool:
+    """
+    Переписывает по месту слоты link_ids (current — их цели из БД, нет в current — удалена).
+    False — по месту нельзя (нет файла, другая версия, не хватает слотов, мусор больше половины данных).
+    """
+    try:
+        fd = os.open(file_path, os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        raw = os.pread(fd, _HEADER.size, 0)
+        if len(raw) < _HEADER.size or raw[:4] != MAGIC or _HEADER.unpack(raw)[1] != VERSION:
+            return False
+        _, _, _, count, first_id, capacity, garbage = _HEADER.unpack(raw)
+        data_start = _HEADER.size + capacity * _SLOT.size
+        end = os.fstat(fd).st_size
+        if garbage * 2 > end - data_start or any(not 0 <= pk - first_id < capacity for pk in current):
+            return False
+        for pk in sorted(link_ids):
+            if not 0 <= pk - first_id < capacity:
+                continue  # удалённая ссылка вне таблицы
+            pos = _HEADER.size + (pk - first_id) * _SLOT.size
+            old_id, _, old_length, old_crc = _SLOT.unpack(os.pread(fd, _SLOT.size, pos))
+            target = current.get(pk)
+            if target is None:
+                if old_id:
+                    os.pwrite(fd, bytes(_SLOT.size), pos)
+                    count, garbage = count - 1, garbage + old_length
+                continue
+            url = target.encode("utf-8")
+            crc = zlib.crc32(url)
+            if old_id == pk and old_length == len(url) and old_crc == crc:
+                continue
+            # сначала данные, потом слот: читатель не увидит слот с ещё не записанной целью
+            os.pwrite(fd, url, end)
+            os.pwrite(fd, _SLOT.pack(pk, end - data_start, len(url), crc), pos)
+            end += len(url)
+            if old_id:
+                garbage += old_length
+            else:
+                count += 1
+        os.pwrite(fd, _HEADER.pack(MAGIC, VERSION, 0, count, first_id, capacity, garbage), 0)
+        return True
+    finally:
+        os.close(fd)
+
+
+class _FileLock:
+    """flock на соседнем .lock-файле: таблицу переписывает один воркер за раз."""
+
+    def __init__(self, file_path: str):
+        self.lock_path = f"{file_path}.lock"
+
+    def __enter__(self):
+        self._f = open(self.lock_path, "a")
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+def _all_entries() -> Dict[int, str]:
+    entries = {}
+    for pk, target in Link.objects.values_list("id", "target_url").iterator(chunk_size=5000):
+        if len(shortcodes.encode(pk)) == shortcodes.LENGTH:  # 8-символьные "x…" обслуживает Django
+            entries[pk] = target
+    return entries
+
+
+def rebuild() -> int:
+    """Полная сборка таблицы из БД. Возвращает число записей."""
+    file_path = path()
+    if not file_path:
+        return 0
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with _FileLock(file_path):
+        entries = _all_entries()
+        _write_table(file_path, entries)
+    return len(entries)
+
+
+def apply(link_ids: Iterable[int]) -> int:
+    """Накладывает изменения ссылок link_ids на таблицу (удалённые — убирает)."""
+    file_path = path()
+    link_ids = {pk for pk in link_ids if len(shortcodes.encode(pk)) == shortcodes.LENGTH}
+    if not file_path or not link_ids:
+        return 0
+    with _FileLock(file_path):
+        current = dict(Link.objects.filter(pk__in=link_ids).values_list("id", "target_url"))
+        if not _patch(file_path, current, link_ids):
+            _write_table(file_path, _all_entries())
+    return len(link_ids)
+
+
+# ==========================
+# Пометки изменённых ссылок -> периодическое наложение
+# ==========================
+def _chunks(items: List, size: int = 500):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def mark(link_ids: Iterable[int]) -> None:
+    """Помечает ссылки к наложению; повторная пометка увеличивает счётчик строки."""
+    from core.clicks import start_background
+
+    names = sorted({f"{MARK_PREFIX}{pk}" for pk in link_ids})
+    if not path() or not names:
+        return
+    for chunk in _chunks(names):
+        JobState.objects.filter(name__in=chunk).update(value=F("value") + 1)
+        JobState.objects.bulk_create([JobState(name=name) for name in chunk], ignore_conflicts=True)
+    start_background()
+
+
+def refresh_dirty() -> int:
+    file_path = path()
+    if not file_path:
+        return 0
+    marked = list(JobState.objects.filter(name__startswith=MARK_PREFIX).values_list("name", "value"))
+    if not os.path.exists(file_path):
+        n = rebuild()
+    elif marked:
+        n = apply(int(name[len(MARK_PREFIX):]) for name, _ in marked)
+    else:
+        return 0
+    # при ошибке пометки остаются; снимаем только не тронутые за время наложения
+    by_value: Dict[int, List[str]] = defaultdict(list)
+    for name, value in marked:
+        by_value[value].append(name)
+    for value, names in by_value.items():
+        for chunk in _chunks(names):
+            JobState.objects.filter(name__in=chunk, value=value).delete()
+    return n
+
+
+periodic.register(
+    "redirect_table",
+    getattr(settings, "REDIRECT_TABLE_INTERVAL", 1.0),
+    refresh_dirty,
+)
+
+
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def _link_changed(sender, instance: Link, **kwargs):
+    # до наложения новая ссылка идёт через Django, а удалённая отсеивается при записи клика
+    mark([instance.pk])
@@ -0,0 +1,145 @@
+# core/retention.py
+"""
+Вынос старых ClickEvent из горячей таблицы в архив.
+
+Для событий старше CLICK_RETENTION_DAYS:
+  1. rollups.materialize_all() — события гарантированно учтены в ClickRollup
+     (скетчи уникальных и счётчики кликов пишутся при записи клика и от ClickEvent
+     после этого не зависят); берутся только id <= отметки rollup'ов;
+  2. пачка (по возрастанию id) пишется в gzip NDJSON по дням (TIME_ZONE):
+     <CLICK_ARCHIVE_DIR>/YYYY/MM/DD/clicks-<первый id пачки>.ndjson.gz —
+     временный файл + rename, повтор после сбоя перезаписывает тот же файл;
+  3. та же пачка удаляется из ClickEvent одним DELETE по диапазону id.
+
+После архивации точные пути (?exact=1, rebuild_sketches) видят только горячие события.
+Запуск — командой archive_clicks (cron/systemd-таймер) или периодической задачей
+flusher'а; одновременно работает только один воркер (аренда в JobState).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core import periodic, rollups
+from core.models import ClickEvent, JobState
+
+LOCK = "retention:lock"
+FIELDS = ("id", "created_at", "link_id", "project_id", "user_key", "ip", "ua")
+
+
+def retention_days() -> int:
+    return int(getattr(settings, "CLICK_RETENTION_DAYS", 0) or 0)
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, "CLICK_ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+
+
+# ==========================
+# Аренда (один архиватор на все воркеры)
+# ==========================
+def _acquire(lease: float) -> bool:
+    JobState.objects.get_or_create(name=LOCK)
+    now_ts = int(time.time())
+    return bool(JobState.objects.filter(name=LOCK, value__lt=now_ts).update(value=now_ts + int(lease)))
+
+
+def _release() -> None:
+    JobState.objects.filter(name=LOCK).update(value=0)
+
+
+# ==========================
+# Архив
+# ==========================
+def _write_partition(day: str, first_id: int, rows: List[Dict]) -> Path:
+    y, m, d = day.split("-")
+    folder = archive_dir() / y / m / d
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"clicks-{first_id}.ndjson.gz"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+            for row in rows:
+                gz.write(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+                gz.write(b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def _candidates(cutoff, max_id: int):
+    return ClickEvent.objects.filter(created_at__lt=cutoff, pk__lte=max_id)
+
+
+def archive_batch(cutoff, max_id: int, batch_size: int) -> int:
+    """Одна пачка: архив + удаление. Возвращает число событий (0 — всё вынесено)."""
+    rows = list(
+        _candidates(cutoff, max_id)
+        .order_by("pk")
+        .values_list("pk", "created_at", "link_id", "link__project_id", "user_key", "ip", "user_agent__ua")[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    first_id, last_id = rows[0][0], rows[-1][0]
+    by_day: Dict[str, List[Dict]] = defaultdict(list)
+    for row in rows:
+        created = timezone.localtime(row[1])
+        by_day[created.date().isoformat()].append(dict(zip(FIELDS, (row[0], created.isoformat(), *row[2:]))))
+    for day, items in by_day.items():
+        _write_partition(day, first_id, items)
+
+    # ровно выбранные строки: диапазон id + те же условия; у ClickEvent нет
+    # зависимых моделей и сигналов удаления, так что это один DELETE
+    with transaction.atomic():
+        _candidates(cutoff, max_id).filter(pk__gte=first_id, pk__lte=last_id).delete()
+    return len(rows)
+
+
+def run(days: int | None = None, batch_size: int | None = None, max_batches: int | None = None,
+        dry_run: bool = False) -> Dict[str, int]:
+    """Архивирует события старше days дней. Возвращает {"events", "batches"}."""
+    days = retention_days() if days is None else days
+    batch_size = batch_size or int(getattr(settings, "CLICK_RETENTION_BATCH", 5000))
+    if days <= 0:
+        return {"events": 0, "batches": 0}
+    if not _acquire(lease=getattr(settings, "CLICK_RETENTION_LEASE", 600)):
+        return {"events": 0, "batches": 0}
+    try:
+        rollups.materialize_all()
+        max_id = JobState.objects.filter(name=rollups.WATERMARK).values_list("value", flat=True).first() or 0
+        cutoff = timezone.now() - timedelta(days=days)
+        if dry_run:
+            n = _candidates(cutoff, max_id).count()
+            return {"events": n, "batches": -(-n // batch_size)}
+
+        events = batches = 0
+        while max_batches is None or batches < max_batches:
+            n = archive_batch(cutoff, max_id, batch_size)
+            events += n
+            if n:
+                batches += 1
+            if n < batch_size:
+                break
+        return {"events": events, "batches": batches}
+    finally:
+        _release()
+
+
+def _periodic() -> None:
+    # из фонового потока — ограниченное число пачек за тик, остальное на следующем
+    run(max_batches=int(getattr(settings, "CLICK_RETENTION_MAX_BATCHES", 20)))
+
+
+periodic.register("archive_clicks", getattr(settings, "CLICK_RETENTION_INTERVAL", 3600.0), _periodic)
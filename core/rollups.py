@@ -0,0 +1,168 @@
+# core/rollups.py
+"""
+Почасовые/посуточные агрегаты кликов (ClickRollup) для графиков.
+
+Задача materialize() читает ClickEvent после отметки JobState("rollup:clickevent")
+по возрастанию id, складывает клики и user_key в корзины (ссылка и проект × час и день)
+и сдвигает отметку. Эндпоинты timeseries читают только ClickRollup:
+90 дней по ссылке — это 90 строк, а не все события.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import periodic
+from core.hll import HyperLogLog
+from core.models import ClickEvent, ClickRollup, JobState, UniqueSketch
+
+HOUR = ClickRollup.GRAIN_HOUR
+DAY = ClickRollup.GRAIN_DAY
+LINK = UniqueSketch.SCOPE_LINK
+PROJECT = UniqueSketch.SCOPE_PROJECT
+
+WATERMARK = "rollup:clickevent"
+
+Key = Tuple[str, str, int, datetime]  # grain, scope, ref_id, bucket
+
+
+def buckets(dt: datetime) -> Tuple[datetime, datetime]:
+    """Начало часа и начало суток (в TIME_ZONE) для момента клика."""
+    hour = timezone.localtime(dt).replace(minute=0, second=0, microsecond=0)
+    return hour, hour.replace(hour=0)
+
+
+def day_range(d_from: date, d_to: date) -> Tuple[datetime, datetime]:
+    """[начало d_from, начало d_to + 1) в TIME_ZONE."""
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(d_from, time.min, tzinfo=tz)
+    end = datetime.combine(d_to + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+# ==========================
+# Материализация
+# ==========================
+def _accumulate(rows) -> Dict[Key, Tuple[int, Set[str]]]:
+    acc: Dict[Key, list] = defaultdict(lambda: [0, set()])
+    for _, link_id, project_id, user_key, created_at in rows:
+        hour, day = buckets(created_at)
+        for grain, bucket in ((HOUR, hour), (DAY, day)):
+            for scope, ref_id in ((LINK, link_id), (PROJECT, project_id)):
+                a = acc[(grain, scope, ref_id, bucket)]
+                a[0] += 1
+                if user_key:
+                    a[1].add(user_key)
+    return acc
+
+
+def _merge(acc: Dict[Key, Tuple[int, Set[str]]]) -> None:
+    cond = Q()
+    groups: Dict[Tuple[str, str], Tuple[Set[int], Set[datetime]]] = defaultdict(lambda: (set(), set()))
+    for grain, scope, ref_id, bucket in acc:
+        refs, bks = groups[(grain, scope)]
+        refs.add(ref_id)
+        bks.add(bucket)
+    for (grain, scope), (refs, bks) in groups.items():
+        cond |= Q(grain=grain, scope=scope, ref_id__in=refs, bucket__in=bks)
+
+    existing = {
+        (r.grain, r.scope, r.ref_id, r.bucket): r
+        for r in ClickRollup.objects.select_for_update().filter(cond)
+    }
+    to_create: List[ClickRollup] = []
+    to_update: List[ClickRollup] = []
+    for key, (clicks, users) in acc.items():
+        row = existing.get(key)
+        hll = HyperLogLog.from_bytes(row.registers if row else None)
+        hll.update(users)
+        if row is None:
+            grain, scope, ref_id, bucket = key
+            to_create.append(ClickRollup(
+                grain=grain, scope=scope, ref_id=ref_id, bucket=bucket,
+                clicks=clicks, registers=hll.to_bytes(),
+            ))
+        else:
+            row.clicks += clicks
+            row.registers = hll.to_bytes()
+            to_update.append(row)
+
+    ClickRollup.objects.bulk_create(to_create, batch_size=500)
+    ClickRollup.objects.bulk_update(to_update, ["clicks", "registers"], batch_size=500)
+
+
+def materialize(batch_size: int = 20000) -> int:
+    """Один проход: до batch_size новых событий. Возвращает число обработанных."""
+    state, _ = JobState.objects.get_or_create(name=WATERMARK)
+    rows = list(
+        ClickEvent.objects.filter(pk__gt=state.value)
+        .order_by("pk")
+        .values_list("pk", "link_id", "link__project_id", "user_key", "created_at")[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    acc = _accumulate(rows)
+    with transaction.atomic():
+        # оптимистичная блокировка: если отметку уже сдвинул другой воркер — откатываемся
+        moved = JobState.objects.filter(pk=state.pk, value=state.value).update(value=rows[-1][0])
+        if not moved:
+            return 0
+        _merge(acc)
+    return len(rows)
+
+
+def materialize_all(batch_size: int = 20000) -> int:
+    total = 0
+    while True:
+        n = materialize(batch_size)
+        total += n
+        if n < batch_size:
+            return total
+
+
+periodic.register("rollup_clicks", getattr(settings, "ROLLUP_INTERVAL", 60.0), materialize_all)
+
+
+# ==========================
+# Чтение
+# ==========================
+def series(scope: str, ref_id: int, grain: str, start: datetime, end: datetime) -> List[Dict]:
+    rows = (
+        ClickRollup.objects.filter(grain=grain, scope=scope, ref_id=ref_id, bucket__gte=start, bucket__lt=end)
+        .order_by("bucket")
+        .values_list("bucket", "clicks", "registers")
+    )
+    return [
+        {
+            "t": timezone.localtime(bucket).isoformat(),
+            "clicks": clicks,
+            "unique_users": HyperLogLog.from_bytes(regs).count(),
+        }
+        for bucket, clicks, regs in rows
+    ]
+
+
+def totals(scope: str, ref_ids: Iterable[int], start: datetime, end: datetime) -> Dict[int, Tuple[int, HyperLogLog]]:
+    """
+    Итог за период по посуточным агрегатам: {ref_id: (clicks, HLL уникальных)}.
+    Период — целые сутки (day_range); одна строка на ref_id и день.
+    """
+    out: Dict[int, Tuple[int, HyperLogLog]] = {}
+    rows = ClickRollup.objects.filter(
+        grain=DAY, scope=scope, ref_id__in=list(ref_ids), bucket__gte=start, bucket__lt=end,
+    ).values_list("ref_id", "clicks", "registers")
+    for ref_id, clicks, regs in rows:
+        prev = out.get(ref_id)
+        hll = HyperLogLog.from_bytes(regs)
+        if prev is None:
+            out[ref_id] = (clicks, hll)
+        else:
+            out[ref_id] = (prev[0] + clicks, prev[1].merge(hll))
+    return out
@@ -0,0 +1,71 @@
+# core/shortcodes.py
+"""
+Короткие коды ссылок: Base62, 7 символов, взаимно однозначно с Link.id.
+
+id перед кодированием перемешивается 40-битной сетью Фейстеля, поэтому соседние ссылки
+получают непохожие коды и по коду не видно ни порядка, ни количества ссылок.
+Код вычисляется из id — отдельная колонка и запрос в БД для декодирования не нужны.
+
+Код всегда содержит букву: /go/<из одних цифр> — это старый /go/<id>, и пространства
+не пересекаются. Если у id код вышел из одних цифр (≈1 из 350 000), ему выдаётся
+8-символьный "x" + эти 7 цифр; в таблицу редиректов (core/redirects.py) он не попадает.
+
+ВАЖНО: ключи раундов менять нельзя — все выданные короткие ссылки станут другими.
+"""
+from __future__ import annotations
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+LENGTH = 7  # 62**7 ≈ 3.5e12 > 2**40
+
+_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+_HALF = 20
+_MASK = (1 << _HALF) - 1
+_MAX_ID = 1 << (2 * _HALF)
+_KEYS = (0x5BD1E, 0x3C6EF, 0xA4093, 0x1B873)
+DIGITS_PREFIX = "x"
+
+
+def _round(r: int, key: int) -> int:
+    x = (r * 0x9E3779B1 + key) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x2C1B3C6D) & 0xFFFFFFFF
+    return (x ^ (x >> 12)) & _MASK
+
+
+def _permute(n: int, keys) -> int:
+    left, right = n >> _HALF, n & _MASK
+    for key in keys:
+        left, right = right, left ^ _round(right, key)
+    return (right << _HALF) | left
+
+
+def encode(link_id: int) -> str:
+    """Link.id -> 7 символов Base62 (или "x" + 7 цифр, см. модуль)."""
+    if not 0 < link_id < _MAX_ID:
+        raise ValueError(f"link id out of range: {link_id}")
+    n = _permute(link_id, _KEYS)
+    out = []
+    for _ in range(LENGTH):
+        n, rem = divmod(n, 62)
+        out.append(ALPHABET[rem])
+    code = "".join(reversed(out))
+    return DIGITS_PREFIX + code if code.isdigit() else code
+
+
+def decode(code: str) -> int | None:
+    """Код -> Link.id; None для строки, которая не может быть кодом."""
+    if len(code) == LENGTH + 1 and code[0] == DIGITS_PREFIX and code[1:].isdigit():
+        code = code[1:]
+    elif len(code) != LENGTH or code.isdigit():
+        return None
+    n = 0
+    for c in code:
+        i = _INDEX.get(c)
+        if i is None:
+            return None
+        n = n * 62 + i
+    if n >= _MAX_ID:
+        return None
+    # обратный проход сети: те же раунды в обратном порядке
+    link_id = _permute(n, _KEYS[::-1])
+    return link_id or None
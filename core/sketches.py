@@ -0,0 +1,159 @@
+# core/sketches.py
+"""
+Скетчи уникальных пользователей (HyperLogLog) по ссылке, проекту и глобально.
+
+Скетчи ссылок и проектов пишутся инкрементально в той же транзакции, что и ClickEvent
+(core/clicks.py), поэтому чтение уникальных — один SELECT одной строки вместо
+COUNT(DISTINCT user_key). Глобальный скетч не хранится: одна строка на все клики стала бы
+горячей блокировкой каждого батча, поэтому он собирается при чтении объединением скетчей
+проектов (регистры HLL сливаются без потерь; результат кэширует core/stats.py).
+Точный путь (COUNT DISTINCT по ClickEvent) остаётся для ?exact=1.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db.models import Q
+
+from core.hll import HyperLogLog
+from core.models import ClickEvent, Link, UniqueSketch
+
+LINK = UniqueSketch.SCOPE_LINK
+PROJECT = UniqueSketch.SCOPE_PROJECT
+GLOBAL = UniqueSketch.SCOPE_GLOBAL
+
+Key = Tuple[str, int]
+
+
+# ==========================
+# Запись
+# ==========================
+def _keys_q(keys: Iterable[Key]) -> Q:
+    cond = Q()
+    by_scope: Dict[str, List[int]] = defaultdict(list)
+    for scope, ref_id in keys:
+        by_scope[scope].append(ref_id)
+    for scope, ids in by_scope.items():
+        cond |= Q(scope=scope, ref_id__in=ids)
+    return cond
+
+
+def _apply(values: Dict[Key, Set[str]]) -> None:
+    """Добавляет user_key в скетчи; сохраняет только изменившиеся."""
+    if not values:
+        return
+    existing = {(s.scope, s.ref_id): s for s in UniqueSketch.objects.select_for_update().filter(_keys_q(values))}
+    to_create: List[UniqueSketch] = []
+    to_update: List[UniqueSketch] = []
+    for key, keys in values.items():
+        row = existing.get(key)
+        hll = HyperLogLog.from_bytes(row.registers if row else None)
+        if not hll.update(keys):
+            continue
+        if row is None:
+            to_create.append(UniqueSketch(scope=key[0], ref_id=key[1], registers=hll.to_bytes()))
+        else:
+            row.registers = hll.to_bytes()
+            to_update.append(row)
+
+    if to_create:
+        # гонка двух воркеров на первой записи: наша вставка уступает чужой строке,
+        # поэтому перечитываем созданные ключи и сливаем свои регистры в чужие
+        UniqueSketch.objects.bulk_create(to_create, ignore_conflicts=True)
+        ours = {(row.scope, row.ref_id): row.registers for row in to_create}
+        for row in UniqueSketch.objects.select_for_update().filter(_keys_q(ours)):
+            mine = ours[(row.scope, row.ref_id)]
+            if bytes(row.registers) != mine:
+                hll = HyperLogLog.from_bytes(row.registers).merge(HyperLogLog.from_bytes(mine))
+                row.registers = hll.to_bytes()
+                to_update.append(row)
+    for row in to_update:
+        row.save(update_fields=["registers", "updated_at"])
+
+
+def add_clicks(pairs: Iterable[Tuple[int, str]], link_project: Dict[int, int] | None = None) -> None:
+    """
+    pairs: (link_id, user_key). Вызывается внутри транзакции записи кликов.
+    link_project — {link_id: project_id}, если вызывающий его уже знает.
+    """
+    by_link: Dict[int, Set[str]] = defaultdict(set)
+    for link_id, user_key in pairs:
+        if user_key:
+            by_link[link_id].add(user_key)
+    if not by_link:
+        return
+
+    if link_project is None:
+        link_project = dict(Link.objects.filter(pk__in=by_link.keys()).values_list("id", "project_id"))
+    values: Dict[Key, Set[str]] = defaultdict(set)
+    for link_id, keys in by_link.items():
+        values[(LINK, link_id)] |= keys
+        if link_id in link_project:
+            values[(PROJECT, link_project[link_id])] |= keys
+    _apply(values)
+
+
+# ==========================
+# Чтение
+# ==========================
+def load(scope: str, ref_ids: Iterable[int]) -> Dict[int, HyperLogLog]:
+    rows = UniqueSketch.objects.filter(scope=scope, ref_id__in=list(ref_ids)).values_list("ref_id", "registers")
+    return {ref_id: HyperLogLog.from_bytes(regs) for ref_id, regs in rows}
+
+
+def global_sketch() -> HyperLogLog:
+    """Объединение скетчей всех проектов."""
+    hll = HyperLogLog()
+    rows = UniqueSketch.objects.filter(scope=PROJECT).values_list("registers", flat=True)
+    for regs in rows.iterator(chunk_size=200):
+        hll.merge(HyperLogLog.from_bytes(regs))
+    return hll
+
+
+def unique_count(scope: str, ref_id: int = 0) -> int:
+    if scope == GLOBAL:
+        return global_sketch().count()
+    regs = UniqueSketch.objects.filter(scope=scope, ref_id=ref_id).values_list("registers", flat=True).first()
+    return HyperLogLog.from_bytes(regs).count()
+
+
+def unique_counts(scope: str, ref_ids: Iterable[int]) -> Dict[int, int]:
+    ref_ids = list(ref_ids)
+    found = {ref_id: hll.count() for ref_id, hll in load(scope, ref_ids).items()}
+    return {ref_id: found.get(ref_id, 0) for ref_id in ref_ids}
+
+
+# ==========================
+# Точный путь и пересборка
+# ==========================
+def exact_unique(qs=None) -> int:
+    """COUNT(DISTINCT user_key) по ClickEvent — дорого, только для ?exact=1."""
+    qs = ClickEvent.objects.all() if qs is None else qs
+    return (
+        qs.exclude(user_key__isnull=True)
+        .exclude(user_key__exact="")
+        .values("user_key")
+        .distinct()
+        .count()
+    )
+
+
+def rebuild(chunk_size: int = 5000) -> int:
+    """Пересобирает все скетчи из ClickEvent. Возвращает число обработанных событий."""
+    values: Dict[Key, HyperLogLog] = defaultdict(HyperLogLog)
+    n = 0
+    rows = ClickEvent.objects.values_list("link_id", "link__project_id", "user_key").iterator(chunk_size=chunk_size)
+    for link_id, project_id, user_key in rows:
+        n += 1
+        if not user_key:
+            continue
+        values[(LINK, link_id)].add(user_key)
+        values[(PROJECT, project_id)].add(user_key)
+
+    UniqueSketch.objects.all().delete()
+    UniqueSketch.objects.bulk_create(
+        [UniqueSketch(scope=s, ref_id=r, registers=h.to_bytes()) for (s, r), h in values.items()],
+        batch_size=500,
+    )
+    return n
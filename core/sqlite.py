@@ -0,0 +1,32 @@
+# core/sqlite.py
+"""
+Настройка каждого нового SQLite-соединения (settings.SQLITE_*).
+
+WAL: читатели не блокируют писателя и наоборот; synchronous=NORMAL в WAL безопасен
+для целостности (при сбое питания теряются лишь последние транзакции);
+cache_size / mmap_size уменьшают число read()-вызовов; busy_timeout — ждать
+блокировку вместо мгновенного "database is locked".
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def pragmas():
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+@receiver(connection_created)
+def _tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not getattr(settings, "SQLITE_TUNING", False):
+        return
+    with connection.cursor() as cursor:
+        for sql in pragmas():
+            cursor.execute(sql)
@@ -0,0 +1,183 @@
+# core/sqlite_cache.py
+"""
+Бэкенд кэша Django в отдельном SQLite-файле: общий для всех воркеров одной машины
+без внешнего сервиса (CACHE_BACKEND=sqlite, см. settings.CACHES).
+
+- одна таблица (key, value, expires); WAL — читатели не ждут писателя;
+- целые числа хранятся как INTEGER, поэтому incr() — один атомарный UPDATE
+  (на нём держатся версии ключей core/cache.py), остальное — pickle;
+- истёкшие строки не возвращаются и вычищаются при записи: раз в CULL_EVERY вызовов
+  set() — по expires, а сверх MAX_ENTRIES — ещё и самые старые.
+
+    CACHES = {"default": {
+        "BACKEND": "core.sqlite_cache.SQLiteCache",
+        "LOCATION": "/var/lib/utmtracker/cache.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }}
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_FOREVER = float("inf")
+
+
+class SQLiteCache(BaseCache):
+    CULL_EVERY = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    # ---------- соединение ----------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # кэш: при сбое питания потерять его не страшно
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB,"
+                " expires REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache(expires)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- кодирование ----------
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -(1 << 63) <= value < (1 << 63):
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(raw):
+        return raw if isinstance(raw, int) else pickle.loads(raw)
+
+    def _expires(self, timeout) -> float:
+        expires = self.get_backend_timeout(timeout)
+        return _FOREVER if expires is None else expires
+
+    def _key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    # ---------- чтение ----------
+    def get(self, key, default=None, version=None):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires > ?", (self._key(key, version), time.time())
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        by_key = {self._key(k, version): k for k in keys}
+        out = {}
+        conn = self._conn()
+        now_ts = time.time()
+        names = list(by_key)
+        for i in range(0, len(names), 500):  # лимит параметров SQLite
+            chunk = names[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(chunk))}) AND expires > ?",
+                (*chunk, now_ts),
+            )
+            for name, raw in rows:
+                out[by_key[name]] = self._decode(raw)
+        return out
+
+    def has_key(self, key, version=None):
+        return self._conn().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND expires > ?", (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    # ---------- запись ----------
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (self._key(key, version), self._encode(value), self._expires(timeout)),
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [(self._key(k, version), self._encode(v), expires) for k, v in data.items()]
+        if rows:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows)
+            self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # вставка удаётся, если ключа нет или он истёк — одним оператором, атомарно между воркерами
+        cur = self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (self._key(key, version), self._encode(value), self._expires(timeout), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cur = self._conn().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND expires > ?",
+            (self._expires(timeout), self._key(key, version), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        row = self._conn().execute(
+            "UPDATE cache SET value = value + ? "
+            "WHERE key = ? AND expires > ? AND typeof(value) = 'integer' RETURNING value",
+            (delta, self._key(key, version), time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def delete(self, key, version=None):
+        cur = self._conn().execute("DELETE FROM cache WHERE key = ?", (self._key(key, version),))
+        return cur.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(k, version) for k in keys]
+        if names:
+            conn = self._conn()
+            with conn:
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(n,) for n in names])
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # соединение живёт весь срок потока: Django зовёт close() после каждого запроса
+        pass
+
+    # ---------- чистка ----------
+    def _maybe_cull(self) -> None:
+        self._writes += 1
+        if self._writes % self.CULL_EVERY:
+            return
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires LIMIT ?)",
+                (count // self._cull_frequency,),
+            )
@@ -0,0 +1,199 @@
+# core/stats.py
+"""
+Единый сервис статистики кликов: все стат-эндпоинты (/api/link-stats, /api/project-stats,
+/api/summary) берут числа отсюда.
+
+Модель согласованности:
+- total_clicks — всегда по счётчикам: Link.clicks + ещё не свёрнутые слоты (core/counters.py).
+  Счётчики не уменьшаются при архивации старых ClickEvent (core/retention.py), поэтому
+  COUNT(*) по событиям для итогов не используется — он «теряет» архив.
+  Клики, ещё лежащие в spool (CLICK_INGEST_MODE=buffered), не видны ни в одном пути.
+- unique_users — по умолчанию оценка HyperLogLog (core/sketches.py), одна строка на запрос;
+  ?exact=1 — точный COUNT(DISTINCT user_key) по ClickEvent, т.е. только по неархивным событиям.
+- лидерборды и /api/dashboard читают снимок доски (core/leaderboards.py): те же счётчики,
+  но с задержкой до LEADERBOARD_REFRESH_INTERVAL.
+
+План запросов (без кэша): ссылки пачкой — 3 запроса на любое число id, проект — 4, глобально — 5.
+Клики в/вне периода кампании проекта — из тех же счётчиков (window_clicks, core/campaigns.py);
+произвольный период (?from=&to=) — из посуточных ClickRollup (core/rollups.py).
+
+Результаты лежат в общем кэше (core/cache.py) до STATS_CACHE_TTL секунд (0 — без кэша)
+под версионными ключами: ссылка — от версий link/link_clicks, проект — от project/catalog/clicks,
+итоги — от catalog/clicks. Записанная пачка кликов или изменённая ссылка увеличивают
+версию, и следующий запрос в любом воркере считает заново — TTL лишь верхняя граница.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from core import cache, counters, rollups, sketches
+from core.models import ClickEvent, Link, Project
+
+
+def ttl() -> float:
+    return float(getattr(settings, "STATS_CACHE_TTL", 5.0))
+
+
+def _link_deps(pk: int):
+    return [(cache.LINK, pk), (cache.LINK_CLICKS, pk)]
+
+
+def _project_deps(pk: int):
+    return [(cache.PROJECT, pk), (cache.CATALOG, 0), (cache.CLICKS, 0)]
+
+
+_GLOBAL_DEPS = [(cache.CATALOG, 0), (cache.CLICKS, 0)]
+
+
+# ==========================
+# Точный путь (?exact=1)
+# ==========================
+def _exact_unique_by_link(ids: List[int]) -> Dict[int, int]:
+    rows = (
+        ClickEvent.objects.filter(link_id__in=ids)
+        .exclude(user_key__isnull=True)
+        .exclude(user_key__exact="")
+        .values("link_id")
+        .annotate(u=Count("user_key", distinct=True))
+    )
+    return {r["link_id"]: r["u"] for r in rows}
+
+
+def _total_clicks(**filters) -> int:
+    base = Link.objects.filter(**filters).aggregate(s=Sum("clicks"))["s"] or 0
+    return base + counters.pending_total(**{f"link__{k}": v for k, v in filters.items()})
+
+
+def _get_or_build(name: str, deps, build):
+    if ttl() <= 0:
+        return build()
+    return cache.get_or_build(name, deps, ttl(), build)
+
+
+# ==========================
+# Метрики
+# ==========================
+def links(ids: Iterable[int], exact: bool = False) -> Dict[int, Dict[str, int]]:
+    """
+    {link_id: {link_id, total_clicks, unique_users}} только для существующих ссылок.
+    Из кэша берутся готовые ссылки, остальные — одной пачкой.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    if ttl() > 0:
+        hits, misses = cache.get_many({i: (f"stats:link:{i}:{int(exact)}", _link_deps(i)) for i in ids})
+    else:
+        hits, misses = {}, {i: None for i in ids}
+    out: Dict[int, Dict[str, int]] = {i: row for i, row in hits.items() if row is not None}
+
+    if misses:
+        clicks = dict(Link.objects.filter(pk__in=misses).values_list("id", "clicks"))
+        found = list(clicks)
+        extra = counters.pending(link_id__in=found) if found else {}
+        if not found:
+            uniques = {}
+        elif exact:
+            uniques = _exact_unique_by_link(found)
+        else:
+            uniques = sketches.unique_counts(sketches.LINK, found)
+        fresh = {}
+        for i, key in misses.items():
+            row = None
+            if i in clicks:
+                row = {
+                    "link_id": i,
+                    "total_clicks": (clicks[i] or 0) + extra.get(i, 0),
+                    "unique_users": uniques.get(i, 0),
+                }
+                out[i] = row
+            if key:
+                fresh[key] = row  # None — ссылки нет, тоже кэшируем
+        cache.set_many(fresh, ttl())
+    return out
+
+
+def link(pk: int, exact: bool = False) -> Dict[str, int] | None:
+    return links([pk], exact).get(pk)
+
+
+def project(pk: int, exact: bool = False) -> Dict[str, int] | None:
+    """
+    {project_id, total_clicks, window_clicks, out_of_window_clicks, unique_users} или None,
+    если проекта нет. window_clicks — клики в период кампании (core/campaigns.py).
+    """
+    def build():
+        if not Project.objects.filter(pk=pk).exists():
+            return None
+        if exact:
+            unique_users = sketches.exact_unique(ClickEvent.objects.filter(link__project_id=pk))
+        else:
+            unique_users = sketches.unique_count(sketches.PROJECT, pk)
+        sums = Link.objects.filter(project_id=pk).aggregate(clicks=Sum("clicks"), window_clicks=Sum("window_clicks"))
+        extra = counters.pending_totals(link__project_id=pk)
+        total = (sums["clicks"] or 0) + extra["clicks"]
+        window = (sums["window_clicks"] or 0) + extra["window_clicks"]
+        return {
+            "project_id": pk,
+            "total_clicks": total,
+            "window_clicks": window,
+            "out_of_window_clicks": total - window,
+            "unique_users": unique_users,
+        }
+
+    return _get_or_build(f"stats:project:{pk}:{int(exact)}", _project_deps(pk), build)
+
+
+def project_range(pk: int, d_from: date, d_to: date) -> Dict[str, Any] | None:
+    """
+    Клики проекта за даты d_from..d_to (включительно) по посуточным ClickRollup:
+    одна строка на день, без ClickEvent. Последние минуты — с задержкой до ROLLUP_INTERVAL.
+    """
+    def build():
+        if not Project.objects.filter(pk=pk).exists():
+            return None
+        start, end = rollups.day_range(d_from, d_to)
+        clicks, hll = rollups.totals(rollups.PROJECT, [pk], start, end).get(pk, (0, None))
+        return {
+            "project_id": pk,
+            "from": d_from.isoformat(),
+            "to": d_to.isoformat(),
+            "total_clicks": clicks,
+            "unique_users": hll.count() if hll else 0,
+        }
+
+    return _get_or_build(f"stats:project:{pk}:{d_from}:{d_to}", _project_deps(pk), build)
+
+
+def project_owner_clicks(pk: int, d_from: date, d_to: date) -> Dict[int, int]:
+    """{owner_id: клики за d_from..d_to} по посуточным ClickRollup ссылок проекта."""
+    def build():
+        owners = dict(Link.objects.filter(project_id=pk).values_list("id", "owner_id"))
+        start, end = rollups.day_range(d_from, d_to)
+        out: Dict[int, int] = {}
+        for link_id, (clicks, _) in rollups.totals(rollups.LINK, owners, start, end).items():
+            out[owners[link_id]] = out.get(owners[link_id], 0) + clicks
+        return out
+
+    return _get_or_build(f"stats:project_owners:{pk}:{d_from}:{d_to}", _project_deps(pk), build)
+
+
+def totals(exact: bool = False) -> Dict[str, int]:
+    """Итог по всем ссылкам: {total_projects, total_links, total_clicks, unique_users}."""
+    return _get_or_build(f"stats:global:{int(exact)}", _GLOBAL_DEPS, lambda: {
+        "total_projects": Project.objects.count(),
+        "total_links": Link.objects.count(),
+        "total_clicks": _total_clicks(),
+        "unique_users": sketches.exact_unique() if exact else sketches.unique_count(sketches.GLOBAL),
+    })
+
+
+def summary() -> Dict[str, Any]:
+    """KPI для /api/summary: {projects, links, clicks}."""
+    return _get_or_build("stats:summary", _GLOBAL_DEPS, lambda: {
+        "projects": Project.objects.count(), "links": Link.objects.count(), "clicks": _total_clicks(),
+    })
@@ -1,3 +1,614 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from core import bots, cache, campaigns, counters, dedup, leaderboards, linkcache, redirects, shortcodes, sketches
+from core.clicks import ClickFlusher, ClickSpool, apply_clicks, make_record
+from core.hll import HyperLogLog
+from core.models import ClickEvent, JobState, Link, LinkCounterShard, Member, Project, ProjectMember
+
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+# тесты не трогают общий кэш, таблицу редиректов и spool рабочего окружения
+TEST_SETTINGS = dict(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}},
+    REDIRECT_TABLE_PATH="",
+    FAST_REDIRECTS=False,
+    CLICK_INGEST_MODE="sync",
+    CLICK_SPOOL_PATH=f"{tempfile.gettempdir()}/utm-test-spool.sqlite3",
+    CLICK_DEDUP_WINDOW=0,
+)
+
+
+@override_settings(**TEST_SETTINGS)
+class BaseTestCase(TestCase):
+    def setUp(self):
+        cache.backend().clear()
+        linkcache.link_targets.clear()
+        self.member = Member.objects.create(name="m")
+        self.project = Project.objects.create(name="P")
+        self.link = Link.objects.create(
+            project=self.project, owner=self.member, name="l", target_url="https://example.com/",
+        )
+        self.client = Client(HTTP_USER_AGENT=BROWSER_UA)
+
+
+class LegacyIdRedirectTests(BaseTestCase):
+    def test_seven_digit_id_is_not_a_code(self):
+        legacy = Link.objects.create(
+            pk=1000005, project=self.project, owner=self.member, name="old", target_url="https://old.example/",
+        )
+        # ссылка, в которую «1000005» раскодировался бы как Base62-код
+        n = sum(shortcodes.ALPHABET.index(c) * 62 ** i for i, c in enumerate(reversed("1000005")))
+        Link.objects.create(
+            pk=shortcodes._permute(n, shortcodes._KEYS[::-1]), project=self.project, owner=self.member,
+            name="other", target_url="https://other.example/",
+        )
+        resp = self.client.get(f"/go/{legacy.pk}")
+        self.assertEqual(resp["Location"], "https://old.example/")
+        self.assertEqual(ClickEvent.objects.get().link_id, legacy.pk)
+
+
+class DeletedLinkTests(BaseTestCase):
+    """Ссылку удалили в другом воркере, а кэш целей этого воркера её ещё помнит."""
+
+    def _delete_elsewhere(self):
+        pk = self.link.pk
+        self.assertEqual(linkcache.get_target(pk), "https://example.com/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Link.objects.filter(pk=pk).delete()
+        # сигнал сбросил кэш только здесь — возвращаем устаревшую запись, как у соседнего воркера
+        linkcache.link_targets._store(pk, "https://example.com/")
+        return pk
+
+    def test_go_returns_404(self):
+        pk = self._delete_elsewhere()
+        resp = self.client.get(f"/go/{pk}")
+        self.assertEqual(resp.status_code, 404)
+        # запись в кэше сброшена — следующий запрос решается без клика
+        self.assertIsNone(linkcache.get_target(pk))
+
+    def test_track_click_returns_404(self):
+        pk = self._delete_elsewhere()
+        resp = self.client.get(f"/api/track-click/?link={pk}&user=u")
+        self.assertEqual(resp.status_code, 404)
+
+
+class InternalEndpointTests(BaseTestCase):
+    """Служебные /api/_* — только staff, Bearer-токен или адрес из allow-list."""
+
+    url = "/api/_metrics"
+
+    def test_anonymous_forbidden(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(INTERNAL_API_TOKEN="s3cret")
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+    @override_settings(INTERNAL_API_ALLOWED_IPS=["127.0.0.1"])
+    def test_allowed_ip_ignores_forwarded_for(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR="10.0.0.5", HTTP_X_FORWARDED_FOR="127.0.0.1").status_code, 403)
+
+    def test_staff(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_user("ops", is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_link_cache_stats(self):
+        self.assertEqual(self.client.get("/api/_cache/links").status_code, 403)
+        with self.settings(INTERNAL_API_TOKEN="s3cret"):
+            resp = self.client.get("/api/_cache/links", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+
+
+class TimeseriesRangeTests(BaseTestCase):
+    """Период кампании по умолчанию длиннее лимита grain=hour — подрезается, а не 400."""
+
+    def setUp(self):
+        super().setUp()
+        Project.objects.filter(pk=self.project.pk).update(date_from=date(2026, 1, 1), date_to=date(2026, 6, 30))
+
+    def test_hour_grain_clamps_default_campaign_range(self):
+        resp = self.client.get(f"/api/projects/{self.project.pk}/timeseries?grain=hour")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["grain"], "hour")
+
+    def test_explicit_range_still_limited(self):
+        resp = self.client.get(f"/api/projects/{self.project.pk}/timeseries?grain=hour&from=2026-01-01&to=2026-03-01")
+        self.assertEqual(resp.status_code, 400)
+
+
+# ==========================
+# HyperLogLog и скетчи (user-004)
+# ==========================
+class HyperLogLogTests(SimpleTestCase):
+    def test_estimate_within_error(self):
+        hll = HyperLogLog()
+        hll.update(f"user-{i}" for i in range(20000))
+        # стандартная ошибка ≈1.6% — берём запас в 4 сигмы
+        self.assertAlmostEqual(hll.count(), 20000, delta=20000 * 0.065)
+
+    def test_small_and_empty(self):
+        self.assertEqual(HyperLogLog().count(), 0)
+        hll = HyperLogLog()
+        self.assertTrue(hll.add("a"))
+        self.assertFalse(hll.add("a"))
+        self.assertEqual(hll.count(), 1)
+
+    def test_merge_is_union(self):
+        a, b, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        a.update(f"u{i}" for i in range(0, 6000))
+        b.update(f"u{i}" for i in range(4000, 10000))
+        both.update(f"u{i}" for i in range(10000))
+        self.assertEqual(a.merge(b).registers, both.registers)
+
+    def test_bytes_round_trip(self):
+        hll = HyperLogLog()
+        hll.update(str(i) for i in range(500))
+        self.assertEqual(HyperLogLog.from_bytes(hll.to_bytes()).registers, hll.registers)
+
+
+class SketchTests(BaseTestCase):
+    def test_global_merges_projects(self):
+        other = Link.objects.create(
+            project=Project.objects.create(name="Q"), owner=self.member, name="o", target_url="https://example.org/",
+        )
+        with transaction.atomic():
+            sketches.add_clicks([(self.link.pk, f"u{i}") for i in range(300)])
+            sketches.add_clicks([(other.pk, f"u{i}") for i in range(200, 500)])
+        def estimate(keys):
+            hll = HyperLogLog()
+            hll.update(keys)
+            return hll.count()
+
+        self.assertEqual(sketches.unique_count(sketches.PROJECT, self.project.pk), estimate(f"u{i}" for i in range(300)))
+        # глобальный скетч не хранится — объединение проектов равно скетчу всех ключей
+        self.assertEqual(sketches.unique_count(sketches.GLOBAL), estimate(f"u{i}" for i in range(500)))
+
+    def test_conflicting_insert_merged(self):
+        from core.models import UniqueSketch
+
+        rival = HyperLogLog()
+        rival.update(f"r{i}" for i in range(100))
+        real_bulk_create = UniqueSketch.objects.bulk_create
+
+        def rival_first(objs, **kwargs):
+            # другой воркер успел создать строку ссылки между SELECT и INSERT
+            UniqueSketch.objects.create(scope=sketches.LINK, ref_id=self.link.pk, registers=rival.to_bytes())
+            return real_bulk_create(objs, **kwargs)
+
+        with transaction.atomic(), mock.patch.object(UniqueSketch.objects, "bulk_create", side_effect=rival_first):
+            sketches.add_clicks([(self.link.pk, f"u{i}") for i in range(100)])
+        both = HyperLogLog()
+        both.update([f"r{i}" for i in range(100)] + [f"u{i}" for i in range(100)])
+        self.assertEqual(sketches.unique_count(sketches.LINK, self.link.pk), both.count())
+
+
+# ==========================
+# Короткие коды (user-021)
+# ==========================
+class ShortcodeTests(SimpleTestCase):
+    def test_round_trip(self):
+        for link_id in (1, 2, 61, 62, 1000, 123456789, shortcodes._MAX_ID - 1):
+            code = shortcodes.encode(link_id)
+            self.assertEqual(len(code), shortcodes.LENGTH)
+            self.assertEqual(shortcodes.decode(code), link_id)
+
+    def test_codes_are_distinct(self):
+        codes = {shortcodes.encode(i) for i in range(1, 5001)}
+        self.assertEqual(len(codes), 5000)
+
+    def test_digit_only_codes_get_prefix(self):
+        # у этого id 7-символьный код вышел бы из одних цифр
+        self.assertEqual(shortcodes.encode(302658), "x3747010")
+        self.assertEqual(shortcodes.decode("x3747010"), 302658)
+        self.assertIsNone(shortcodes.decode("3747010"))
+
+    def test_routes_are_disjoint(self):
+        from django.urls import resolve
+
+        self.assertEqual(resolve("/go/1000005").url_name, "go")
+        self.assertEqual(resolve("/go/x3747010").url_name, "go_code")
+        self.assertEqual(resolve(f"/go/{shortcodes.encode(5)}").url_name, "go_code")
+
+    def test_invalid(self):
+        self.assertIsNone(shortcodes.decode("abc"))
+        self.assertIsNone(shortcodes.decode("abc-def"))
+        self.assertIsNone(shortcodes.decode("zzzzzzz"))  # больше _MAX_ID
+        for bad in (0, -1, shortcodes._MAX_ID):
+            with self.assertRaises(ValueError):
+                shortcodes.encode(bad)
+
+
+# ==========================
+# Spool: аренда, подтверждение, возврат (user-001)
+# ==========================
+class ClickSpoolTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.spool = ClickSpool(os.path.join(tmp, "spool.sqlite3"), lease_seconds=60)
+
+    def _fill(self, n, **kw):
+        self.spool.append_many([make_record(self.link.pk, f"u{i}", None, BROWSER_UA, **kw) for i in range(n)])
+
+    def test_claim_ack(self):
+        self._fill(5)
+        token, records = self.spool.claim(3)
+        self.assertEqual([r["user_key"] for r in records], ["u0", "u1", "u2"])
+        # арендованное другой claim не получает
+        _, rest = self.spool.claim(10)
+        self.assertEqual([r["user_key"] for r in rest], ["u3", "u4"])
+        self.spool.ack(token)
+        self.assertEqual(self.spool.pending(), 2)
+
+    def test_release_returns_records(self):
+        self._fill(2)
+        token, _ = self.spool.claim(10)
+        self.assertEqual(self.spool.claim(10)[1], [])
+        self.spool.release(token)
+        _, again = self.spool.claim(10)
+        self.assertEqual(len(again), 2)
+        self.assertEqual({r["attempts"] for r in again}, {2})
+
+    def test_expired_lease_is_reclaimed(self):
+        self._fill(1)
+        self.spool.claim(10)
+        with mock.patch("core.clicks.time.time", return_value=time.time() + 61):
+            _, records = self.spool.claim(10)
+        self.assertEqual(len(records), 1)
+
+    def test_flush_writes_and_acks(self):
+        self._fill(3)
+        flusher = ClickFlusher(self.spool, flush_size=2, interval=1)
+        self.assertEqual(flusher.flush(), 3)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(ClickEvent.objects.filter(link=self.link).count(), 3)
+
+    def test_poison_record_goes_to_dead_letter(self):
+        self._fill(2)
+        self.spool.append(make_record(self.link.pk, "bad", None, BROWSER_UA, ts=1e20))  # вне диапазона datetime
+        flusher = ClickFlusher(self.spool, flush_size=10, interval=1, max_attempts=2)
+        with self.assertRaises(OverflowError):
+            flusher.flush()
+        self.assertEqual(self.spool.pending(), 3)
+        with self.assertLogs("core.clicks", "ERROR"):
+            self.assertEqual(flusher.flush(), 2)
+        self.assertEqual((self.spool.pending(), self.spool.dead()), (0, 1))
+        self.assertEqual(self.spool.requeue_dead(), 1)
+        self.assertEqual((self.spool.pending(), self.spool.dead()), (1, 0))
+
+
+# ==========================
+# Дедупликация (user-023)
+# ==========================
+class DedupTests(BaseTestCase):
+    def test_memory_window(self):
+        d = dedup.MemoryDeduper(window_s=10, maxsize=100)
+        with mock.patch("core.dedup.time.monotonic", return_value=100.0):
+            self.assertFalse(d.is_duplicate(1, "u"))
+            self.assertTrue(d.is_duplicate(1, "u"))
+            self.assertFalse(d.is_duplicate(2, "u"))
+        with mock.patch("core.dedup.time.monotonic", return_value=110.0):
+            self.assertFalse(d.is_duplicate(1, "u"))
+
+    def test_cache_window(self):
+        d = dedup.CacheDeduper(window_s=10)
+        self.assertFalse(d.is_duplicate(1, "u"))
+        self.assertTrue(d.is_duplicate(1, "u"))
+        self.assertFalse(d.is_duplicate(1, "v"))
+
+    def test_repeat_click_not_recorded(self):
+        self.addCleanup(setattr, dedup, "_deduper", None)
+        dedup._deduper = None
+        with self.settings(CLICK_DEDUP_WINDOW=10):
+            for user in ("u", "u", "v"):
+                self.assertEqual(self.client.get(f"/api/track-click/?link={self.link.pk}&user={user}").status_code, 200)
+        self.assertEqual(ClickEvent.objects.filter(link=self.link).count(), 2)
+
+
+# ==========================
+# Боты (user-017)
+# ==========================
+class BotTests(BaseTestCase):
+    def test_verdicts(self):
+        cases = {
+            "TelegramBot (like TwitterBot)": ("telegram", True),
+            "python-requests/2.31.0": ("python", False),
+            "Sogou web spider/4.0(+http://www.sogou.com/docs/help/webmasters.htm#07)": ("sogou", False),
+            "Ruby/3.2 Net::HTTP": ("ruby", False),
+        }
+        for ua, (family, preview) in cases.items():
+            verdict = bots.classify(ua)
+            self.assertEqual((verdict.family, verdict.preview), (family, preview), ua)
+
+    def test_browsers_are_people(self):
+        for ua in (
+            BROWSER_UA,
+            "Mozilla/5.0 (Linux; Android 10) AppleWebKit/537.36 SogouMobileBrowser/5.2",
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Instagram 300.0",
+        ):
+            self.assertIsNone(bots.classify(ua), ua)
+
+    def test_empty_ua(self):
+        self.assertIsNone(bots.classify(""))
+        classifier = bots.BotClassifier({}, block_empty=True)
+        self.assertEqual(classifier.classify(""), bots.EMPTY_UA)
+
+    def test_bot_click_not_recorded(self):
+        resp = self.client.get(f"/go/{self.link.pk}", HTTP_USER_AGENT="TelegramBot (like TwitterBot)")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, "og:title")
+        self.assertFalse(ClickEvent.objects.filter(link=self.link).exists())
+        self.assertEqual(self.client.get(f"/go/{self.link.pk}").status_code, 302)
+        self.assertEqual(ClickEvent.objects.filter(link=self.link).count(), 1)
+
+    def test_empty_ua_click_recorded(self):
+        resp = self.client.get(f"/go/{self.link.pk}", HTTP_USER_AGENT="")
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.get(f"/api/track-click/?link={self.link.pk}&user=no-ua", HTTP_USER_AGENT="")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(ClickEvent.objects.filter(link=self.link).count(), 2)
+
+
+
+# ==========================
+# Лидерборды (user-007)
+# ==========================
+class LeaderboardMemberTests(BaseTestCase):
+    def _get(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp["ETag"], resp.json()["items"]
+
+    def _revalidate(self, url, tag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=tag).status_code
+
+    def test_rename_refreshes_project_board(self):
+        url = f"/api/projects/{self.project.pk}/leaderboard"
+        tag, _ = self._get(url)
+        self.member.name = "renamed"
+        self.member.save()
+        self.assertEqual(self._revalidate(url, tag), 200)
+        self.assertEqual(self._get(url)[1][0]["name"], "renamed")
+
+    def test_member_delete_refreshes_boards(self):
+        other = Member.objects.create(name="other")
+        Link.objects.create(project=self.project, owner=other, name="o", target_url="https://example.org/")
+        url = f"/api/projects/{self.project.pk}/leaderboard"
+        tag, items = self._get(url)
+        global_tag, _ = self._get("/api/members")
+        self.assertEqual(len(items), 2)
+        other.delete()
+        self.assertEqual(self._revalidate(url, tag), 200)
+        self.assertEqual(self._revalidate("/api/members", global_tag), 200)
+        self.assertEqual([it["name"] for it in self._get(url)[1]], ["m"])
+
+    def test_membership_bumps_project_board(self):
+        leaderboards.ensure_built(self.project.pk)
+        before = leaderboards.version(self.project.pk)
+        pm = ProjectMember.objects.create(project=self.project, member=self.member)
+        pm.delete()
+        self.assertEqual(leaderboards.version(self.project.pk), before + 2)
+
+# ==========================
+# Период кампании (user-025)
+# ==========================
+class CampaignWindowTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        Project.objects.filter(pk=self.project.pk).update(date_from=date(2026, 3, 1), date_to=date(2026, 3, 31))
+
+    def _ts(self, *args):
+        return datetime(*args, tzinfo=dt_timezone.utc).timestamp()
+
+    def test_clicks_tagged(self):
+        apply_clicks([
+            make_record(self.link.pk, "before", None, BROWSER_UA, ts=self._ts(2026, 2, 15)),
+            make_record(self.link.pk, "inside", None, BROWSER_UA, ts=self._ts(2026, 3, 15)),
+            make_record(self.link.pk, "after", None, BROWSER_UA, ts=self._ts(2026, 4, 15)),
+        ])
+        tags = dict(ClickEvent.objects.values_list("user_key", "in_window"))
+        self.assertEqual(tags, {"before": False, "inside": True, "after": False})
+        self.link.refresh_from_db()
+        self.assertEqual((self.link.clicks, self.link.window_clicks), (3, 1))
+
+    def test_open_window_counts_everything(self):
+        Project.objects.filter(pk=self.project.pk).update(date_from=None, date_to=None)
+        apply_clicks([make_record(self.link.pk, "u", None, BROWSER_UA, ts=self._ts(2020, 1, 1))])
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.window_clicks, 1)
+
+    def test_date_change_marked_in_db(self):
+        apply_clicks([make_record(self.link.pk, "u", None, BROWSER_UA, ts=self._ts(2026, 2, 15))])
+        mark = f"{campaigns.MARK_PREFIX}{self.project.pk}"
+        self.project.refresh_from_db()
+        self.project.date_from = date(2026, 2, 1)
+        with mock.patch.object(campaigns, "recount", side_effect=RuntimeError):
+            self.project.save()
+            with self.assertRaises(RuntimeError):
+                campaigns.recount_dirty()
+        # пометка — строка в БД: пережила ошибку и видна любому воркеру
+        self.assertTrue(JobState.objects.filter(name=mark).exists())
+        self.assertEqual(campaigns.recount_dirty(), 1)
+        self.assertFalse(JobState.objects.filter(name=mark).exists())
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.window_clicks, 1)
+
+
+# ==========================
+# Шардированные счётчики (user-003)
+# ==========================
+@override_settings(CLICK_COUNTER_SHARDS=4)
+class CounterCompactionTests(BaseTestCase):
+    def _totals(self):
+        self.link.refresh_from_db()
+        return self.link.clicks + counters.pending().get(self.link.pk, 0)
+
+    def test_two_compactions_over_same_snapshot(self):
+        counters.add_clicks({self.link.pk: 5}, {self.link.pk: 2})
+        real_atomic = transaction.atomic
+        raced = []
+
+        def atomic_with_rival(*args, **kwargs):
+            # второй воркер успевает сделать свою компакцию до нашего чтения слотов
+            if not raced:
+                raced.append(None)
+                raced[0] = counters.compact()
+            return real_atomic(*args, **kwargs)
+
+        with mock.patch("core.counters.transaction.atomic", atomic_with_rival):
+            second = counters.compact()
+        self.assertEqual((raced, second), ([5], 0))
+        self.assertEqual(self._totals(), 5)
+        self.assertEqual(self.link.window_clicks, 2)
+        self.assertFalse(LinkCounterShard.objects.exists())
+
+
+# ==========================
+# Админка (user-019)
+# ==========================
+class AdminFilterTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        other = Link.objects.create(
+            project=Project.objects.create(name="Q"), owner=self.member, name="o", target_url="https://example.org/",
+        )
+        ClickEvent.objects.create(link=self.link, user_key="in-project")
+        ClickEvent.objects.create(link=other, user_key="elsewhere")
+
+    def test_two_hop_project_filter(self):
+        resp = self.client.get(f"/admin/core/clickevent/?link__project__id__exact={self.project.pk}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([e.user_key for e in resp.context["cl"].result_list], ["in-project"])
+
+    def test_single_hop_filter(self):
+        resp = self.client.get(f"/admin/core/link/?project__id__exact={self.project.pk}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([l.pk for l in resp.context["cl"].result_list], [self.link.pk])
+
+
+# ==========================
+# Статистика (user-020)
+# ==========================
+class ProjectStatsTests(BaseTestCase):
+    def test_global_keeps_catalog_counts(self):
+        self.client.get(f"/go/{self.link.pk}")
+        data = self.client.get("/api/project-stats/").json()
+        self.assertEqual(data, {"total_projects": 1, "total_links": 1, "total_clicks": 1, "unique_users": 1})
+
+
+# ==========================
+# Fast lane (user-022)
+# ==========================
+class FastLaneTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        from django.conf import settings
+        from utmtracker.fastlane import FastLaneWSGIHandler
+
+        self.full_chain = list(settings.MIDDLEWARE)
+        self.handler = FastLaneWSGIHandler()
+
+    def _post(self, **extra):
+        from django.test import RequestFactory
+
+        request = RequestFactory().post(
+            "/api/track-click/", {"link": self.link.pk}, HTTP_USER_AGENT=BROWSER_UA, **extra,
+        )
+        return self.handler.get_response(request)
+
+    def test_chain_is_filtered_settings_middleware(self):
+        from django.conf import settings
+
+        self.assertEqual(settings.MIDDLEWARE, self.full_chain)
+        self.assertIn("django.middleware.csrf.CsrfViewMiddleware", self.handler.fast.middleware)
+        self.assertNotIn("django.contrib.sessions.middleware.SessionMiddleware", self.handler.fast.middleware)
+
+    def test_post_without_csrf_token_rejected(self):
+        self.assertEqual(self._post().status_code, 403)
+        self.assertFalse(ClickEvent.objects.exists())
+
+    def test_post_with_csrf_token_recorded(self):
+        from django.middleware.csrf import _get_new_csrf_string
+
+        token = _get_new_csrf_string()
+        csrf = {"HTTP_COOKIE": f"csrftoken={token}", "HTTP_X_CSRFTOKEN": token}
+        self.assertEqual(self._post(**csrf).status_code, 200)
+        self.assertEqual(ClickEvent.objects.count(), 1)
+
+
+# ==========================
+# Таблица редиректов (user-021)
+# ==========================
+class RedirectTableTests(BaseTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "redirects.bin")
+        overrider = override_settings(REDIRECT_TABLE_PATH=self.path)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+        super().setUp()
+        redirects.refresh_dirty()
+        self.table = redirects.RedirectTable(self.path, check_interval=0)
+
+    def _code(self, link):
+        return shortcodes.encode(link.pk)
+
+    def test_changes_patched_in_place(self):
+        self.assertEqual(self.table.lookup(self._code(self.link)), (self.link.pk, "https://example.com/"))
+        inode = os.stat(self.path).st_ino
+        created = [
+            Link.objects.create(project=self.project, owner=self.member, name=f"n{i}", target_url=f"https://n{i}.example/")
+            for i in range(20)
+        ]
+        self.link.target_url = "https://example.com/new"
+        self.link.save()
+        gone = created.pop()
+        gone_code = self._code(gone)
+        gone.delete()
+        # пометки — в БД, до прохода задачи таблица прежняя
+        self.assertTrue(JobState.objects.filter(name=f"{redirects.MARK_PREFIX}{self.link.pk}").exists())
+        self.assertIsNone(self.table.lookup(self._code(created[0])))
+
+        self.assertEqual(redirects.refresh_dirty(), 21)
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+        self.assertFalse(JobState.objects.filter(name__startswith=redirects.MARK_PREFIX).exists())
+        self.assertEqual(self.table.lookup(self._code(self.link)), (self.link.pk, "https://example.com/new"))
+        self.assertEqual(self.table.lookup(self._code(created[0])), (created[0].pk, "https://n0.example/"))
+        self.assertIsNone(self.table.lookup(gone_code))
+        self.assertEqual(self.table.stats()["entries"], 20)
+
+    def test_torn_slot_is_a_miss(self):
+        with open(self.path, "r+b") as f:
+            f.seek(os.path.getsize(self.path) - 1)
+            f.write(b"#")
+        self.assertIsNone(self.table.lookup(self._code(self.link)))
+
+    def test_grows_past_capacity(self):
+        with mock.patch.object(redirects, "_HEADROOM", 4):
+            redirects.rebuild()
+            inode = os.stat(self.path).st_ino
+            links = Link.objects.bulk_create([
+                Link(project=self.project, owner=self.member, name=f"b{i}", target_url=f"https://b{i}.example/")
+                for i in range(10)
+            ])
+            redirects.mark(l.pk for l in links)
+            redirects.refresh_dirty()
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(self.table.lookup(self._code(links[-1])), (links[-1].pk, "https://b9.example/"))
@@ -0,0 +1,74 @@
+# core/uaparse.py
+"""
+Лёгкий разбор User-Agent на семейства браузера / ОС / устройства.
+Без внешних зависимостей: упорядоченные правила, первое совпадение побеждает.
+Модуль «чистый» (без моделей); миграция-бэкфилл 0013 держит свою замороженную копию.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Tuple
+
+DESKTOP = "desktop"
+MOBILE = "mobile"
+TABLET = "tablet"
+BOT = "bot"
+OTHER = "other"
+
+_BOT_RE = re.compile(r"bot\b|crawl|spider|slurp|preview|externalhit|headless|python-|curl/|wget/|httpclient", re.I)
+
+_BROWSERS = (
+    ("Instagram", re.compile(r"Instagram", re.I)),
+    ("Facebook", re.compile(r"FBAN|FBAV|FB_IAB", re.I)),
+    ("Telegram", re.compile(r"Telegram", re.I)),
+    ("Yandex", re.compile(r"YaBrowser|YaSearchBrowser", re.I)),
+    ("Edge", re.compile(r"Edg(e|A|iOS)?/", re.I)),
+    ("Opera", re.compile(r"OPR/|Opera|OPT/", re.I)),
+    ("Samsung Internet", re.compile(r"SamsungBrowser", re.I)),
+    ("Firefox", re.compile(r"Firefox|FxiOS", re.I)),
+    ("Chrome", re.compile(r"Chrome|CriOS|Chromium", re.I)),
+    ("Safari", re.compile(r"Version/[\d.]+.*Safari|Mobile/\w+ Safari", re.I)),
+)
+
+_OSES = (
+    ("iOS", re.compile(r"iPhone|iPad|iPod", re.I)),
+    ("Android", re.compile(r"Android", re.I)),
+    ("Windows", re.compile(r"Windows", re.I)),
+    ("macOS", re.compile(r"Mac OS X|Macintosh", re.I)),
+    ("ChromeOS", re.compile(r"CrOS", re.I)),
+    ("Linux", re.compile(r"Linux|X11", re.I)),
+)
+
+_TABLET_RE = re.compile(r"iPad|Tablet|Android(?!.*Mobile)", re.I)
+_MOBILE_RE = re.compile(r"Mobi|iPhone|iPod|Android|Windows Phone", re.I)
+_DESKTOP_RE = re.compile(r"Windows|Macintosh|X11|Linux|CrOS", re.I)
+
+
+def _first(rules, ua: str) -> str:
+    for name, rx in rules:
+        if rx.search(ua):
+            return name
+    return "Other"
+
+
+def parse(ua: str) -> Tuple[str, str, str]:
+    """(browser, os, device)"""
+    if not ua:
+        return "Other", "Other", OTHER
+    if _BOT_RE.search(ua):
+        return "Bot", _first(_OSES, ua), BOT
+    if _TABLET_RE.search(ua):
+        device = TABLET
+    elif _MOBILE_RE.search(ua):
+        device = MOBILE
+    elif _DESKTOP_RE.search(ua):
+        device = DESKTOP
+    else:
+        device = OTHER
+    return _first(_BROWSERS, ua), _first(_OSES, ua), device
+
+
+def ua_hash(ua: str) -> str:
+    """Ключ строки в словаре UserAgent (blake2b-128, hex)."""
+    return hashlib.blake2b(ua.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
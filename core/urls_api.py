@@ -1,7 +1,11 @@
 # core/urls_api.py
+from django.conf import settings
 from django.urls import path
 from utmtracker import views as api   # CRUD и агрегаты
-from core import views as stats       # трекинг кликов и стат-эндпоинты
+from utmtracker import views_async    # async-трекинг для ASGI
+from core import views as tracking    # трекинг кликов
+
+track_view = views_async.track_click if settings.ASYNC_REDIRECTS else tracking.track_click
 
 urlpatterns = [
     # ---------- Участники ----------
@@ -14,9 +18,9 @@ urlpatterns = [
     # /api/projects/<int:pk>/links/by-owner/<int:owner_id>
     # (он объявлен в utmtracker/urls.py)
 
-    # ---------- Клики и статистика ----------
-    path("track-click/", stats.track_click, name="api_track_click"),
-    path("link-stats/<int:link_id>/", stats.link_stats, name="api_link_stats"),
-    path("project-stats/", stats.project_stats, name="api_project_stats"),
-    path("project-stats/<int:project_id>/", stats.project_stats_one, name="api_project_stats_one"),
+    # ---------- Клики и статистика (числа — из core/stats.py) ----------
+    path("track-click/", track_view, name="api_track_click"),
+    path("link-stats/<int:pk>/", api.link_stats, name="api_link_stats"),
+    path("project-stats/", api.project_stats_global, name="api_project_stats"),
+    path("project-stats/<int:pk>/", api.project_stats, name="api_project_stats_one"),
 ]
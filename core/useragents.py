@@ -0,0 +1,81 @@
+# core/useragents.py
+"""
+Словарь User-Agent (UserAgent) для ClickEvent.
+
+resolve(uas) превращает строки UA пачки кликов в id словаря:
+сначала LRU внутри воркера (settings.USER_AGENT_CACHE_SIZE), промахи — один
+INSERT OR IGNORE новых строк и один SELECT по хэшам. Набор реальных UA невелик,
+поэтому в установившемся режиме запись клика не делает лишних запросов.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import UserAgent
+from core.uaparse import parse, ua_hash
+
+
+class UserAgentCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, maxsize)
+        self._data: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, uas: Iterable[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        with self._lock:
+            for ua in uas:
+                ua_id = self._data.get(ua)
+                if ua_id is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(ua)
+                self.hits += 1
+                found[ua] = ua_id
+        return found
+
+    def put_many(self, ids: Dict[str, int]) -> None:
+        with self._lock:
+            for ua, ua_id in ids.items():
+                self._data[ua] = ua_id
+                self._data.move_to_end(ua)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+ua_cache = UserAgentCache(getattr(settings, "USER_AGENT_CACHE_SIZE", 5000))
+
+
+def resolve(uas: Iterable[str]) -> Dict[str, int]:
+    """{ua: UserAgent.id} для непустых строк; недостающие создаются."""
+    wanted = {ua for ua in uas if ua}
+    if not wanted:
+        return {}
+    ids = ua_cache.get_many(wanted)
+    missing = wanted - ids.keys()
+    if missing:
+        by_hash = {ua_hash(ua): ua for ua in missing}
+        new = []
+        for h, ua in by_hash.items():
+            browser, os_, device = parse(ua)
+            new.append(UserAgent(ua_hash=h, ua=ua, browser=browser, os=os_, device=device))
+        UserAgent.objects.bulk_create(new, ignore_conflicts=True)
+        fetched = {
+            by_hash[h]: pk
+            for pk, h in UserAgent.objects.filter(ua_hash__in=by_hash.keys()).values_list("pk", "ua_hash")
+        }
+        # в кэш — только после коммита: при откате новые строки словаря исчезнут
+        transaction.on_commit(lambda: ua_cache.put_many(fetched))
+        ids.update(fetched)
+    return ids
@@ -1,9 +1,10 @@
 # core/views.py
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponseBadRequest
-from django.db.models import F
-from django.utils.timezone import now
-from .models import Project, Member, Link, ClickEvent
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from . import bots
+from .clicks import record_click
+from .linkcache import get_target
+from .models import Link, Project
 import hashlib
 
 
@@ -40,12 +41,10 @@ def _client_ip(request):
     return request.META.get("REMOTE_ADDR")
 
 
-def track_click(request):
+def parse_track_request(request):
     """
-    Регистрирует клик по ссылке.
-    Поддерживает:
-      - GET:  ?link=<id>&user=<user_key>
-      - POST: link=<id>, user=<user_key>
+    Разбирает параметры /api/track-click/.
+    Возвращает (link_id, user_key, ip, ua) или HttpResponse с ошибкой.
     """
     link_id = request.GET.get("link") or request.POST.get("link")
     ua = request.META.get("HTTP_USER_AGENT", "")
@@ -58,92 +57,51 @@ def track_click(request):
         return HttpResponseBadRequest("Missing link id")
 
     try:
-        link = Link.objects.get(pk=link_id)
-    except Link.DoesNotExist:
-        return JsonResponse({"detail": "Link not found"}, status=404)
+        link_id = int(link_id)
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest("Bad link id")
+    return link_id, user_key, ip, ua
 
-    # создаём событие клика
-    ClickEvent.objects.create(
-        link=link,
-        user_key=user_key or None,  # None, чтобы пустые не считались уникальными
-        ip=_client_ip(request),
-        ua=(request.META.get("HTTP_USER_AGENT", "")[:700]),
-        created_at=now(),
-    )
 
-    # увеличиваем счётчик кликов у ссылки
-    Link.objects.filter(pk=link.pk).update(clicks=F("clicks") + 1)
+def link_not_found():
+    return JsonResponse({"detail": "Link not found"}, status=404)
 
-    return JsonResponse({"ok": True})
 
+def duplicate_ignored():
+    """Повтор клика внутри окна дедупликации (core/dedup.py): 200, но не засчитан."""
+    return JsonResponse({"ok": True, "counted": False, "duplicate": True})
 
-def link_stats(request, link_id: int):
-    """
-    Возвращает статистику по одной ссылке:
-    - всего кликов
-    - уникальных пользователей
-    """
-    qs = ClickEvent.objects.filter(link_id=link_id)
-    total_clicks = qs.count()
-    unique_users = (
-        qs.exclude(user_key__isnull=True)
-          .exclude(user_key="")
-          .values("user_key")
-          .distinct()
-          .count()
-    )
-    return JsonResponse({
-        "link_id": link_id,
-        "total_clicks": total_clicks,
-        "unique_users": unique_users,
-    })
-
-
-def project_stats(request):
-    """
-    Глобальная статистика по всем проектам (для Dashboard):
-    - общее количество проектов
-    - количество ссылок
-    - суммарные клики
-    - количество уникальных пользователей (по user_key)
-    """
-    total_projects = Project.objects.count()
-    total_links = Link.objects.count()
-    total_clicks = ClickEvent.objects.count()
-    unique_users = (
-        ClickEvent.objects
-        .exclude(user_key__isnull=True)
-        .exclude(user_key="")
-        .values("user_key")
-        .distinct()
-        .count()
-    )
-
-    data = {
-        "total_projects": total_projects,
-        "total_links": total_links,
-        "total_clicks": total_clicks,
-        "unique_users": unique_users,
-    }
-    return JsonResponse(data)
-
-
-def project_stats_one(request, project_id: int):
+
+def bot_ignored(verdict):
+    """Клик бота не записываем, но отвечаем 200 — клиенту незачем повторять."""
+    return JsonResponse({"ok": True, "counted": False, "bot": verdict.family})
+
+
+def track_click(request):
     """
-    Возвращает статистику по конкретному проекту:
-    - количество кликов
-    - количество уникальных пользователей (по user_key)
+    Регистрирует клик по ссылке.
+    Поддерживает:
+      - GET:  ?link=<id>&user=<user_key>
+      - POST: link=<id>, user=<user_key>
     """
-    qs = ClickEvent.objects.filter(link__project_id=project_id)
-    data = {
-        "project_id": project_id,
-        "total_clicks": qs.count(),
-        "unique_users": (
-            qs.exclude(user_key__isnull=True)
-              .exclude(user_key="")
-              .values("user_key")
-              .distinct()
-              .count()
-        ),
-    }
-    return JsonResponse(data)
+    parsed = parse_track_request(request)
+    if isinstance(parsed, HttpResponse):
+        return parsed
+    link_id, user_key, ip, ua = parsed
+
+    # существование ссылки — через кэш воркера, без SELECT Link
+    if get_target(link_id) is None:
+        return link_not_found()
+
+    verdict = bots.classify(ua, ip)
+    if verdict:
+        return bot_ignored(verdict)
+
+    # событие клика + счётчик у ссылки (сразу или через spool); повтор в окне — не пишем
+    try:
+        if not record_click(link_id, user_key, ip, ua):
+            return duplicate_ignored()
+    except Link.DoesNotExist:
+        return link_not_found()
+
+    return JsonResponse({"ok": True})
@@ -21,6 +21,8 @@ CREATOR_PASS=""
 VIEWER_PASS=""
 SECRET_KEY="${DJANGO_SECRET_KEY:-changeme-please}"
 DEBUG_FLAG="${DEBUG:-0}"
+# wsgi — gunicorn sync-воркеры; asgi — gunicorn + UvicornWorker (async /go/<pk>, utmtracker/views_async.py)
+APP_SERVER="${APP_SERVER:-wsgi}"
 # =======================
 
 echo "[0/9] Проверяем наличие sqlite3 (для бэкапов)"
@@ -53,7 +55,10 @@ pip install --upgrade pip wheel
 if [ -f requirements.txt ]; then
   pip install -r requirements.txt
 else
-  pip install "Django>=4.2" gunicorn whitenoise django-cors-headers
+  pip install "Django>=5.1" gunicorn whitenoise django-cors-headers
+fi
+if [ "$APP_SERVER" = "asgi" ]; then
+  pip install "uvicorn[standard]"
 fi
 
 echo "[4/9] Окружение ($ENV_FILE)"
@@ -68,6 +73,12 @@ QP_CREATOR_PASSWORD=${CREATOR_PASS}
 QP_VIEWER_PASSWORD=${VIEWER_PASS}
 PYTHONUNBUFFERED=1
 SQLITE_PATH=${SQLITE_PATH}
+CLICK_INGEST_MODE=buffered
+CLICK_SPOOL_PATH=${SQLITE_DIR}/click_spool.sqlite3
+CLICK_ARCHIVE_DIR=${SQLITE_DIR}/archive
+REDIRECT_TABLE_PATH=${SQLITE_DIR}/redirects.bin
+CACHE_BACKEND=sqlite
+CACHE_LOCATION=${SQLITE_DIR}/cache.sqlite3
 EOF
 chmod 600 "$ENV_FILE"
 
@@ -89,6 +100,8 @@ echo "[6/9] Миграции и статика"
 # запускаем manage.py в том же окружении, что и сервис
 env $(cat "$ENV_FILE" | xargs) ./venv/bin/python manage.py migrate --noinput || true
 env $(cat "$ENV_FILE" | xargs) ./venv/bin/python manage.py collectstatic --noinput || true
+env $(cat "$ENV_FILE" | xargs) ./venv/bin/python manage.py build_redirects || true
+chown -R www-data:www-data "$SQLITE_DIR"   # таблицу редиректов дальше обновляет сервис
 
 echo "[7/9] Останавливаем предыдущий сервис (если есть)"
 pkill -f "gunicorn .*${SERVICE_NAME}" || true
@@ -96,6 +109,13 @@ systemctl stop "${SERVICE_NAME}" 2>/dev/null || true
 systemctl disable "${SERVICE_NAME}" 2>/dev/null || true
 
 echo "[8/9] Создаём/обновляем systemd unit"
+if [ "$APP_SERVER" = "asgi" ]; then
+  APP_TARGET="utmtracker.asgi:application"
+  WORKER_ARGS="--worker-class uvicorn.workers.UvicornWorker"
+else
+  APP_TARGET="utmtracker.wsgi:application"
+  WORKER_ARGS=""
+fi
 cat > "$UNIT_FILE" <<EOF
 [Unit]
 Description=Gunicorn service for UTM Tracker
@@ -111,7 +131,7 @@ WorkingDirectory=${PROJECT_DIR}
 # safety: применяем миграции и статику при старте
 ExecStartPre=${PROJECT_DIR}/venv/bin/python ${PROJECT_DIR}/manage.py migrate --noinput
 ExecStartPre=${PROJECT_DIR}/venv/bin/python ${PROJECT_DIR}/manage.py collectstatic --noinput
-ExecStart=${PROJECT_DIR}/venv/bin/gunicorn utmtracker.wsgi:application \\
+ExecStart=${PROJECT_DIR}/venv/bin/gunicorn ${APP_TARGET} ${WORKER_ARGS} \\
   --chdir ${PROJECT_DIR} \\
   --bind 127.0.0.1:${PORT} \\
   --workers 3 \\
@@ -134,7 +154,7 @@ sleep 1
 systemctl status "${SERVICE_NAME}" --no-pager -l || true
 
 echo "✅ Готово."
-echo "• Gunicorn: 127.0.0.1:${PORT}"
+echo "• Gunicorn: 127.0.0.1:${PORT} (${APP_SERVER})"
 echo "• База:     ${SQLITE_PATH}"
 echo "• Бэкапы:   ${BACKUP_DIR}"
 echo "Проверка: ss -tulpn | grep ${PORT}  &&  journalctl -u ${SERVICE_NAME} -n 100 -f"
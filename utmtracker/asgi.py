@@ -1,5 +1,18 @@
 import os
-from django.core.asgi import get_asgi_application
+
+import django
+from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'utmtracker.settings')
-application = get_asgi_application()
+# под ASGI горячие эндпоинты трекинга — async (см. utmtracker/views_async.py)
+os.environ.setdefault('ASYNC_REDIRECTS', '1')
+django.setup(set_prefix=False)
+
+# то же, что get_asgi_application(), но трекинг идёт по короткой цепочке middleware
+from utmtracker.fastlane import FastLaneASGIHandler, wrap_asgi  # noqa: E402
+
+application = FastLaneASGIHandler()
+
+# /go/<code> из таблицы редиректов — до middleware Django (utmtracker/fastlane.py)
+if settings.FAST_REDIRECTS:
+    application = wrap_asgi(application)
@@ -0,0 +1,184 @@
+# utmtracker/fastlane.py
+"""
+Быстрые входы для горячих эндпоинтов трекинга.
+
+1. Таблица редиректов: обёртка над WSGI/ASGI-приложением Django для /go/<code>.
+
+Запрос GET /go/<code> ищется в таблице редиректов (core/redirects.py, mmap);
+при попадании ответ собирается прямо здесь — без URL-резолвера, middleware
+(сессии, CSRF, auth, messages, метрики) и без БД: ботам — то же, что в link_redirect,
+людям — клик (record_click / arecord_click) и 302. Всё остальное, включая промахи
+таблицы (ссылка создана только что, старые /go/<id>), уходит в Django как обычно.
+Если sync-запись клика выяснила, что ссылку уже удалили (таблица ещё не обновилась),
+запрос тоже уходит в Django — он ответит 404; прочие ошибки записи — 500.
+
+Включается settings.FAST_REDIRECTS (wsgi.py / asgi.py).
+
+2. Fast lane: обработчики Django, которые запросы с префиксами FAST_LANE_PREFIXES
+(/go/, /api/track-click/) пропускают через MIDDLEWARE без FAST_LANE_SKIP_MIDDLEWARE —
+без сессий, auth и messages, которые этим вьюхам не нужны. CSRF остаётся: POST
+/api/track-click/ проверяется так же, как в полной цепочке. Остальные запросы идут через
+полный MIDDLEWARE. Обе цепочки собираются один раз при старте воркера.
+"""
+from __future__ import annotations
+
+import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect, HttpResponseServerError
+from django.test.utils import override_settings
+
+from core import bots, redirects
+from core.clicks import arecord_click, record_click
+from core.models import Link
+from utmtracker.views import _crawler_page, _meta_ip, _user_key
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "/go/"
+
+
+def _resolve(method: str, path: str, meta, query: str):
+    """
+    Решение fast path: None — отдать Django, иначе (response, click | None),
+    где click = (link_id, user_key, ip, ua) для записи.
+    """
+    if method != "GET" or not path.startswith(PREFIX):
+        return None
+    hit = redirects.lookup(path[len(PREFIX):].rstrip("/"))
+    if hit is None:
+        return None
+    link_id, target_url = hit
+
+    ua = meta.get("HTTP_USER_AGENT", "") or ""
+    ip = _meta_ip(meta)
+    verdict = bots.classify(ua, ip)
+    if verdict:
+        return (_crawler_page(target_url) if verdict.preview else HttpResponseRedirect(target_url)), None
+
+    user = parse_qs(query).get("user", [""])[-1] if "user=" in query else ""
+    return HttpResponseRedirect(target_url), (link_id, _user_key(user, ip, ua), ip, ua)
+
+
+# ==========================
+# WSGI
+# ==========================
+def wrap_wsgi(django_app):
+    def application(environ, start_response):
+        decided = _resolve(
+            environ.get("REQUEST_METHOD", ""), environ.get("PATH_INFO", ""), environ, environ.get("QUERY_STRING", ""),
+        )
+        if decided is None:
+            return django_app(environ, start_response)
+        response, click = decided
+        if click:
+            # запрос идёт мимо Django: соединения с БД закрываем сами, как request_started/finished
+            close_old_connections()
+            try:
+                record_click(*click)
+            except Link.DoesNotExist:
+                return django_app(environ, start_response)
+            except Exception:
+                logger.exception("fast redirect: click recording failed for %s", environ.get("PATH_INFO"))
+                response = HttpResponseServerError()
+            finally:
+                close_old_connections()
+        status = f"{response.status_code} {response.reason_phrase}"
+        start_response(status, list(response.items()))
+        return [response.content]
+
+    return application
+
+
+# ==========================
+# ASGI
+# ==========================
+def _asgi_meta(scope):
+    """Минимальный META из scope: только то, что нужно для бота и user_key."""
+    meta = {}
+    for name, value in scope.get("headers", ()):
+        if name == b"user-agent":
+            meta["HTTP_USER_AGENT"] = value.decode("latin-1")
+        elif name == b"x-forwarded-for":
+            meta["HTTP_X_FORWARDED_FOR"] = value.decode("latin-1")
+    client = scope.get("client")
+    if client:
+        meta["REMOTE_ADDR"] = client[0]
+    return meta
+
+
+def wrap_asgi(django_app):
+    async def application(scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(PREFIX):
+            return await django_app(scope, receive, send)
+        decided = _resolve(
+            scope.get("method", ""), scope["path"], _asgi_meta(scope), scope.get("query_string", b"").decode("latin-1"),
+        )
+        if decided is None:
+            return await django_app(scope, receive, send)
+        response, click = decided
+        if click:
+            await arecord_click(*click)
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response.items()]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": response.content})
+
+    return application
+
+
+# ==========================
+# Fast lane: короткая цепочка middleware по префиксу пути
+# ==========================
+class FastLaneHandler(BaseHandler):
+    """BaseHandler, чья цепочка — settings.MIDDLEWARE без FAST_LANE_SKIP_MIDDLEWARE."""
+
+    def __init__(self, skip):
+        super().__init__()
+        self.middleware = [m for m in settings.MIDDLEWARE if m not in set(skip)]
+
+    def load_middleware(self, is_async=False):
+        # сборку делает штатный BaseHandler.load_middleware; отфильтрованный список виден ему
+        # только внутри override_settings — один раз при создании обработчика, до первых запросов
+        with override_settings(MIDDLEWARE=self.middleware):
+            super().load_middleware(is_async=is_async)
+
+
+def fast_lane_prefixes():
+    return tuple(p for p in getattr(settings, "FAST_LANE_PREFIXES", ()) if p)
+
+
+def _fast_lane(is_async: bool) -> FastLaneHandler | None:
+    if not fast_lane_prefixes():
+        return None
+    handler = FastLaneHandler(getattr(settings, "FAST_LANE_SKIP_MIDDLEWARE", ()))
+    handler.load_middleware(is_async=is_async)
+    return handler
+
+
+class FastLaneWSGIHandler(WSGIHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefixes = fast_lane_prefixes()
+        self.fast = _fast_lane(is_async=False)
+
+    def get_response(self, request):
+        if self.fast is not None and request.path_info.startswith(self.prefixes):
+            return self.fast.get_response(request)
+        return super().get_response(request)
+
+
+class FastLaneASGIHandler(ASGIHandler):
+    def __init__(self):
+        super().__init__()
+        self.prefixes = fast_lane_prefixes()
+        self.fast = _fast_lane(is_async=True)
+
+    async def get_response_async(self, request):
+        if self.fast is not None and request.path_info.startswith(self.prefixes):
+            return await self.fast.get_response_async(request)
+        return await super().get_response_async(request)
@@ -46,8 +46,9 @@ INSTALLED_APPS = [
 
 # === MIDDLEWARE ===
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',            # время/SQL по вьюхам → /api/_metrics
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',          # статика
+    'core.middleware.WhiteNoiseMiddleware',                # статика (WhiteNoise, async-совместимый)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',               # CORS перед CommonMiddleware
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +58,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Fast lane (utmtracker/fastlane.py, wsgi.py/asgi.py): пути с этими префиксами идут через
+# MIDDLEWARE без FAST_LANE_SKIP_MIDDLEWARE (сессии, auth, messages, статика); CSRF остаётся.
+# FAST_LANE_PREFIXES='' — выкл.
+FAST_LANE_PREFIXES = [p for p in os.environ.get('FAST_LANE_PREFIXES', '/go/,/api/track-click/').split(',') if p]
+FAST_LANE_SKIP_MIDDLEWARE = [
+    'core.middleware.WhiteNoiseMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
 # === URLS / WSGI / ASGI ===
 ROOT_URLCONF = 'utmtracker.urls'
 WSGI_APPLICATION = 'utmtracker.wsgi.application'
@@ -65,6 +77,35 @@ ASGI_APPLICATION = 'utmtracker.asgi.application'
 # === DATABASE ===
 # 1) Если задан DATABASE_URL (например, Postgres) — используем его
 # 2) Иначе — SQLite по пути из ENV SQLITE_PATH (по умолчанию: BASE_DIR/db.sqlite3)
+
+# Профиль производительности SQLite (SQLITE_TUNING=0 — как раньше, без настроек).
+# PRAGMA применяются в хуке connection_created (core/sqlite.py).
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '-20000'))      # <0 — в КиБ (≈20 МБ)
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '10000'))   # мс
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))             # сек, постоянные соединения
+
+
+def _sqlite_database():
+    path = os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
+    db = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    if SQLITE_TUNING:
+        db.update({
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+                # atomic() открывает транзакцию сразу на запись — без deadlock'а
+                # при повышении блокировки SHARED -> RESERVED
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+    return path, db
+
+
 DATABASE_URL = os.environ.get('DATABASE_URL', '').strip()
 if DATABASE_URL:
     try:
@@ -74,15 +115,125 @@ if DATABASE_URL:
         }
     except Exception:
         # fallback на SQLite, если dj-database-url не установлен
-        SQLITE_PATH = os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
-        DATABASES = {
-            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': SQLITE_PATH}
-        }
+        SQLITE_PATH, _db = _sqlite_database()
+        DATABASES = {'default': _db}
 else:
-    SQLITE_PATH = os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
-    DATABASES = {
-        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': SQLITE_PATH}
-    }
+    SQLITE_PATH, _db = _sqlite_database()
+    DATABASES = {'default': _db}
+
+# === CLICK INGEST ===
+# sync     — клик пишется в БД прямо в запросе (по умолчанию)
+# buffered — клик кладётся в spool (отдельный SQLite-файл), фоновый поток сбрасывает пачками
+CLICK_INGEST_MODE = os.environ.get('CLICK_INGEST_MODE', 'sync')
+CLICK_SPOOL_PATH = os.environ.get('CLICK_SPOOL_PATH', str(BASE_DIR / 'click_spool.sqlite3'))
+CLICK_SPOOL_SYNC = os.environ.get('CLICK_SPOOL_SYNC', 'normal')        # off | normal | full
+CLICK_SPOOL_LEASE = float(os.environ.get('CLICK_SPOOL_LEASE', '60'))   # сек, аренда пачки flusher'ом
+CLICK_SPOOL_MAX_ATTEMPTS = int(os.environ.get('CLICK_SPOOL_MAX_ATTEMPTS', '5'))  # затем — по одному, битые в spool_dead
+CLICK_FLUSH_SIZE = int(os.environ.get('CLICK_FLUSH_SIZE', '200'))      # записей в пачке
+CLICK_FLUSH_INTERVAL = float(os.environ.get('CLICK_FLUSH_INTERVAL', '1.0'))  # сек
+
+# Дедупликация (core/dedup.py): повтор (ссылка, user_key) в течение окна не пишется; 0 — выкл.
+CLICK_DEDUP_WINDOW = float(os.environ.get('CLICK_DEDUP_WINDOW', '10'))   # сек
+CLICK_DEDUP_BACKEND = os.environ.get('CLICK_DEDUP_BACKEND', 'memory')   # memory | cache
+CLICK_DEDUP_SIZE = int(os.environ.get('CLICK_DEDUP_SIZE', '100000'))    # ключей в памяти воркера (memory)
+CLICK_DEDUP_CACHE = os.environ.get('CLICK_DEDUP_CACHE', '')             # алиас CACHES (cache); '' — SHARED_CACHE_ALIAS
+
+# === ASYNC (ASGI / uvicorn) ===
+# 1 — /go/<pk> и /api/track-click/ обслуживаются async-вьюхами (utmtracker/views_async.py);
+# asgi.py включает это по умолчанию, под gunicorn/WSGI остаются sync-вьюхи
+ASYNC_REDIRECTS = os.environ.get('ASYNC_REDIRECTS', '0') == '1'
+ASYNC_CLICK_BATCH_SIZE = int(os.environ.get('ASYNC_CLICK_BATCH_SIZE', '200'))          # кликов в пачке
+ASYNC_CLICK_BATCH_INTERVAL = float(os.environ.get('ASYNC_CLICK_BATCH_INTERVAL', '0.2'))  # сек
+
+# === SHORT LINKS (/go/<code>, core/redirects.py + utmtracker/fastlane.py) ===
+# Таблица код -> (link_id, target_url) в файле, который воркеры читают через mmap; '' — выкл.
+REDIRECT_TABLE_PATH = os.environ.get('REDIRECT_TABLE_PATH', str(BASE_DIR / 'redirects.bin'))
+REDIRECT_TABLE_INTERVAL = float(os.environ.get('REDIRECT_TABLE_INTERVAL', '1.0'))              # сек, применение изменений ссылок
+REDIRECT_TABLE_CHECK_INTERVAL = float(os.environ.get('REDIRECT_TABLE_CHECK_INTERVAL', '1.0'))  # сек, проверка нового файла
+# 1 — wsgi.py/asgi.py отдают /go/<code> из таблицы, не заходя в Django
+FAST_REDIRECTS = os.environ.get('FAST_REDIRECTS', '1') == '1' and bool(REDIRECT_TABLE_PATH)
+
+# === CLICK COUNTERS ===
+# 0 — инкремент прямо в Link.clicks; N > 0 — N слотов на ссылку (меньше конкуренции за строку)
+CLICK_COUNTER_SHARDS = int(os.environ.get('CLICK_COUNTER_SHARDS', '0'))
+CLICK_COUNTER_COMPACT_INTERVAL = float(os.environ.get('CLICK_COUNTER_COMPACT_INTERVAL', '60'))  # сек
+
+# === ROLLUPS (почасовые/посуточные агрегаты для графиков) ===
+ROLLUP_INTERVAL = float(os.environ.get('ROLLUP_INTERVAL', '60'))  # сек, 0 — только командой rollup_clicks
+
+# === CAMPAIGN WINDOWS (клики в периоде кампании проекта, core/campaigns.py) ===
+CAMPAIGN_RECOUNT_INTERVAL = float(os.environ.get('CAMPAIGN_RECOUNT_INTERVAL', '5'))  # сек, пересчёт после смены дат
+
+# === RETENTION (архив старых ClickEvent, см. core/retention.py) ===
+CLICK_RETENTION_DAYS = int(os.environ.get('CLICK_RETENTION_DAYS', '0'))               # 0 — хранить всё
+CLICK_ARCHIVE_DIR = os.environ.get('CLICK_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+CLICK_RETENTION_BATCH = int(os.environ.get('CLICK_RETENTION_BATCH', '5000'))          # событий на пачку
+CLICK_RETENTION_MAX_BATCHES = int(os.environ.get('CLICK_RETENTION_MAX_BATCHES', '20'))  # пачек за тик фоновой задачи
+CLICK_RETENTION_INTERVAL = float(os.environ.get('CLICK_RETENTION_INTERVAL', '3600'))  # сек
+
+# === LEADERBOARDS (снимки досок) ===
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', '5'))  # сек
+
+# === BOT DETECTION (core/bots.py) ===
+BOT_SIGNATURES_FILE = os.environ.get('BOT_SIGNATURES_FILE', str(BASE_DIR / 'core' / 'data' / 'bot_signatures.txt'))
+BOT_IP_RULES_FILE = os.environ.get('BOT_IP_RULES_FILE', '')   # напр. core/data/bot_ip_ranges.txt; '' — без IP-правил
+BOT_CACHE_SIZE = int(os.environ.get('BOT_CACHE_SIZE', '10000'))  # вердиктов по UA в LRU
+BOT_BLOCK_EMPTY_UA = os.environ.get('BOT_BLOCK_EMPTY_UA', '0') == '1'  # 1 — пустой UA считается ботом
+
+# === SHARED CACHE (core/cache.py: статистика, дашборд, цели ссылок, роли участников) ===
+# locmem — у каждого воркера свой; sqlite — один файл на машину (core/sqlite_cache.py);
+# file — FileBasedCache в каталоге; redis — CACHE_URL (нужен пакет redis)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')   # файл (sqlite), каталог (file) или redis://...
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '100000'))
+_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'utmtracker'),
+    'sqlite': ('core.sqlite_cache.SQLiteCache', str(BASE_DIR / 'cache.sqlite3')),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_cache_class, _cache_location = _CACHE_BACKENDS[CACHE_BACKEND]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_class,
+        'LOCATION': CACHE_LOCATION or _cache_location,
+        'KEY_PREFIX': 'utm',
+        'TIMEOUT': 300,
+        'OPTIONS': {} if CACHE_BACKEND == 'redis' else {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+}
+SHARED_CACHE_ALIAS = 'default'
+
+# === STATS (core/stats.py: /api/link-stats, /api/project-stats, /api/summary) ===
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', '5'))  # сек, общий кэш; 0 — выкл.
+
+# === DASHBOARD (/api/dashboard, общий кэш) ===
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '5'))  # сек
+
+# === EXPORT (/api/projects/<pk>/clicks.csv|.ndjson) ===
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))  # строк на fetch из БД и на кусок ответа
+
+# === LINK TARGET CACHE (в памяти воркера, промахи — через общий кэш) ===
+LINK_CACHE_SIZE = int(os.environ.get('LINK_CACHE_SIZE', '10000'))   # ссылок в LRU
+LINK_CACHE_TTL = float(os.environ.get('LINK_CACHE_TTL', '300'))     # сек
+
+# === SESSIONS / IDENTITY CACHE ===
+# signed_cookies: сессия целиком в подписанной cookie — ни одного запроса в БД на чтение сессии.
+# Для отзыва сессий на сервере: SESSION_ENGINE=django.contrib.sessions.backends.cached_db
+# (кэш сессий — CACHES['default'], общий для воркеров, если CACHE_BACKEND не locmem).
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.signed_cookies')
+MEMBER_CACHE_SIZE = int(os.environ.get('MEMBER_CACHE_SIZE', '5000'))  # участников в LRU
+MEMBER_CACHE_TTL = float(os.environ.get('MEMBER_CACHE_TTL', '30'))    # сек; смена роли в других воркерах видна через TTL
+
+# === REQUEST METRICS (/api/_metrics, Server-Timing) ===
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))   # доля записываемых запросов, 0 — выкл.
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1') == '1'
+
+# === INTERNAL ENDPOINTS (/api/_metrics, /api/_cache/links) ===
+# Доступ: staff-сессия, заголовок "Authorization: Bearer <INTERNAL_API_TOKEN>" или REMOTE_ADDR
+# из INTERNAL_API_ALLOWED_IPS. За nginx REMOTE_ADDR — адрес прокси, поэтому по умолчанию список пуст.
+INTERNAL_API_TOKEN = os.environ.get('INTERNAL_API_TOKEN', '')
+INTERNAL_API_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('INTERNAL_API_ALLOWED_IPS', '').split(',') if ip.strip()]
 
 # === AUTH ===
 AUTH_PASSWORD_VALIDATORS = [
@@ -1,9 +1,28 @@
 # utmtracker/urls.py  ← или project/urls.py, если структура другая
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, register_converter
 from utmtracker import views as api   # API-логика (основной backend)
+from utmtracker import views_async    # async-редирект для ASGI
 from core import views as pages       # HTML-страницы
 
+go_view = views_async.link_redirect if settings.ASYNC_REDIRECTS else api.link_redirect
+go_code_view = views_async.link_redirect_code if settings.ASYNC_REDIRECTS else api.link_redirect_code
+
+
+class ShortCodeConverter:
+    """7 символов Base62 хотя бы с одной буквой или "x" + 7 цифр (core/shortcodes.py)."""
+    regex = "(?=[0-9]*[A-Za-z])[0-9A-Za-z]{7}|x[0-9]{7}"
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(ShortCodeConverter, "code")
+
 urlpatterns = [
     # ===========================
     # 📄 HTML-страницы
@@ -29,6 +48,7 @@ urlpatterns = [
     # 📊 DASHBOARD
     # ===========================
     path('api/summary', api.summary, name='api_summary'),
+    path('api/dashboard', api.dashboard_bundle, name='api_dashboard'),
     path('api/leaderboard/global', api.global_leaderboard, name='api_global_leaderboard'),
 
     # ===========================
@@ -42,6 +62,12 @@ urlpatterns = [
     path('api/projects/<int:pk>/members/add', api.project_add_member, name='api_project_add_member'),
     path('api/projects/<int:pk>/links/by-owner/<int:owner_id>', api.project_links_by_owner, name='api_project_links_by_owner'),
     path('api/projects/<int:pk>/links/create', api.project_link_create, name='api_project_link_create'),
+    path('api/projects/<int:pk>/links/bulk', api.project_links_bulk, name='api_project_links_bulk'),
+    path('api/projects/<int:pk>/timeseries', api.project_timeseries, name='api_project_timeseries'),
+    path('api/projects/<int:pk>/devices', api.project_devices, name='api_project_devices'),
+    path('api/projects/<int:pk>/clicks.csv', api.project_clicks_export, {'fmt': 'csv'}, name='api_project_clicks_csv'),
+    path('api/projects/<int:pk>/clicks.ndjson', api.project_clicks_export, {'fmt': 'ndjson'}, name='api_project_clicks_ndjson'),
+    path('api/links/<int:pk>/timeseries', api.link_timeseries, name='api_link_timeseries'),
 
     # ===========================
     # 👥 MEMBERS
@@ -49,13 +75,21 @@ urlpatterns = [
     path('api/members', api.members_list, name='api_members_list'),
     path('api/members/create', api.member_create, name='api_member_create'),
 
+    # ===========================
+    # 📈 STATS (батч по ссылкам)
+    # ===========================
+    path('api/link-stats', api.link_stats_batch, name='api_link_stats_batch'),
+
     # ===========================
     # 🔗 SHORT REDIRECTS
     # ===========================
-    path('go/<int:pk>', api.link_redirect, name='go'),
+    path('go/<code:code>', go_code_view, name='go_code'),   # код всегда с буквой — с id не пересекается
+    path('go/<int:pk>', go_view, name='go'),                  # старые ссылки по id
+    path('api/_cache/links', api.link_cache_stats, name='api_link_cache_stats'),
+    path('api/_metrics', api.request_metrics, name='api_metrics'),
 
     # ===========================
-    # 🧠 LOCAL API (из core/views_api.py)
+    # 🧠 LOCAL API (core/urls_api.py)
     # ===========================
     # Эти пути можно использовать для своих тестов или расширений
     path('api/', include('core.urls_api')),  # ← важно: добавляем include
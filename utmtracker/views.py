@@ -3,16 +3,29 @@
 from __future__ import annotations
 from typing import Any, Dict, List
 
+import csv
 import hashlib
-import re
-
-from django.db.models import Count, Sum, F
-from django.http import JsonResponse, HttpResponseRedirect, HttpRequest, HttpResponse
+import hmac
+import io
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse, HttpResponseRedirect, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils.timezone import now
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
+from django.utils.timezone import localdate, localtime
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.http import condition, require_GET, require_POST, require_http_methods
 
+from core import bots, counters, dashboard, identity, leaderboards, metrics, redirects, rollups, shortcodes, stats
+from core.clicks import record_click
+from core.linkcache import get_target, link_targets
 from core.models import Project, Member, Link, ProjectMember, ClickEvent
 
 
@@ -20,13 +33,8 @@ from core.models import Project, Member, Link, ProjectMember, ClickEvent
 # Helpers (session & roles)
 # ==========================
 def _current_user(request: HttpRequest) -> Member | None:
-    uid = request.session.get("user_id")
-    if not uid:
-        return None
-    try:
-        return Member.objects.get(pk=uid)
-    except Member.DoesNotExist:
-        return None
+    # кэш на запрос + короткий TTL между запросами (core/identity.py)
+    return identity.current_member(request)
 
 
 def _role(request: HttpRequest) -> str:
@@ -47,6 +55,23 @@ def _require_editor(request: HttpRequest):
     return None
 
 
+def _require_internal(request: HttpRequest):
+    """
+    Служебные эндпоинты (/api/_*): staff-сессия, Bearer INTERNAL_API_TOKEN
+    или REMOTE_ADDR из INTERNAL_API_ALLOWED_IPS (X-Forwarded-For не доверяем). Иначе 403.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return None
+    token = getattr(settings, "INTERNAL_API_TOKEN", "")
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip(), token):
+        return None
+    if request.META.get("REMOTE_ADDR") in getattr(settings, "INTERNAL_API_ALLOWED_IPS", ()):
+        return None
+    return JsonResponse({"error": "forbidden"}, status=403)
+
+
 def _project_brief(p: Project) -> Dict[str, Any]:
     return {
         "id": p.id,
@@ -56,21 +81,103 @@ def _project_brief(p: Project) -> Dict[str, Any]:
     }
 
 
-def _member_row(name: str, links: int, clicks: int, member_id: int | None = None) -> Dict[str, Any]:
-    return {"id": member_id, "name": name, "links": links, "clicks": clicks or 0}
+def _member_row(
+    name: str, links: int, clicks: int, member_id: int | None = None, window_clicks: int | None = None,
+) -> Dict[str, Any]:
+    row = {"id": member_id, "name": name, "links": links, "clicks": clicks or 0}
+    if window_clicks is not None:
+        # доски проектов: клики в период кампании и вне его (core/campaigns.py)
+        row["window_clicks"] = window_clicks
+        row["out_of_window_clicks"] = (clicks or 0) - window_clicks
+    return row
+
+
+def _stats_range(request: HttpRequest, project: Project):
+    """
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (включительно, TIME_ZONE) для стат-эндпоинтов проекта.
+    None — параметров нет; (d_from, d_to) или JsonResponse с ошибкой.
+    Без from — начало кампании (или дата создания проекта), без to — сегодня.
+    """
+    raw_from, raw_to = request.GET.get("from"), request.GET.get("to")
+    if not raw_from and not raw_to:
+        return None
+    try:
+        d_from = parse_date(raw_from) if raw_from else None
+        d_to = parse_date(raw_to) if raw_to else None
+    except ValueError:
+        d_from = d_to = None
+    if (raw_from and not d_from) or (raw_to and not d_to):
+        return JsonResponse({"error": "bad_date"}, status=400)
+    d_to = d_to or localdate()
+    d_from = d_from or project.date_from or localdate(project.created_at)
+    if d_from > d_to:
+        return JsonResponse({"error": "bad_range"}, status=400)
+    if (d_to - d_from).days + 1 > _MAX_SERIES_DAYS[rollups.DAY]:
+        return JsonResponse({"error": "range_too_large"}, status=400)
+    return d_from, d_to
+
+
+def _has_range(request: HttpRequest) -> bool:
+    return bool(request.GET.get("from") or request.GET.get("to"))
+
+
+def _exact(request: HttpRequest) -> bool:
+    """?exact=1 — точный COUNT(DISTINCT) вместо HyperLogLog-оценки."""
+    return request.GET.get("exact") in ("1", "true", "yes")
+
+
+# -------- crawler detection (чтобы у ботов не было превью и кликов) --------
+def _client_ip(request: HttpRequest) -> str | None:
+    return _meta_ip(request.META)
+
 
+def _meta_ip(meta) -> str | None:
+    """IP клиента из META/WSGI environ (с учётом прокси)."""
+    xff = meta.get("HTTP_X_FORWARDED_FOR")
+    return xff.split(",")[0].strip() if xff else meta.get("REMOTE_ADDR")
 
-# -------- crawler detection (чтобы у ботов не было превью) --------
-BOT_UA_RE = re.compile(
-    r"(telegrambot|facebookexternalhit|twitterbot|slackbot|whatsapp|"
-    r"linkedinbot|vkshare|discordbot|bitlybot|skypeuripreview|pinterest|quora|applebot)",
-    re.I,
-)
 
+def _user_key(user: str | None, ip: str | None, ua: str) -> str:
+    """user_key клика: ?user= или стабильный хэш ip+ua, если фронт его не передал."""
+    user = (user or "").strip()
+    return user or hashlib.sha256(f"{ip}-{ua}".encode()).hexdigest()[:32]
 
-def _is_crawler(request: HttpRequest) -> bool:
+
+def _bot_verdict(request: HttpRequest) -> bots.Verdict | None:
+    """Verdict бота (core/bots.py) или None для человека."""
+    return bots.classify(request.META.get("HTTP_USER_AGENT", "") or "", _client_ip(request))
+
+
+def _bot_response(verdict: bots.Verdict, target_url: str) -> HttpResponse:
+    """Превьюерам — HTML без og:-тегов, прочим ботам — обычный 302; клик не считаем."""
+    if verdict.preview:
+        return _crawler_page(target_url)
+    return HttpResponseRedirect(target_url)
+
+
+def _crawler_page(target_url: str) -> HttpResponse:
+    """Минимальный HTML без og:/twitter: метатегов (превью не будет) c meta refresh."""
+    html = f"""<!doctype html>
+<html><head>
+  <meta charset="utf-8">
+  <meta http-equiv="refresh" content="0;url={target_url}">
+  <title>Redirecting…</title>
+  <!-- no og:* / twitter:* to prevent previews -->
+  <meta name="robots" content="noindex,nofollow">
+</head><body>
+  <p><a href="{target_url}">Redirecting…</a></p>
+</body></html>"""
+    resp = HttpResponse(html, content_type="text/html; charset=utf-8", status=200)
+    # Чуть кешируем у ботов, но без ог-тегов им нечего кэшировать как карточку
+    resp["Cache-Control"] = "public, max-age=86400"
+    return resp
+
+
+def _click_identity(request: HttpRequest) -> tuple[str, str | None, str]:
+    """(user_key, ip, ua) клика; user_key — из ?user= или стабильный хэш ip+ua."""
     ua = request.META.get("HTTP_USER_AGENT", "") or ""
-    return bool(BOT_UA_RE.search(ua))
+    ip = _client_ip(request)
+    return _user_key(request.GET.get("user"), ip, ua), ip, ua
 
 
 # ==========================
@@ -97,6 +204,7 @@ def login(request: HttpRequest):
 
     member, _ = Member.objects.get_or_create(name=username)
     request.session["user_id"] = member.id
+    identity.remember(request, member)
 
     return JsonResponse(
         {
@@ -113,6 +221,7 @@ def login(request: HttpRequest):
 def logout(request: HttpRequest):
     """Полный выход: очищаем сессию."""
     request.session.flush()
+    identity.forget(request)
     return JsonResponse({"ok": True})
 
 
@@ -137,25 +246,44 @@ def me(request: HttpRequest):
 # ==========================
 @require_GET
 def summary(request: HttpRequest):
-    projects = Project.objects.count()
-    links = Link.objects.count()
-    clicks = Link.objects.aggregate(s=Sum("clicks"))["s"] or 0
-    return JsonResponse({"projects": projects, "links": links, "clicks": clicks})
+    return JsonResponse(stats.summary())
+
+
+@require_GET
+def dashboard_bundle(request: HttpRequest):
+    """
+    Всё для главной страницы одним запросом (вместо summary + project-stats + leaderboard).
+    GET /api/dashboard
+    -> { summary: {projects, links, clicks, unique_users}, leaderboard: {items: [{id,name,links,clicks}]} }
+    """
+    return JsonResponse(dashboard.get())
+
+
+def _board_etag(board: int):
+    return lambda request, *args, **kwargs: leaderboards.etag(board)
+
+
+def _board_response(data: Dict[str, Any], board: int) -> JsonResponse:
+    resp = JsonResponse(data)
+    # при первом обращении доска собирается внутри view — тогда ETag ставим сами
+    tag = leaderboards.etag(board)
+    if tag:
+        resp.headers.setdefault("ETag", quote_etag(tag))
+    # браузер хранит ответ, но каждый раз переспрашивает с If-None-Match
+    resp["Cache-Control"] = "private, no-cache"
+    return resp
 
 
 @require_GET
+@condition(etag_func=_board_etag(leaderboards.GLOBAL))
 def global_leaderboard(request: HttpRequest):
     """
-    Глобальный лидерборд по всем ссылкам: группируем по Member.
+    Глобальный лидерборд по всем ссылкам (снимок LeaderboardEntry, ETag = версия доски).
     items: [{id,name,links,clicks}]
     """
-    rows = (
-        Link.objects.values("owner_id", "owner__name")
-        .annotate(links=Count("id"), clicks=Sum("clicks"))
-        .order_by("-clicks", "-links", "owner__name")
-    )
-    items = [_member_row(r["owner__name"], r["links"], r["clicks"], r["owner_id"]) for r in rows]
-    return JsonResponse({"items": items})
+    rows = leaderboards.entries(leaderboards.GLOBAL)
+    items = [_member_row(e.member.name, e.links, e.clicks, e.member_id) for e in rows]
+    return _board_response({"items": items}, leaderboards.GLOBAL)
 
 
 # ==========================
@@ -198,46 +326,59 @@ def project_detail(request: HttpRequest, pk: int):
 
 
 @require_GET
+@condition(etag_func=lambda request, pk: None if _has_range(request) else leaderboards.etag(pk))
 def project_leaderboard(request: HttpRequest, pk: int):
     """
-    Лидерборд внутри проекта: группируем ссылки этого проекта по Member.
-    items: [{id,name,links,clicks}]
+    Лидерборд внутри проекта (снимок LeaderboardEntry, ETag = версия доски).
+    items: [{id,name,links,clicks,window_clicks,out_of_window_clicks}]
+    ?from=&to= — клики за период по посуточным агрегатам: items: [{id,name,links,clicks}]
     """
-    rows = (
-        Link.objects.filter(project_id=pk)
-        .values("owner_id", "owner__name")
-        .annotate(links=Count("id"), clicks=Sum("clicks"))
-        .order_by("-clicks", "-links", "owner__name")
-    )
-    items = [
-        {"id": r["owner_id"], "name": r["owner__name"], "links": r["links"], "clicks": r["clicks"] or 0}
-        for r in rows
-    ]
-    return JsonResponse({"items": items})
+    # несуществующий проект — 404 до сборки доски (иначе она завела бы себе версию)
+    project = get_object_or_404(Project, pk=pk)
+    rng = _stats_range(request, project)
+    if isinstance(rng, JsonResponse):
+        return rng
+    rows = leaderboards.entries(pk)
+    if rng:
+        clicks = stats.project_owner_clicks(pk, *rng)
+        items = [_member_row(e.member.name, e.links, clicks.get(e.member_id, 0), e.member_id) for e in rows]
+        items.sort(key=lambda it: (-it["clicks"], -it["links"], it["name"]))
+        return JsonResponse({"items": items, "from": rng[0].isoformat(), "to": rng[1].isoformat()})
+    items = [_member_row(e.member.name, e.links, e.clicks, e.member_id, e.window_clicks) for e in rows]
+    return _board_response({"items": items}, pk)
 
 
 @require_GET
 def project_members(request: HttpRequest, pk: int):
     """
     Участники проекта (по таблице ProjectMember) + их агрегаты в рамках этого проекта.
-    items: [{id,name,links,clicks}]
+    items: [{id,name,links,clicks,window_clicks,out_of_window_clicks}]
+    ?from=&to= — clicks за период по посуточным агрегатам (без window_*).
     """
-    get_object_or_404(Project, pk=pk)
+    project = get_object_or_404(Project, pk=pk)
+    rng = _stats_range(request, project)
+    if isinstance(rng, JsonResponse):
+        return rng
 
     member_ids = list(ProjectMember.objects.filter(project_id=pk).values_list("member_id", flat=True))
     members = Member.objects.filter(id__in=member_ids).order_by("name")
 
-    # агрегаты по ссылкам внутри проекта
-    agg = Link.objects.filter(project_id=pk).values("owner_id").annotate(links=Count("id"), clicks=Sum("clicks"))
-    by_owner = {r["owner_id"]: r for r in agg}
+    # агрегаты по ссылкам внутри проекта — из снимка доски проекта
+    by_owner = {e.member_id: e for e in leaderboards.entries(pk)}
+    range_clicks = stats.project_owner_clicks(pk, *rng) if rng else None
 
     items: List[Dict[str, Any]] = []
     for m in members:
-        r = by_owner.get(m.id, {})
-        items.append(
-            {"id": m.id, "name": m.name, "links": r.get("links", 0) or 0, "clicks": r.get("clicks", 0) or 0}
-        )
-    return JsonResponse({"items": items})
+        e = by_owner.get(m.id)
+        links = e.links if e else 0
+        if range_clicks is not None:
+            items.append(_member_row(m.name, links, range_clicks.get(m.id, 0), m.id))
+        else:
+            items.append(_member_row(m.name, links, e.clicks if e else 0, m.id, e.window_clicks if e else 0))
+    data: Dict[str, Any] = {"items": items}
+    if rng:
+        data.update({"from": rng[0].isoformat(), "to": rng[1].isoformat()})
+    return JsonResponse(data)
 
 
 @csrf_exempt
@@ -273,34 +414,31 @@ def project_add_member(request: HttpRequest, pk: int):
 # Members (global)
 # ==========================
 @require_GET
+@condition(etag_func=_board_etag(leaderboards.GLOBAL))
 def members_list(request: HttpRequest):
     """
     Список всех участников (для /members и для 'Add Member' в проект).
+    Агрегаты — из глобального снимка лидерборда; ETag общий с ним.
     items: [{id,name,is_editor,active_projects,links,clicks,created_at}]
     """
     base = Member.objects.all().order_by("created_at")
-
-    agg = (
-        Link.objects.values("owner_id")
-        .annotate(total_links=Count("id"), total_clicks=Sum("clicks"), projects=Count("project", distinct=True))
-    )
-    by_owner = {r["owner_id"]: r for r in agg}
+    by_owner = {e.member_id: e for e in leaderboards.entries(leaderboards.GLOBAL)}
 
     items: List[Dict[str, Any]] = []
     for m in base:
-        r = by_owner.get(m.id, {})
+        e = by_owner.get(m.id)
         items.append(
             {
                 "id": m.id,
                 "name": m.name,
                 "is_editor": m.is_editor,
-                "active_projects": r.get("projects", 0),
-                "links": r.get("total_links", 0),
-                "clicks": r.get("total_clicks", 0) or 0,
+                "active_projects": e.projects if e else 0,
+                "links": e.links if e else 0,
+                "clicks": e.clicks if e else 0,
                 "created_at": m.created_at.isoformat(),
             }
         )
-    return JsonResponse({"items": items})
+    return _board_response({"items": items}, leaderboards.GLOBAL)
 
 
 @csrf_exempt
@@ -337,13 +475,23 @@ def member_create(request: HttpRequest):
 def project_links_by_owner(request: HttpRequest, pk: int, owner_id: int):
     """
     Ссылки участника в конкретном проекте.
-    items: [{id, name, clicks, target_url}]
+    ?with_uniques=1 — сразу с unique_users (вместо запроса /api/link-stats/ на каждую ссылку).
+    items: [{id, code, name, clicks, target_url[, unique_users]}]
     """
     items = list(
         Link.objects.filter(project_id=pk, owner_id=owner_id).order_by("-clicks", "-id").values("id", "name", "clicks", "target_url")
     )
+    extra = counters.pending(link__project_id=pk, link__owner_id=owner_id)
     for it in items:
-        it["clicks"] = it["clicks"] or 0
+        it["clicks"] = (it["clicks"] or 0) + extra.get(it["id"], 0)
+        it["code"] = shortcodes.encode(it["id"])
+    if extra:
+        items.sort(key=lambda it: (-it["clicks"], -it["id"]))
+
+    if request.GET.get("with_uniques") in ("1", "true", "yes") and items:
+        rows = stats.links([it["id"] for it in items], exact=_exact(request))
+        for it in items:
+            it["unique_users"] = rows[it["id"]]["unique_users"] if it["id"] in rows else 0
     return JsonResponse({"items": items})
 
 
@@ -353,7 +501,7 @@ def project_link_create(request: HttpRequest, pk: int):
     """
     Создание ссылки в проекте.
     JSON: { "owner_id": int, "name": str, "target_url": str }
-    Возвращает { "id": <link_id> }
+    Возвращает { "id": <link_id>, "code": <короткий код для /go/<code>> }
     """
     err = _require_editor(request)
     if err:
@@ -380,68 +528,454 @@ def project_link_create(request: HttpRequest, pk: int):
     # важно: если участник ещё не привязан к проекту, привяжем автоматом
     ProjectMember.objects.get_or_create(project=project, member=owner)
 
-    return JsonResponse({"id": link.id})
+    return JsonResponse({"id": link.id, "code": link.code})
+
+
+_MAX_BULK_LINKS = 5000
+_validate_url = URLValidator()
+
+
+def _bulk_rows(request: HttpRequest):
+    """
+    Строки для bulk-создания: JSON-массив / {"items": [...]} или CSV
+    (multipart-поле file либо тело text/csv) с колонками owner|owner_id, name, target_url.
+    """
+    upload = request.FILES.get("file")
+    if upload is not None or request.content_type == "text/csv":
+        raw = upload.read() if upload is not None else request.body
+        try:
+            text = raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return None
+        return list(csv.DictReader(io.StringIO(text)))
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return None
+    if isinstance(data, dict):
+        data = data.get("items")
+    return data if isinstance(data, list) else None
+
+
+def _clean_bulk_row(row) -> Dict[str, Any] | str:
+    """Нормализует строку; при ошибке возвращает её код."""
+    if not isinstance(row, dict):
+        return "bad_row"
+    name = str(row.get("name") or "").strip()
+    target_url = str(row.get("target_url") or "").strip()
+    owner = str(row.get("owner") or "").strip()
+    owner_id = row.get("owner_id")
+    if not (name and target_url and (owner or owner_id)):
+        return "fields_required"
+    if len(name) > 200 or len(owner) > 200:
+        return "too_long"
+    try:
+        _validate_url(target_url)
+    except ValidationError:
+        return "bad_url"
+    if owner_id not in (None, ""):
+        try:
+            owner_id = int(owner_id)
+        except (TypeError, ValueError):
+            return "bad_owner_id"
+    else:
+        owner_id = None
+    return {"name": name, "target_url": target_url, "owner": owner, "owner_id": owner_id}
+
+
+@csrf_exempt
+@require_POST
+def project_links_bulk(request: HttpRequest, pk: int):
+    """
+    Массовое создание ссылок в проекте.
+    JSON: [{ "owner": "<имя>" | "owner_id": int, "name": str, "target_url": str }, ...]
+    или CSV (file=... либо Content-Type: text/csv) с теми же колонками.
+    Участники по имени создаются, если их нет. Всё или ничего.
+    Возвращает { "ids": [<link_id> в порядке входных строк], "codes": [<короткий код>, ...] }
+    """
+    err = _require_editor(request)
+    if err:
+        return err
+
+    project = get_object_or_404(Project, pk=pk)
+    raw_rows = _bulk_rows(request)
+    if raw_rows is None:
+        return JsonResponse({"error": "bad_payload"}, status=400)
+    if not raw_rows:
+        return JsonResponse({"ids": []})
+    if len(raw_rows) > _MAX_BULK_LINKS:
+        return JsonResponse({"error": "too_many_rows", "max": _MAX_BULK_LINKS}, status=400)
+
+    rows, errors = [], []
+    for i, raw in enumerate(raw_rows):
+        row = _clean_bulk_row(raw)
+        if isinstance(row, str):
+            errors.append({"index": i, "error": row})
+        else:
+            rows.append(row)
+    if errors:
+        return JsonResponse({"error": "bad_rows", "rows": errors[:100]}, status=400)
+
+    names = {r["owner"] for r in rows if r["owner_id"] is None}
+    ids = {r["owner_id"] for r in rows if r["owner_id"] is not None}
+
+    with transaction.atomic():
+        # недостающих участников — одним INSERT, затем один SELECT на имена и id
+        if names:
+            Member.objects.bulk_create([Member(name=n) for n in names], ignore_conflicts=True)
+        found = Member.objects.filter(Q(name__in=names) | Q(pk__in=ids)).values_list("pk", "name")
+        by_name = {name: member_id for member_id, name in found}
+        known_ids = set(by_name.values())
+
+        missing = sorted(ids - known_ids)
+        if missing:
+            transaction.set_rollback(True)
+            return JsonResponse({"error": "owner_not_found", "owner_ids": missing[:100]}, status=400)
+
+        links = [
+            Link(
+                project=project,
+                owner_id=r["owner_id"] if r["owner_id"] is not None else by_name[r["owner"]],
+                name=r["name"],
+                target_url=r["target_url"],
+                clicks=0,
+            )
+            for r in rows
+        ]
+        Link.objects.bulk_create(links, batch_size=500)
+        owner_ids = {l.owner_id for l in links}
+        ProjectMember.objects.bulk_create(
+            [ProjectMember(project=project, member_id=m) for m in owner_ids], ignore_conflicts=True,
+        )
+        # bulk_create не шлёт post_save — делаем то, что сделали бы сигналы Link
+        new_ids = [l.pk for l in links]
+        transaction.on_commit(lambda: [link_targets.invalidate(i) for i in new_ids])
+        leaderboards.mark_pairs((m, project.pk) for m in owner_ids)
+        redirects.mark(new_ids)
+
+    return JsonResponse({"ids": new_ids, "codes": [shortcodes.encode(i) for i in new_ids]})
 
 
 # ==========================
 # Stats APIs (unique users)
 # ==========================
+_MAX_BATCH_IDS = 1000
+
+
+def _parse_ids(raw) -> List[int] | None:
+    """'1,2,3' или [1, 2, 3] -> [1, 2, 3] без дублей, в исходном порядке; None — мусор."""
+    if isinstance(raw, str):
+        raw = [x for x in raw.split(",") if x.strip()]
+    if not isinstance(raw, list):
+        return None
+    ids: List[int] = []
+    try:
+        for x in raw:
+            i = int(x)
+            if i not in ids:
+                ids.append(i)
+    except (TypeError, ValueError):
+        return None
+    return ids
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def link_stats_batch(request: HttpRequest):
+    """
+    Статистика по нескольким ссылкам за один запрос.
+    GET  /api/link-stats?ids=1,2,3[&exact=1]
+    POST /api/link-stats   JSON: { "ids": [1, 2, 3] }   — для длинных списков
+    -> { items: [{ link_id, total_clicks, unique_users }] } в порядке ids (несуществующие пропускаются)
+    """
+    if request.method == "POST":
+        import json
+
+        try:
+            data = json.loads(request.body.decode("utf-8"))
+        except Exception:
+            data = {}
+        raw = data.get("ids") if isinstance(data, dict) else None
+    else:
+        raw = request.GET.get("ids") or ""
+
+    ids = _parse_ids(raw)
+    if ids is None:
+        return JsonResponse({"error": "bad_ids"}, status=400)
+    if len(ids) > _MAX_BATCH_IDS:
+        return JsonResponse({"error": "too_many_ids", "max": _MAX_BATCH_IDS}, status=400)
+    if not ids:
+        return JsonResponse({"items": []})
+
+    rows = stats.links(ids, exact=_exact(request))
+    return JsonResponse({"items": [rows[i] for i in ids if i in rows]})
+
+
 @require_GET
 def link_stats(request: HttpRequest, pk: int):
     """
     Статистика по одной ссылке.
-    GET /api/link-stats/<link_id>/
+    GET /api/link-stats/<link_id>/[?exact=1]
     -> { link_id, total_clicks, unique_users }
     """
-    get_object_or_404(Link, pk=pk)
-    total_clicks = Link.objects.filter(pk=pk).aggregate(s=Sum("clicks"))["s"] or 0
-    unique_users = (
-        ClickEvent.objects.filter(link_id=pk)
-        .exclude(user_key__isnull=True)
-        .exclude(user_key__exact="")
-        .values("user_key")
-        .distinct()
-        .count()
-    )
-    return JsonResponse({"link_id": pk, "total_clicks": total_clicks, "unique_users": unique_users})
+    row = stats.link(pk, exact=_exact(request))
+    if row is None:
+        raise Http404("Link not found")
+    return JsonResponse(row)
 
 
 @require_GET
 def project_stats_global(request: HttpRequest):
     """
     Глобальная статистика (по всем ссылкам всех проектов).
-    GET /api/project-stats/
-    -> { total_clicks, unique_users }
-    """
-    total_clicks = Link.objects.aggregate(s=Sum("clicks"))["s"] or 0
-    unique_users = (
-        ClickEvent.objects.exclude(user_key__isnull=True)
-        .exclude(user_key__exact="")
-        .values("user_key")
-        .distinct()
-        .count()
-    )
-    return JsonResponse({"total_clicks": total_clicks, "unique_users": unique_users})
+    GET /api/project-stats/[?exact=1]
+    -> { total_projects, total_links, total_clicks, unique_users }
+    """
+    return JsonResponse(stats.totals(exact=_exact(request)))
 
 
 @require_GET
 def project_stats(request: HttpRequest, pk: int):
     """
     Статистика в рамках проекта.
-    GET /api/project-stats/<project_id>/
-    -> { project_id, total_clicks, unique_users }
+    GET /api/project-stats/<project_id>/[?exact=1]
+    -> { project_id, total_clicks, window_clicks, out_of_window_clicks, unique_users }
+    GET /api/project-stats/<project_id>/?from=YYYY-MM-DD&to=YYYY-MM-DD — из посуточных агрегатов
+    -> { project_id, from, to, total_clicks, unique_users }
+    """
+    if _has_range(request):
+        rng = _stats_range(request, get_object_or_404(Project, pk=pk))
+        if isinstance(rng, JsonResponse):
+            return rng
+        return JsonResponse(stats.project_range(pk, *rng))
+    row = stats.project(pk, exact=_exact(request))
+    if row is None:
+        raise Http404("Project not found")
+    return JsonResponse(row)
+
+
+@require_GET
+def link_cache_stats(request: HttpRequest):
+    """
+    Счётчики кэша target_url текущего воркера (для подбора LINK_CACHE_SIZE / TTL).
+    GET /api/_cache/links (доступ — _require_internal)
+    """
+    err = _require_internal(request)
+    if err:
+        return err
+    return JsonResponse(link_targets.stats())
+
+
+@require_GET
+def request_metrics(request: HttpRequest):
+    """
+    Гистограммы времени ответа / SQL по вьюхам текущего воркера (Prometheus text format).
+    GET /api/_metrics (доступ — _require_internal)
+    """
+    err = _require_internal(request)
+    if err:
+        return err
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ==========================
+# Time series (только из ClickRollup)
+# ==========================
+_MAX_SERIES_DAYS = {rollups.HOUR: 31, rollups.DAY: 3660}
+
+
+def _series_params(request: HttpRequest, default_from=None, default_to=None):
+    """
+    ?grain=day|hour&from=YYYY-MM-DD&to=YYYY-MM-DD (даты включительно, TIME_ZONE).
+    Возвращает (grain, start, end) или JsonResponse с ошибкой.
+    """
+    grain = request.GET.get("grain") or rollups.DAY
+    if grain not in _MAX_SERIES_DAYS:
+        return JsonResponse({"error": "bad_grain"}, status=400)
+
+    raw_from, raw_to = request.GET.get("from"), request.GET.get("to")
+    try:
+        d_to = parse_date(raw_to) if raw_to else None
+        d_from = parse_date(raw_from) if raw_from else None
+    except ValueError:
+        d_to = d_from = None
+    if (raw_to and not d_to) or (raw_from and not d_from):
+        return JsonResponse({"error": "bad_date"}, status=400)
+
+    explicit_from, explicit_to = d_from is not None, d_to is not None
+    d_to = d_to or default_to or localdate()
+    d_from = d_from or default_from or (d_to - timedelta(days=29 if grain == rollups.DAY else 1))
+    if d_from > d_to:
+        return JsonResponse({"error": "bad_range"}, status=400)
+    limit = _MAX_SERIES_DAYS[grain]
+    if (d_to - d_from).days + 1 > limit:
+        # границу по умолчанию (например, длинная кампания при grain=hour) подрезаем,
+        # ошибка — только если обе границы задал клиент
+        if not explicit_from:
+            d_from = d_to - timedelta(days=limit - 1)
+        elif not explicit_to:
+            d_to = d_from + timedelta(days=limit - 1)
+        else:
+            return JsonResponse({"error": "range_too_large"}, status=400)
+
+    start, end = rollups.day_range(d_from, d_to)
+    return grain, start, end
+
+
+@require_GET
+def link_timeseries(request: HttpRequest, pk: int):
+    """
+    Клики ссылки по часам/дням.
+    GET /api/links/<id>/timeseries?grain=day&from=&to=
+    -> { link_id, grain, items: [{t, clicks, unique_users}] }
+    """
+    get_object_or_404(Link, pk=pk)
+    params = _series_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    grain, start, end = params
+    items = rollups.series(rollups.LINK, pk, grain, start, end)
+    return JsonResponse({"link_id": pk, "grain": grain, "items": items})
+
+
+@require_GET
+def project_timeseries(request: HttpRequest, pk: int):
+    """
+    Клики проекта по часам/дням (по умолчанию — период кампании, если задан;
+    для grain=hour — его последние 31 день).
+    GET /api/projects/<pk>/timeseries?grain=day&from=&to=
+    -> { project_id, grain, items: [{t, clicks, unique_users}] }
+    """
+    p = get_object_or_404(Project, pk=pk)
+    params = _series_params(request, default_from=p.date_from, default_to=p.date_to)
+    if isinstance(params, JsonResponse):
+        return params
+    grain, start, end = params
+    items = rollups.series(rollups.PROJECT, pk, grain, start, end)
+    return JsonResponse({"project_id": pk, "grain": grain, "items": items})
+
+
+# ==========================
+# Сырые клики: выгрузка потоком, разбивка по устройствам
+# ==========================
+_EXPORT_FIELDS = ("id", "created_at", "link_id", "link_name", "owner", "user_key", "ip", "ua")
+
+
+def _project_clicks(request: HttpRequest, pk: int):
+    """
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (включительно, TIME_ZONE) &link=1,2,3
+    Возвращает QuerySet ClickEvent проекта или JsonResponse с ошибкой.
+    """
+    qs = ClickEvent.objects.filter(link__project_id=pk)
+
+    raw_from, raw_to = request.GET.get("from"), request.GET.get("to")
+    try:
+        d_from = parse_date(raw_from) if raw_from else None
+        d_to = parse_date(raw_to) if raw_to else None
+    except ValueError:
+        d_from = d_to = None
+    if (raw_from and not d_from) or (raw_to and not d_to):
+        return JsonResponse({"error": "bad_date"}, status=400)
+    if d_from and d_to and d_from > d_to:
+        return JsonResponse({"error": "bad_range"}, status=400)
+    if d_from:
+        qs = qs.filter(created_at__gte=rollups.day_range(d_from, d_from)[0])
+    if d_to:
+        qs = qs.filter(created_at__lt=rollups.day_range(d_to, d_to)[1])
+
+    if request.GET.get("link"):
+        link_ids = _parse_ids(request.GET["link"])
+        if not link_ids:
+            return JsonResponse({"error": "bad_link"}, status=400)
+        qs = qs.filter(link_id__in=link_ids)
+    return qs
+
+
+def _export_queryset(request: HttpRequest, pk: int):
+    """Итератор строк выгрузки или JsonResponse с ошибкой."""
+    qs = _project_clicks(request, pk)
+    if isinstance(qs, JsonResponse):
+        return qs
+    # порядок по индексу created_at — без сортировки всей выборки
+    return (
+        qs.order_by("created_at", "pk")
+        .values_list("pk", "created_at", "link_id", "link__name", "link__owner__name", "user_key", "ip", "user_agent__ua")
+        .iterator(chunk_size=getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+    )
+
+
+def _export_chunks(rows, fmt: str, chunk: int):
+    """Склеивает по chunk строк в один кусок ответа."""
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(_EXPORT_FIELDS)
+    n = 0
+    for row in rows:
+        row = (row[0], localtime(row[1]).isoformat(), *row[2:])
+        if writer:
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(dict(zip(_EXPORT_FIELDS, row)), ensure_ascii=False))
+            buf.write("\n")
+        n += 1
+        if n % chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+@require_GET
+def project_clicks_export(request: HttpRequest, pk: int, fmt: str):
+    """
+    Сырые клики проекта потоком.
+    GET /api/projects/<pk>/clicks.csv|.ndjson?from=&to=&link=1,2
+    Поля: id, created_at, link_id, link_name, owner, user_key, ip, ua
+    """
+    if not Project.objects.filter(pk=pk).exists():
+        raise Http404("Project not found")
+    rows = _export_queryset(request, pk)
+    if isinstance(rows, JsonResponse):
+        return rows
+
+    content_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson; charset=utf-8"
+    resp = StreamingHttpResponse(
+        _export_chunks(rows, fmt, chunk=getattr(settings, "EXPORT_CHUNK_SIZE", 2000)),
+        content_type=content_type,
+    )
+    resp["Content-Disposition"] = f'attachment; filename="project-{pk}-clicks.{fmt}"'
+    resp["Cache-Control"] = "no-store"
+    return resp
+
+
+@require_GET
+def project_devices(request: HttpRequest, pk: int):
+    """
+    Клики проекта по устройствам / браузерам / ОС (GROUP BY по словарю UserAgent).
+    GET /api/projects/<pk>/devices?from=&to=&link=1,2
+    -> { project_id, items: [{device, browser, os, clicks}] }
     """
     get_object_or_404(Project, pk=pk)
-    total_clicks = Link.objects.filter(project_id=pk).aggregate(s=Sum("clicks"))["s"] or 0
-    unique_users = (
-        ClickEvent.objects.filter(link__project_id=pk)
-        .exclude(user_key__isnull=True)
-        .exclude(user_key__exact="")
-        .values("user_key")
-        .distinct()
-        .count()
+    qs = _project_clicks(request, pk)
+    if isinstance(qs, JsonResponse):
+        return qs
+    rows = (
+        qs.values("user_agent__device", "user_agent__browser", "user_agent__os")
+        .annotate(clicks=Count("id"))
+        .order_by("-clicks")
     )
-    return JsonResponse({"project_id": pk, "total_clicks": total_clicks, "unique_users": unique_users})
+    items = [
+        {
+            "device": r["user_agent__device"] or "other",
+            "browser": r["user_agent__browser"] or "Other",
+            "os": r["user_agent__os"] or "Other",
+            "clicks": r["clicks"],
+        }
+        for r in rows
+    ]
+    return JsonResponse({"project_id": pk, "items": items})
 
 
 # ==========================
@@ -456,43 +990,38 @@ def link_redirect(request: HttpRequest, pk: int):
       Клики для ботов не считаем.
     - Для людей — пишем ClickEvent, инкрементим clicks и делаем 302 на target_url.
     """
-    link = get_object_or_404(Link, pk=pk)
+    target_url = get_target(pk)  # из кэша воркера, без SELECT для горячих ссылок
+    if target_url is None:
+        raise Http404("Link not found")
 
-    # Боты/краулеры — отдать минимальный HTML без OG, чтобы совсем не было карточек-превью
-    if _is_crawler(request):
-        html = f"""<!doctype html>
-<html><head>
-  <meta charset="utf-8">
-  <meta http-equiv="refresh" content="0;url={link.target_url}">
-  <title>Redirecting…</title>
-  <!-- no og:* / twitter:* to prevent previews -->
-  <meta name="robots" content="noindex,nofollow">
-</head><body>
-  <p><a href="{link.target_url}">Redirecting…</a></p>
-</body></html>"""
-        resp = HttpResponse(html, content_type="text/html; charset=utf-8", status=200)
-        # Чуть кешируем у ботов, но без ог-тегов им нечего кэшировать как карточку
-        resp["Cache-Control"] = "public, max-age=86400"
-        return resp
+    # Боты/краулеры: превьюерам — минимальный HTML без OG (без карточек-превью), клик не считаем
+    verdict = _bot_verdict(request)
+    if verdict:
+        return _bot_response(verdict, target_url)
 
     # Реальный пользователь — считаем
-    ua = request.META.get("HTTP_USER_AGENT", "") or ""
-    xff = request.META.get("HTTP_X_FORWARDED_FOR")
-    ip = (xff.split(",")[0].strip() if xff else request.META.get("REMOTE_ADDR"))
-
-    user_key = (request.GET.get("user") or "").strip()
-    if not user_key:
-        # стабильный фолбэк, если фронт не передал user
-        user_key = hashlib.sha256(f"{ip}-{ua}".encode()).hexdigest()[:32]
-
-    ClickEvent.objects.create(
-        link=link,
-        user_key=user_key or None,
-        ip=ip,
-        ua=ua[:700],
-        created_at=now(),
-    )
+    user_key, ip, ua = _click_identity(request)
 
-    Link.objects.filter(pk=pk).update(clicks=F("clicks") + 1)
+    # ClickEvent + clicks += 1 (сразу или через spool — см. settings.CLICK_INGEST_MODE);
+    # повтор того же user_key в окне CLICK_DEDUP_WINDOW не пишется, редирект тот же
+    try:
+        record_click(pk, user_key, ip, ua)
+    except Link.DoesNotExist:
+        # ссылку удалили в другом воркере, а его кэш целей ещё не истёк
+        raise Http404("Link not found")
 
-    return HttpResponseRedirect(link.target_url)
+    return HttpResponseRedirect(target_url)
+
+
+@require_GET
+def link_redirect_code(request: HttpRequest, code: str):
+    """
+    Короткий урл по коду: /go/<code> (7 символов Base62, core/shortcodes.py).
+    Обычно его обслуживает utmtracker/fastlane.py из таблицы редиректов ещё до Django;
+    сюда попадают промахи таблицы (ссылка создана только что) и запуск без fastlane.
+    /go/<из одних цифр> — всегда старый /go/<id> (маршрут go).
+    """
+    pk = shortcodes.decode(code)
+    if pk is None:
+        raise Http404("Link not found")
+    return link_redirect(request, pk)
@@ -0,0 +1,58 @@
+# utmtracker/views_async.py
+"""
+Async-версии горячих эндпоинтов трекинга для ASGI (uvicorn).
+
+Ссылка берётся из кэша воркера (aget_target), клик уходит в AsyncClickBatcher —
+на попадании в кэш запрос не касается ни БД, ни пула потоков.
+Включаются settings.ASYNC_REDIRECTS (asgi.py ставит его по умолчанию).
+"""
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, Http404
+from django.views.decorators.http import require_GET
+
+from core.clicks import arecord_click
+from core.linkcache import aget_target
+from core import bots, shortcodes
+from core.views import bot_ignored, duplicate_ignored, link_not_found, parse_track_request
+from utmtracker.views import _bot_response, _bot_verdict, _click_identity
+
+
+@require_GET
+async def link_redirect(request, pk: int):
+    target_url = await aget_target(pk)
+    if target_url is None:
+        raise Http404("Link not found")
+
+    verdict = _bot_verdict(request)
+    if verdict:
+        return _bot_response(verdict, target_url)
+
+    user_key, ip, ua = _click_identity(request)
+    await arecord_click(pk, user_key, ip, ua)
+    return HttpResponseRedirect(target_url)
+
+
+@require_GET
+async def link_redirect_code(request, code: str):
+    """/go/<code> — как utmtracker.views.link_redirect_code."""
+    pk = shortcodes.decode(code)
+    if pk is None:
+        raise Http404("Link not found")
+    return await link_redirect(request, pk)
+
+
+async def track_click(request):
+    parsed = parse_track_request(request)
+    if isinstance(parsed, HttpResponse):
+        return parsed
+    link_id, user_key, ip, ua = parsed
+
+    if await aget_target(link_id) is None:
+        return link_not_found()
+
+    verdict = bots.classify(ua, ip)
+    if verdict:
+        return bot_ignored(verdict)
+
+    if not await arecord_click(link_id, user_key, ip, ua):
+        return duplicate_ignored()
+    return JsonResponse({"ok": True})
@@ -1,5 +1,16 @@
 import os
-from django.core.wsgi import get_wsgi_application
+
+import django
+from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'utmtracker.settings')
-application = get_wsgi_application()
+django.setup(set_prefix=False)
+
+# то же, что get_wsgi_application(), но трекинг идёт по короткой цепочке middleware
+from utmtracker.fastlane import FastLaneWSGIHandler, wrap_wsgi  # noqa: E402
+
+application = FastLaneWSGIHandler()
+
+# /go/<code> из таблицы редиректов — до middleware Django (utmtracker/fastlane.py)
+if settings.FAST_REDIRECTS:
+    application = wrap_wsgi(application)